@@ -0,0 +1,37 @@
+from typing import AsyncGenerator, Optional
+
+from fastapi import HTTPException, Request
+
+from app.services.admission import (AdmissionRejected, AdmissionTicket,
+                                    admission)
+
+
+def client_key(request: Request) -> str:
+    """调用方标识：优先使用 X-Client-Id 请求头，否则使用客户端地址"""
+    client_id = request.headers.get("X-Client-Id")
+    if client_id:
+        return client_id
+    return request.client.host if request.client else "unknown"
+
+
+def acquire_run_slot(
+    request: Request, weight: int = 1, client_units: Optional[int] = None
+) -> AdmissionTicket:
+    """申请运行容量，容量不足时返回429/503并附带Retry-After"""
+    try:
+        return admission.acquire(client_key(request), weight, client_units)
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=e.detail,
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+
+async def admit_run(request: Request) -> AsyncGenerator[AdmissionTicket, None]:
+    """FastAPI依赖项：请求处理期间占用一个运行容量"""
+    ticket = acquire_run_slot(request)
+    try:
+        yield ticket
+    finally:
+        ticket.release()
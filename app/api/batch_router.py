@@ -0,0 +1,84 @@
+import logging
+from typing import Any, Dict, List, Optional
+
+from fastapi import APIRouter, Body, HTTPException, Query
+from pydantic import BaseModel, Field
+
+from app.services.batch_jobs import batch_runner
+
+logger = logging.getLogger(__name__)
+
+
+# 创建批量任务的请求模型
+class CreateBatchRequest(BaseModel):
+    spider_id: int
+    urls: Optional[List[str]] = Field(None, description="要爬取的URL列表")
+    from_targets: bool = Field(
+        False, description="使用该爬虫在 spider_targets 中的全部目标"
+    )
+    params: Optional[dict] = None
+    concurrency: Optional[int] = Field(None, ge=1, description="同时执行的条目数")
+    max_attempts: Optional[int] = Field(None, ge=1, description="单个条目的最大尝试次数")
+    description: Optional[str] = None
+
+
+# 创建批量任务路由器
+router = APIRouter(prefix="/batches", tags=["batches"])
+
+
+@router.post("/", status_code=202)
+async def create_batch(request: CreateBatchRequest = Body(...)) -> Dict[str, Any]:
+    """创建可恢复的批量任务，立即返回进度"""
+    try:
+        return await batch_runner.create(
+            request.spider_id,
+            urls=request.urls,
+            from_targets=request.from_targets,
+            params=request.params,
+            concurrency=request.concurrency,
+            max_attempts=request.max_attempts,
+            description=request.description,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"创建批量任务失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"创建批量任务失败: {str(e)}")
+
+
+@router.get("/{batch_id}")
+async def get_batch(batch_id: int) -> Dict[str, Any]:
+    """查询进度、吞吐量和预计剩余时间"""
+    progress = await batch_runner.progress(batch_id)
+    if progress is None:
+        raise HTTPException(detail="Batch job not found", status_code=404)
+    return progress
+
+
+@router.get("/{batch_id}/items")
+async def list_batch_items(
+    batch_id: int,
+    status: Optional[str] = Query(None, pattern="^(pending|succeeded|failed)$"),
+    after_id: int = Query(0, ge=0, description="上一页最后一个条目的ID"),
+    limit: int = Query(100, ge=1, le=1000),
+) -> List[Dict[str, Any]]:
+    """按ID分页查看条目"""
+    return await batch_runner.list_items(batch_id, status, after_id, limit)
+
+
+@router.post("/{batch_id}/cancel")
+async def cancel_batch(batch_id: int) -> Dict[str, Any]:
+    """取消批量任务，已完成的条目保留"""
+    try:
+        return await batch_runner.cancel(batch_id)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.post("/{batch_id}/retry")
+async def retry_batch(batch_id: int) -> Dict[str, Any]:
+    """只重新执行最终失败的条目"""
+    try:
+        return await batch_runner.retry_failed(batch_id)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
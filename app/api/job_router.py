@@ -0,0 +1,49 @@
+import logging
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, Body, HTTPException
+from pydantic import BaseModel, Field
+
+from app.services.job_queue import job_queue
+from app.services.work_queue import PRIORITY_API
+
+logger = logging.getLogger(__name__)
+
+
+# 入队请求模型
+class EnqueueJobRequest(BaseModel):
+    spider_id: int
+    params: Optional[dict] = None
+    priority: int = Field(PRIORITY_API, description="数值越小越先执行")
+
+
+# 创建持久化任务队列路由器
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+@router.post("/", status_code=202)
+async def enqueue_job(request: EnqueueJobRequest = Body(...)) -> Dict[str, Any]:
+    """写入持久化队列，由任一工作节点领取执行"""
+    try:
+        job_id = await job_queue.enqueue(
+            request.spider_id, request.params, request.priority, source="api"
+        )
+    except Exception as e:
+        logger.error(f"任务入队失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"任务入队失败: {str(e)}")
+    return {"job_id": job_id, "status": "queued", "status_url": f"/jobs/{job_id}"}
+
+
+@router.get("/stats")
+async def get_job_stats() -> Dict[str, Any]:
+    """各状态的任务数、最早排队任务的等待时间和本节点运行情况"""
+    return await job_queue.stats()
+
+
+@router.get("/{job_id}")
+async def get_job(job_id: int) -> Dict[str, Any]:
+    """查询任务状态和结果"""
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(detail="Job not found", status_code=404)
+    return job
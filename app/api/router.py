@@ -1,6 +1,11 @@
 from fastapi import FastAPI
 
+from app.api.batch_router import router as batch_router
+from app.api.job_router import router as job_router
+from app.api.run_router import router as run_router
+from app.api.screenshot_router import router as screenshot_router
 from app.api.spider_router import router as spider_router
+from app.api.target_router import router as target_router
 from app.api.task_router import router as task_router
 from app.database.database import lifespan_manager
 
@@ -9,3 +14,8 @@ app = FastAPI(title="Auto work API", lifespan=lifespan_manager)
 
 app.include_router(task_router)
 app.include_router(spider_router)
+app.include_router(screenshot_router)
+app.include_router(run_router)
+app.include_router(job_router)
+app.include_router(target_router)
+app.include_router(batch_router)
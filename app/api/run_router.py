@@ -0,0 +1,146 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.admission import acquire_run_slot
+from app.database.database import get_db
+from app.services.admission import admission
+from app.services.run_history import latency_stats, run_history
+from app.services.run_tracker import TERMINAL_STATUSES, run_tracker
+from app.services.spider_logic_service import SpiderLogicService
+from app.services.work_queue import work_queue
+
+logger = logging.getLogger(__name__)
+
+
+# 异步提交运行的请求模型
+class SubmitRunRequest(BaseModel):
+    spider_id: int
+    params: Optional[dict] = None
+
+
+# 创建运行路由器
+router = APIRouter(prefix="/runs", tags=["runs"])
+
+# SSE心跳间隔（秒）
+_SSE_KEEPALIVE = 15
+
+
+@router.post("/", status_code=202)
+async def submit_run(
+    http_request: Request, request: SubmitRunRequest = Body(...)
+) -> Dict[str, Any]:
+    """异步提交一次爬虫运行，立即返回运行ID
+
+    运行容量在运行结束时才释放，容量已满时返回429/503和Retry-After。
+    """
+    ticket = acquire_run_slot(http_request)
+    try:
+        record = await SpiderLogicService.submit_run(
+            request.spider_id, request.params, on_done=ticket.release
+        )
+    except ValueError as e:
+        ticket.release()
+        raise HTTPException(detail=str(e), status_code=404)
+    except Exception as e:
+        ticket.release()
+        logger.error(f"提交运行失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"提交运行失败: {str(e)}")
+    return {
+        "run_id": record.id,
+        "status": record.status,
+        "status_url": f"/runs/{record.id}",
+        "events_url": f"/runs/{record.id}/events",
+    }
+
+
+@router.get("/queue")
+async def get_queue_stats() -> Dict[str, Any]:
+    """工作队列深度、等待时间、工作协程利用率和准入控制状态"""
+    return {**work_queue.stats(), "admission": admission.stats()}
+
+
+@router.get("/stats")
+async def get_run_stats(
+    hours: float = Query(24, gt=0, description="统计最近多少小时的运行"),
+    spider_id: Optional[int] = Query(None, description="只统计指定爬虫"),
+    db: AsyncSession = Depends(get_db),
+) -> Dict[str, Any]:
+    """按爬虫统计运行耗时的p50/p95/p99和成功率"""
+    try:
+        spiders = await latency_stats(db, hours, spider_id)
+    except Exception as e:
+        logger.error(f"查询运行统计失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"查询运行统计失败: {str(e)}")
+    return {"hours": hours, "spiders": spiders, "writer": run_history.stats()}
+
+
+@router.get("/{run_id}")
+async def get_run(run_id: str) -> Dict[str, Any]:
+    """查询运行状态、阶段事件和结果，运行可以由任意API进程提交"""
+    run = await run_tracker.load(run_id)
+    if run is None:
+        raise HTTPException(detail="Run not found", status_code=404)
+    return run
+
+
+@router.get("/{run_id}/events")
+async def stream_run_events(run_id: str) -> StreamingResponse:
+    """以Server-Sent Events推送运行的阶段事件，运行结束后关闭
+
+    运行在本进程内时实时推送；由其他API进程执行时按 runs.persist_interval 轮询快照。
+    """
+    queue = run_tracker.subscribe(run_id)
+    if queue is not None:
+        stream = _local_events(run_id, queue)
+    elif await run_tracker.load(run_id) is not None:
+        stream = _remote_events(run_id)
+    else:
+        raise HTTPException(detail="Run not found", status_code=404)
+
+    return StreamingResponse(
+        stream,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _format_event(event: Dict[str, Any]) -> str:
+    return (
+        f"event: {event['phase']}\n"
+        f"data: {json.dumps(event, ensure_ascii=False, default=str)}\n\n"
+    )
+
+
+async def _local_events(run_id: str, queue: asyncio.Queue):
+    try:
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), _SSE_KEEPALIVE)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            yield _format_event(event)
+            if event["phase"] in TERMINAL_STATUSES:
+                break
+    finally:
+        run_tracker.unsubscribe(run_id, queue)
+
+
+async def _remote_events(run_id: str):
+    last_sent = time.monotonic()
+    async for event in run_tracker.follow(run_id):
+        if event is not None:
+            yield _format_event(event)
+        elif time.monotonic() - last_sent >= _SSE_KEEPALIVE:
+            yield ": keepalive\n\n"
+        else:
+            continue
+        last_sent = time.monotonic()
@@ -0,0 +1,27 @@
+from typing import Any, Dict
+
+from fastapi import APIRouter, HTTPException, Query
+
+from app.services.screenshot_store import screenshot_store
+
+# 创建截图存储路由器
+router = APIRouter(prefix="/screenshots", tags=["screenshots"])
+
+
+@router.get("/")
+async def find_screenshots(
+    url: str = Query(..., description="截图对应的页面URL"),
+    limit: int = Query(20, ge=1, le=200),
+) -> Dict[str, Any]:
+    """按URL查找截图记录，最新的在前"""
+    items = await screenshot_store.find_by_url(url, limit)
+    return {"total": len(items), "screenshots": items}
+
+
+@router.get("/{sha256}")
+async def get_screenshot(sha256: str) -> Dict[str, Any]:
+    """按内容哈希查找截图记录"""
+    items = await screenshot_store.find_by_hash(sha256)
+    if not items:
+        raise HTTPException(detail="Screenshot not found", status_code=404)
+    return {"sha256": sha256, "records": items}
@@ -1,15 +1,21 @@
+import json
 import logging
 import os
 from typing import Any, Dict, List, Optional
 
 from fastapi import (APIRouter, Body, Depends, File, HTTPException, Query,
-                     UploadFile)
-from pydantic import BaseModel
+                     Request, UploadFile)
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from pydantic import BaseModel, Field, TypeAdapter
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.api.admission import acquire_run_slot, admit_run
 from app.database.database import get_db
 from app.schemas.spider import SpiderCreate, SpiderResponse, SpiderUpdate
-from app.services.spider_logic_service import SpiderLogicService
+from app.services.spider_logic_service import (BATCH_MAX_CONCURRENCY,
+                                               BATCH_MAX_URLS,
+                                               SpiderLogicService)
 from config.load_config import get_config_instance
 
 # 确保中文正常显示
@@ -23,8 +29,25 @@ class RunSpiderRequest(BaseModel):
     params: Optional[dict] = None
 
 
+# 批量运行爬虫的请求模型
+class BatchRunRequest(BaseModel):
+    urls: List[str] = Field(
+        ...,
+        min_length=1,
+        max_length=BATCH_MAX_URLS,
+        description="要截图的URL列表，数量上限见 [batch] max_urls",
+    )
+    params: Optional[dict] = None
+    max_concurrency: Optional[int] = Field(
+        None, ge=1, description="本批次最大并发标签页数，不超过全局上限"
+    )
+
+
 logger = logging.getLogger(__name__)
 
+# 整页校验爬虫列表，避免逐行调用 model_validate
+_spider_list_adapter = TypeAdapter(List[SpiderResponse])
+
 # 创建爬虫路由器
 router = APIRouter(prefix="/spiders", tags=["spiders"])
 
@@ -79,28 +102,50 @@ async def list_spiders(
     db: AsyncSession = Depends(get_db),
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor"),
+    count: str = Query("exact", pattern="^(exact|approximate|none)$"),
 ) -> Dict[str, Any]:
     """获取所有爬虫列表
 
     Args:
         db: 数据库会话
-        skip: 跳过的条目数
+        skip: 跳过的条目数（兼容旧接口，传入cursor时忽略）
         limit: 返回的最大条目数
+        cursor: 游标，按ID继续读取下一页
+        count: 总数统计方式，exact 精确计数，approximate 使用表统计估计值，none 不统计
 
     Returns:
-        爬虫列表及总数
+        爬虫列表、总数及下一页游标
     """
     try:
         result = await SpiderLogicService.get_spiders_with_count(
-            db, skip=skip, limit=limit
+            db, skip=skip, limit=limit, cursor=cursor, count=count
         )
-        result["spiders"] = [
-            SpiderResponse.model_validate(spider) for spider in result["spiders"]
-        ]
-        return result
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"获取爬虫列表失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"获取爬虫列表失败: {str(e)}")
+    result["spiders"] = _spider_list_adapter.validate_python(
+        result["spiders"], from_attributes=True
+    )
+    return result
+
+
+@router.get("/export")
+async def export_spiders(
+    page_size: int = Query(500, ge=1, le=5000),
+) -> StreamingResponse:
+    """以NDJSON流式导出全部爬虫，每行一个爬虫"""
+
+    async def generate():
+        async for spiders in SpiderLogicService.iter_spiders(page_size):
+            yield "".join(
+                SpiderResponse.model_validate(spider).model_dump_json() + "\n"
+                for spider in spiders
+            )
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
 
 
 @router.post("/")
@@ -128,15 +173,17 @@ async def create_spider(
         raise HTTPException(status_code=500, detail=f"爬虫创建失败: {str(e)}")
 
 
-@router.post("/run")
-async def run_spider(
-    request: RunSpiderRequest = Body(...), db: AsyncSession = Depends(get_db)
-) -> Dict[str, Any]:
-    """运行指定ID的爬虫，支持指定语言类型"""
+@router.post("/run", dependencies=[Depends(admit_run)])
+async def run_spider(request: RunSpiderRequest = Body(...)) -> Dict[str, Any]:
+    """运行指定ID的爬虫，支持指定语言类型
+
+    不依赖请求级数据库会话，截图期间不占用连接池。
+    截图容量已满时返回429/503和Retry-After，而不是让请求排队到超时。
+    """
     try:
         # 调用service层方法运行爬虫
         result = await SpiderLogicService.run_spider_with_language(
-            request.spider_id, request.language, db
+            request.spider_id, request.language, request.params
         )
         return result
     except ValueError as e:
@@ -146,6 +193,61 @@ async def run_spider(
         raise HTTPException(status_code=500, detail=f"运行爬虫失败: {str(e)}")
 
 
+@router.post("/{spider_id}/batch")
+async def run_spider_batch(
+    spider_id: int, http_request: Request, request: BatchRunRequest = Body(...)
+) -> StreamingResponse:
+    """批量运行爬虫，以NDJSON流的形式按完成顺序返回每个URL的结果
+
+    整个批次按一个请求计入调用方的在途上限，按本批次的并发数占用总容量，直到流结束。
+    实际并发数通过响应头 X-Batch-Concurrency 返回，只在超过总容量时小于请求值。
+    """
+    try:
+        spider = await SpiderLogicService.load_spider_definition(spider_id)
+    except ValueError as e:
+        raise HTTPException(detail=str(e), status_code=404)
+
+    weight = min(
+        len(request.urls),
+        request.max_concurrency or BATCH_MAX_CONCURRENCY,
+        BATCH_MAX_CONCURRENCY,
+    )
+    ticket = acquire_run_slot(http_request, weight, client_units=1)
+    # 权重超过总容量时被截断，实际并发不超过被接纳的权重
+    concurrency = ticket.weight or weight
+
+    async def stream_results():
+        try:
+            async for item in SpiderLogicService.run_spider_batch(
+                spider, request.urls, request.params, concurrency
+            ):
+                yield json.dumps(item, ensure_ascii=False, default=str) + "\n"
+        finally:
+            ticket.release()
+
+    # 客户端在流开始前断开时生成器不会执行，响应结束后再释放一次（可重复调用）
+    return StreamingResponse(
+        stream_results(),
+        media_type="application/x-ndjson",
+        headers={"X-Batch-Concurrency": str(concurrency)},
+        background=BackgroundTask(ticket.release),
+    )
+
+
+@router.post("/{spider_id}/reload")
+async def reload_spider(
+    spider_id: int, db: AsyncSession = Depends(get_db)
+) -> Dict[str, Any]:
+    """重新加载Python爬虫模块，使新上传或修改的文件无需重启即可生效"""
+    try:
+        return await SpiderLogicService.reload_spider(spider_id, db)
+    except ValueError as e:
+        raise HTTPException(detail=str(e), status_code=400)
+    except Exception as e:
+        logger.error(f"重新加载爬虫失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"重新加载爬虫失败: {str(e)}")
+
+
 @router.get("/{spider_id}")
 async def get_spider(
     spider_id: int, db: AsyncSession = Depends(get_db)
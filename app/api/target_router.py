@@ -0,0 +1,109 @@
+import logging
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.database import get_db
+from app.database.models import SpiderTarget
+from app.database.pagination import decode_cursor, fetch_keyset_page
+from app.services.crawl_frontier import crawl_frontier
+from app.services.target_ingest import target_ingest
+
+logger = logging.getLogger(__name__)
+
+# 创建爬取目标路由器
+router = APIRouter(prefix="/targets", tags=["targets"])
+
+
+@router.post("/import")
+async def import_targets(
+    request: Request,
+    spider_name: Optional[str] = Query(
+        None, description="默认爬虫名称，行内的 spider_name 优先"
+    ),
+    format: Optional[str] = Query(
+        None,
+        pattern="^(csv|ndjson)$",
+        description="请求体格式，默认按 Content-Type 判断",
+    ),
+) -> Dict[str, Any]:
+    """流式导入爬取目标
+
+    请求体为CSV（表头包含 url，可选 spider_name 列；无表头时第一列为URL）
+    或NDJSON（每行 {"url": ..., "spider_name": ...}）。
+    URL规范化后按 (spider_name, URL哈希) 去重，返回写入和跳过的行数。
+    """
+    if format is None:
+        content_type = request.headers.get("content-type", "")
+        format = "ndjson" if "json" in content_type else "csv"
+    try:
+        return await target_ingest.ingest(request.stream(), format, spider_name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"导入爬取目标失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"导入爬取目标失败: {str(e)}")
+
+
+@router.get("/")
+async def list_targets(
+    spider_name: str = Query(...),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor"),
+    db: AsyncSession = Depends(get_db),
+) -> Dict[str, Any]:
+    """按ID分页查看爬虫的目标及其爬取状态"""
+    try:
+        targets, next_cursor = await fetch_keyset_page(
+            db,
+            select(SpiderTarget).where(SpiderTarget.spider_name == spider_name),
+            SpiderTarget.id,
+            limit,
+            decode_cursor(cursor),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "targets": [
+            {
+                "id": target.id,
+                "url": target.url,
+                "host": target.host,
+                "priority": target.priority,
+                "revisit_seconds": target.revisit_seconds,
+                "next_due_at": target.next_due_at,
+                "last_captured_at": target.last_captured_at,
+                "last_status": target.last_status,
+                "last_error": target.last_error,
+                "failures": target.failures,
+            }
+            for target in targets
+        ],
+        "next_cursor": next_cursor,
+    }
+
+
+@router.get("/crawl")
+async def get_crawl_stats() -> Dict[str, Any]:
+    """爬取调度状态：活跃爬虫、排队和执行中的目标数以及最繁忙的主机"""
+    return crawl_frontier.stats()
+
+
+@router.post("/crawl/{spider_id}/start")
+async def start_crawl(spider_id: int) -> Dict[str, Any]:
+    """按爬虫的目标列表持续爬取，目标到期后自动重新爬取"""
+    try:
+        return await crawl_frontier.start_crawl(spider_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@router.post("/crawl/{spider_id}/stop")
+async def stop_crawl(spider_id: int) -> Dict[str, Any]:
+    """停止爬取，已排队的目标释放回数据库"""
+    try:
+        return await crawl_frontier.stop_crawl(spider_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
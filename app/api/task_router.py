@@ -1,39 +1,83 @@
 from datetime import datetime
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
-from fastapi import APIRouter, Body, Depends, HTTPException
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
 from app.database.database import get_db
 from app.database.models import Task as DBTask
 from app.schemas.task import TaskCreate, TaskResponse
+from app.database.pagination import decode_cursor
 from app.services.task_logic_service import TaskLogicService
-from app.services.task_service import get_running_tasks
+from app.services.task_service import get_scheduled_tasks
 
 # 创建定时任务路由器
 router = APIRouter(prefix="/tasks", tags=["tasks"])
 
 
 @router.get("/running", response_model=Dict[str, Any])
-async def get_running_tasks_endpoint():
-    """获取正在运行的定时任务
+async def get_running_tasks_endpoint(
+    response: Response,
+    limit: int = Query(1000, ge=1, le=10000),
+    cursor: Optional[str] = Query(None, description="上一页响应头 X-Next-Cursor 的值"),
+):
+    """按任务ID分页获取正在运行的定时任务
 
     Returns:
-        包含正在运行的任务数量和任务列表的字典
+        包含本页任务数量、任务列表和下一页游标的字典，
+        还有下一页时同时通过响应头 X-Next-Cursor 返回游标
     """
-    return get_running_tasks()
+    try:
+        after_id = decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    page = await get_scheduled_tasks(after_id, limit)
+    if page["next_cursor"] is not None:
+        response.headers["X-Next-Cursor"] = page["next_cursor"]
+    return page
 
 
 # 同时支持带和不带斜杠的URL格式
 @router.get("/")
 @router.get("", include_in_schema=False)
-async def list_tasks(db: Session = Depends(get_db)) -> List[TaskResponse]:
-    """获取所有定时任务列表"""
-    tasks = await TaskLogicService.get_all_tasks(db)
+async def list_tasks(
+    response: Response,
+    db: Session = Depends(get_db),
+    limit: int = Query(1000, ge=1, le=10000),
+    cursor: Optional[str] = Query(None, description="上一页响应头 X-Next-Cursor 的值"),
+) -> List[TaskResponse]:
+    """按ID分页获取定时任务列表
+
+    不再一次返回全部任务：单页最多 limit 条，还有下一页时通过响应头 X-Next-Cursor
+    返回游标，全量导出请使用 /tasks/export。
+    """
+    try:
+        tasks, next_cursor = await TaskLogicService.get_tasks_page(db, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = next_cursor
     return tasks
 
 
+@router.get("/export")
+async def export_tasks(
+    page_size: int = Query(1000, ge=1, le=10000),
+) -> StreamingResponse:
+    """以NDJSON流式导出全部定时任务，每行一个任务"""
+
+    async def generate():
+        async for tasks in TaskLogicService.iter_tasks(page_size):
+            yield "".join(
+                TaskResponse.model_validate(task).model_dump_json() + "\n"
+                for task in tasks
+            )
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
 # 同时支持带和不带斜杠的URL格式
 @router.post("/", response_model=TaskResponse)
 @router.post("", include_in_schema=False)
@@ -7,7 +7,7 @@ from typing import AsyncGenerator, Optional
 from urllib.parse import urlparse
 
 from cryptography.fernet import Fernet
-from sqlalchemy import text
+from sqlalchemy import inspect, select, text
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import (AsyncSession, async_sessionmaker,
                                     create_async_engine)
@@ -92,12 +92,40 @@ class DatabaseManager:
         try:
             async with self.engine.begin() as conn:
                 await conn.run_sync(Base.metadata.create_all)
+                await conn.run_sync(self._add_missing_columns)
             logger.info("Database tables created successfully")
             return True
         except Exception as e:
             logger.error(f"Failed to create database tables: {e}", exc_info=True)
             return False
 
+    @staticmethod
+    def _add_missing_columns(sync_conn) -> None:
+        """为已存在的表补齐模型中新增的列和索引（create_all 不会修改已有表）"""
+        inspector = inspect(sync_conn)
+        existing_tables = set(inspector.get_table_names())
+        preparer = sync_conn.dialect.identifier_preparer
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=sync_conn.dialect)
+                sync_conn.execute(
+                    text(
+                        f"ALTER TABLE {preparer.format_table(table)} "
+                        f"ADD COLUMN {preparer.format_column(column)} {column_type}"
+                    )
+                )
+                logger.info(f"Added column {table.name}.{column.name}")
+            existing_indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(sync_conn)
+                    logger.info(f"Created index {index.name}")
+
     async def close_database(self):
         """关闭数据库连接"""
         if self.engine:
@@ -109,6 +137,14 @@ class DatabaseManager:
             self.engine = None
             self.async_session = None
 
+    def session(self) -> AsyncSession:
+        """创建一个短生命周期会话，配合 async with 使用，退出时归还连接"""
+        if not self.async_session:
+            logger.error("Database session factory is not initialized")
+            raise RuntimeError("Database not initialized")
+
+        return self.async_session()
+
     def get_db(self) -> AsyncGenerator[AsyncSession, None]:
         """数据库会话依赖项"""
         if not self.async_session:
@@ -167,18 +203,123 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
         yield session
 
 
+# --- 服务启停 ---
+async def start_services() -> None:
+    """初始化数据库并启动截图相关的常驻服务，API进程和调度进程共用"""
+    success = await db_manager.init_database()
+    if not success:
+        logger.critical("Failed to initialize database")
+        raise RuntimeError("Database initialization failed")
+
+    from app.services.browser_pool import browser_pool
+    from app.services.node_sidecar import node_sidecar
+    from app.services.run_history import run_history
+    from app.services.run_tracker import run_tracker
+    from app.services.spider_cache import spider_cache
+    from app.services.spider_worker_pool import spider_worker_pool
+    from app.services.target_ingest import target_ingest
+    from app.services.work_queue import work_queue
+
+    # 补齐旧爬取目标的 url_hash 和 host
+    try:
+        await target_ingest.backfill()
+    except Exception as e:
+        logger.error(f"Failed to backfill spider targets: {e}", exc_info=True)
+
+    # 预热爬虫定义缓存，运行爬虫时不再读取数据库
+    try:
+        await spider_cache.start()
+    except Exception as e:
+        logger.error(f"Failed to warm spider definition cache: {e}", exc_info=True)
+
+    # 预热浏览器池；Python爬虫在工作进程中运行时由各工作进程自己的浏览器池截图，
+    # 本进程的浏览器池只在首次使用时启动
+    if not spider_worker_pool.enabled:
+        try:
+            await browser_pool.start()
+        except Exception as e:
+            # 浏览器池启动失败不影响启动，首次使用时会再次尝试
+            logger.error(f"Failed to start browser pool: {e}", exc_info=True)
+
+    # 启动常驻Node Puppeteer工作进程
+    try:
+        await node_sidecar.start()
+    except Exception as e:
+        logger.error(f"Failed to start node sidecar: {e}", exc_info=True)
+
+    # 启动Python爬虫工作进程池，预导入所有激活的Python爬虫模块
+    if spider_worker_pool.enabled:
+        from app.database.models import Spider
+
+        async with db_manager.async_session() as session:
+            result = await session.execute(
+                select(Spider.module_path).where(
+                    Spider.language == "python", Spider.is_active.is_(True)
+                )
+            )
+            module_paths = [path for path in result.scalars().all() if path]
+        await spider_worker_pool.start(preload=module_paths)
+
+    # 启动工作队列，所有截图运行由固定数量的工作协程执行
+    work_queue.start()
+    run_history.start()
+    run_tracker.start()
+
+
+async def stop_services() -> None:
+    """关闭常驻服务和数据库连接"""
+    from app.services.browser_pool import browser_pool
+    from app.services.crawl_frontier import crawl_frontier
+    from app.services.image_pipeline import image_pipeline
+    from app.services.node_sidecar import node_sidecar
+    from app.services.run_history import run_history
+    from app.services.run_tracker import run_tracker
+    from app.services.screenshot_store import screenshot_store
+    from app.services.spider_cache import spider_cache
+    from app.services.spider_worker_pool import spider_worker_pool
+    from app.services.work_queue import work_queue
+
+    # 先停止爬取调度，释放已领取但未完成的目标
+    await crawl_frontier.close()
+    await work_queue.close()
+    # 工作队列停止后写入剩余的运行历史
+    await run_history.close()
+    await run_tracker.close()
+    await browser_pool.close()
+    await node_sidecar.close()
+    await spider_worker_pool.close()
+    image_pipeline.close()
+    screenshot_store.close()
+    await spider_cache.close()
+    await db_manager.close_database()
+
+
 # --- Lifespan管理器 ---
 @asynccontextmanager
 async def lifespan_manager(app):
     """管理应用生命周期"""
     logger.info("Starting application with local database...")
-    success = await db_manager.init_database()
-    if not success:
-        logger.critical("Failed to initialize database")
-        raise RuntimeError("Database initialization failed")
+    await start_services()
+
+    # 调度器默认运行在独立进程（python -m app.scheduler）中，
+    # 开启 scheduler.embedded 时在API进程内运行（仅适合单个API进程）
+    from app.services.task_service import (SCHEDULER_EMBEDDED,
+                                           start_scheduler_service,
+                                           stop_scheduler_service)
+
+    if SCHEDULER_EMBEDDED:
+        await start_scheduler_service()
+
+    # 恢复重启前未完成的批量任务
+    from app.services.batch_jobs import batch_runner
+
+    batch_runner.start()
 
     yield
 
     logger.info("Shutting down application...")
-    await db_manager.close_database()
+    await batch_runner.close()
+    if SCHEDULER_EMBEDDED:
+        await stop_scheduler_service()
+    await stop_services()
     logger.info("Application shutdown complete")
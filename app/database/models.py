@@ -1,5 +1,5 @@
-from sqlalchemy import (Boolean, Column, DateTime, ForeignKey, Integer, String,
-                        func)
+from sqlalchemy import (JSON, Boolean, Column, DateTime, ForeignKey, Index,
+                        Integer, String, func, text)
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
@@ -29,9 +29,29 @@ class Spider(BaseModel):
 
 class SpiderTarget(BaseModel):
     __tablename__ = "spider_targets"
+    __table_args__ = (
+        # 同一爬虫下按规范化URL的哈希去重，批量导入时 ON CONFLICT DO NOTHING
+        Index("ux_spider_targets_name_hash", "spider_name", "url_hash", unique=True),
+        # 爬取调度按到期时间领取目标
+        Index("ix_spider_targets_due", "spider_name", "next_due_at"),
+    )
 
     spider_name = Column(String, index=True)
     url = Column(String)
+    # 规范化URL的 sha1 十六进制摘要
+    url_hash = Column(String(40), nullable=True)
+    host = Column(String, nullable=True)
+    # 同一主机内数值越大越先爬取
+    priority = Column(Integer, default=0)
+    # 重新爬取间隔（秒），为空时使用 [frontier] 的全局默认值
+    revisit_seconds = Column(Integer, nullable=True)
+    # 为空表示从未爬取过，立即到期
+    next_due_at = Column(DateTime, nullable=True)
+    last_captured_at = Column(DateTime, nullable=True)
+    last_status = Column(String, nullable=True)
+    last_error = Column(String, nullable=True)
+    # 连续失败次数，成功后清零
+    failures = Column(Integer, default=0)
 
 
 class Task(BaseModel):
@@ -42,8 +62,135 @@ class Task(BaseModel):
     cron_expression = Column(String)
     description = Column(String, nullable=True)
     job_id = Column(String, nullable=True)
+    # 调度策略，为空时使用 config.toml 中 [scheduler] 的全局默认值
+    jitter_seconds = Column(Integer, nullable=True)
+    spread_seconds = Column(Integer, nullable=True)
+    max_instances = Column(Integer, nullable=True)
+    coalesce = Column(Boolean, nullable=True)
+    misfire_grace_time = Column(Integer, nullable=True)
+    skip_if_running = Column(Boolean, nullable=True)
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
 
     # 外键关系: 一个任务属于一个爬虫
     spider = relationship("Spider", back_populates="tasks")
+
+
+class SpiderRun(BaseModel):
+    __tablename__ = "spider_runs"
+
+    spider_id = Column(Integer, index=True)
+    task_id = Column(Integer, nullable=True, index=True)
+    # 触发来源: api / scheduler / batch 等
+    source = Column(String, nullable=True)
+    status = Column(String)
+    error = Column(String, nullable=True)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    duration_ms = Column(Integer)
+    # 阶段名 -> 从上一阶段到该阶段的耗时（毫秒）
+    phase_durations = Column(JSON, nullable=True)
+    artifact_path = Column(String, nullable=True)
+
+    __table_args__ = (Index("ix_spider_runs_spider_started", "spider_id", "started_at"),)
+
+
+class AsyncRun(BaseModel):
+    """异步提交的运行状态快照，任意API进程都可查询，不依赖提交运行的进程"""
+
+    __tablename__ = "async_runs"
+
+    run_id = Column(String(32), unique=True, index=True)
+    spider_id = Column(Integer)
+    # queued / running / succeeded / failed
+    status = Column(String, index=True)
+    # RunRecord.to_dict() 的内容，包括阶段事件和结果
+    snapshot = Column(JSON)
+
+
+class Job(BaseModel):
+    """持久化的爬虫执行队列，多个工作节点通过 FOR UPDATE SKIP LOCKED 领取"""
+
+    __tablename__ = "jobs"
+
+    spider_id = Column(Integer, index=True)
+    task_id = Column(Integer, nullable=True)
+    params = Column(JSON, nullable=True)
+    # 数值越小越先执行
+    priority = Column(Integer, default=0)
+    source = Column(String, nullable=True)
+    # queued / running / succeeded / failed
+    status = Column(String, default="queued")
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=3)
+    run_after = Column(DateTime, default=func.now())
+    locked_by = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    result = Column(JSON, nullable=True)
+    error = Column(String, nullable=True)
+
+    __table_args__ = (
+        # 只索引待领取的任务，领取查询按优先级和ID顺序扫描
+        Index(
+            "ix_jobs_claim",
+            "priority",
+            "id",
+            postgresql_where=text("status = 'queued'"),
+        ),
+        Index(
+            "ix_jobs_lease",
+            "lease_expires_at",
+            postgresql_where=text("status = 'running'"),
+        ),
+    )
+
+
+class BatchJob(BaseModel):
+    """长时间运行的批量爬取任务，逐项记录进度，重启后从检查点继续"""
+
+    __tablename__ = "batch_jobs"
+
+    spider_id = Column(Integer, index=True)
+    params = Column(JSON, nullable=True)
+    description = Column(String, nullable=True)
+    # running / completed / cancelled
+    status = Column(String, default="running")
+    concurrency = Column(Integer, default=4)
+    # 单个条目的最大尝试次数
+    max_attempts = Column(Integer, default=3)
+    total_items = Column(Integer, default=0)
+    completed_items = Column(Integer, default=0)
+    failed_items = Column(Integer, default=0)
+    locked_by = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class BatchJobItem(Base):
+    """批量任务中的单个URL"""
+
+    __tablename__ = "batch_job_items"
+
+    id = Column(Integer, primary_key=True)
+    batch_id = Column(Integer, ForeignKey("batch_jobs.id", ondelete="CASCADE"))
+    url = Column(String)
+    # pending / succeeded / failed
+    status = Column(String, default="pending")
+    attempts = Column(Integer, default=0)
+    error = Column(String, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # 恢复时按ID顺序扫描未完成的条目
+        Index(
+            "ix_batch_job_items_pending",
+            "batch_id",
+            "id",
+            postgresql_where=text("status = 'pending'"),
+        ),
+        Index("ix_batch_job_items_batch_status", "batch_id", "status"),
+    )
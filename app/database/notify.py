@@ -0,0 +1,107 @@
+import asyncio
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.database import db_manager
+
+logger = logging.getLogger(__name__)
+
+# API进程通知调度进程任务变更的频道
+TASK_CHANNEL = "task_changes"
+
+
+async def notify(db: AsyncSession, channel: str, payload: Dict[str, Any]) -> None:
+    """在当前事务中发送通知，事务提交后才会送达监听方"""
+    await db.execute(
+        text("SELECT pg_notify(:channel, :payload)"),
+        {"channel": channel, "payload": json.dumps(payload)},
+    )
+
+
+class PgListener:
+    """在独立连接上 LISTEN 指定频道
+
+    连接断开后自动重连，重连成功后调用 on_reconnect，
+    用于补偿断线期间可能错过的通知。
+    """
+
+    def __init__(
+        self,
+        channel: str,
+        handler: Callable[[Dict[str, Any]], Awaitable[None]],
+        on_reconnect: Optional[Callable[[], Awaitable[None]]] = None,
+        retry_seconds: float = 5,
+    ):
+        self.channel = channel
+        self.handler = handler
+        self.on_reconnect = on_reconnect
+        self.retry_seconds = retry_seconds
+        self._task: Optional[asyncio.Task] = None
+        self._handlers: set = set()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def _on_notification(self, connection, pid, channel, payload) -> None:
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            logger.warning(f"Ignoring malformed notification on {channel}: {payload}")
+            return
+        task = asyncio.create_task(self._handle(message))
+        self._handlers.add(task)
+        task.add_done_callback(self._handlers.discard)
+
+    async def _handle(self, message: Dict[str, Any]) -> None:
+        try:
+            await self.handler(message)
+        except Exception as e:
+            logger.error(f"Error handling notification {message}: {e}", exc_info=True)
+
+    async def _run(self) -> None:
+        connected_before = False
+        while True:
+            try:
+                async with db_manager.engine.connect() as conn:
+                    raw = await conn.get_raw_connection()
+                    driver = raw.driver_connection
+                    closed = asyncio.Event()
+                    on_terminate = lambda _: closed.set()
+                    driver.add_termination_listener(on_terminate)
+                    await driver.add_listener(self.channel, self._on_notification)
+                    logger.info(f"Listening on channel {self.channel}")
+
+                    if connected_before and self.on_reconnect is not None:
+                        await self.on_reconnect()
+                    connected_before = True
+
+                    try:
+                        # 定期检查连接状态，直到连接被关闭
+                        while not closed.is_set() and not driver.is_closed():
+                            try:
+                                await asyncio.wait_for(closed.wait(), 30)
+                            except asyncio.TimeoutError:
+                                await driver.execute("SELECT 1")
+                    finally:
+                        # 连接会归还连接池，移除监听避免被其他请求继承
+                        driver.remove_termination_listener(on_terminate)
+                        if not driver.is_closed():
+                            await driver.remove_listener(
+                                self.channel, self._on_notification
+                            )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Listener on {self.channel} failed: {e}")
+            await asyncio.sleep(self.retry_seconds)
@@ -0,0 +1,78 @@
+import base64
+import json
+from typing import Any, AsyncIterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Select, func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.database import db_manager
+
+
+def encode_cursor(last_id: int) -> str:
+    """把最后一行的ID编码为不透明的游标"""
+    payload = json.dumps({"id": last_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> int:
+    """解析游标，返回上一页最后一行的ID；为空时返回0，格式错误抛出ValueError"""
+    if not cursor:
+        return 0
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return int(json.loads(base64.urlsafe_b64decode(padded))["id"])
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+async def fetch_keyset_page(
+    db: AsyncSession, stmt: Select, id_column: Any, limit: int, after_id: int = 0
+) -> Tuple[Sequence[Any], Optional[str]]:
+    """按ID读取一页（WHERE id > 游标 ORDER BY id LIMIT n），返回本页和下一页游标
+
+    多读一行判断是否还有下一页，没有时游标为None。
+    """
+    result = await db.execute(
+        stmt.where(id_column > after_id).order_by(id_column).limit(limit + 1)
+    )
+    rows = result.scalars().all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1].id)
+    return rows, None
+
+
+async def iter_keyset_pages(
+    stmt: Select, id_column: Any, page_size: int = 1000
+) -> AsyncIterator[List[Any]]:
+    """按ID分页遍历全部结果，每页使用一个短会话，内存占用与总行数无关"""
+    last_id = 0
+    while True:
+        async with db_manager.session() as db:
+            result = await db.execute(
+                stmt.where(id_column > last_id).order_by(id_column).limit(page_size)
+            )
+            rows = result.scalars().all()
+        if not rows:
+            return
+        yield rows
+        if len(rows) < page_size:
+            return
+        last_id = rows[-1].id
+
+
+async def count_rows(db: AsyncSession, model: Any, approximate: bool = False) -> int:
+    """统计行数；approximate 时读取 pg_class 中的统计估计值，表未分析过时退回精确计数"""
+    if approximate:
+        result = await db.execute(
+            text(
+                "SELECT reltuples::bigint FROM pg_class "
+                "WHERE oid = to_regclass(:table_name)"
+            ),
+            {"table_name": model.__tablename__},
+        )
+        estimate = result.scalar()
+        if estimate is not None and estimate >= 0:
+            return int(estimate)
+    result = await db.execute(select(func.count()).select_from(model))
+    return result.scalar_one()
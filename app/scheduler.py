@@ -0,0 +1,41 @@
+"""独立的调度进程
+
+    python -m app.scheduler
+
+运行APScheduler和定时任务的截图执行，API进程（可多worker）不再各自运行一份定时任务。
+API进程通过数据库通知（LISTEN/NOTIFY）告知任务的创建和删除。
+"""
+import asyncio
+import logging
+import signal
+
+from app.database.database import start_services, stop_services
+from app.services.task_service import (start_scheduler_service,
+                                       stop_scheduler_service)
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def main() -> None:
+    logger.info("Starting scheduler process...")
+    await start_services()
+    await start_scheduler_service()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    try:
+        await stop.wait()
+    finally:
+        logger.info("Shutting down scheduler process...")
+        await stop_scheduler_service()
+        await stop_services()
+        logger.info("Scheduler process shutdown complete")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -8,6 +8,28 @@ class TaskBase(BaseModel):
     spider_id: int = Field(..., example=1)
     cron_expression: str = Field(..., example="0 0 * * *")
     description: Optional[str] = Field(None, example="每日运行爬虫")
+    # 调度策略，不传时使用全局默认值
+    jitter_seconds: Optional[int] = Field(
+        None, ge=0, example=30, description="每次触发随机延后 0~N 秒"
+    )
+    spread_seconds: Optional[int] = Field(
+        None,
+        ge=0,
+        example=300,
+        description="按任务ID在 0~N 秒内固定错开触发时间，分散相同的cron",
+    )
+    max_instances: Optional[int] = Field(
+        None, ge=1, example=1, description="同一任务同时运行的最大实例数"
+    )
+    coalesce: Optional[bool] = Field(
+        None, example=True, description="错过的多次触发合并为一次"
+    )
+    misfire_grace_time: Optional[int] = Field(
+        None, ge=1, example=60, description="错过触发后仍允许执行的宽限秒数"
+    )
+    skip_if_running: Optional[bool] = Field(
+        None, example=True, description="同一爬虫已在运行时跳过本次触发"
+    )
 
 
 class TaskCreate(TaskBase):
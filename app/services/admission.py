@@ -0,0 +1,162 @@
+import logging
+import math
+from typing import Any, Dict, Optional
+
+from app.services.browser_pool import browser_pool
+from app.services.spider_worker_pool import spider_worker_pool
+from app.services.work_queue import work_queue
+from config.load_config import get_setting
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    """截图容量已满，请求被拒绝"""
+
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class AdmissionTicket:
+    """一次被接纳的运行占用的容量，运行结束后释放（可重复调用）"""
+
+    def __init__(
+        self,
+        controller: "AdmissionController",
+        client: str,
+        weight: int,
+        client_units: int = 0,
+    ):
+        self._controller = controller
+        self.client = client
+        # 占用的总容量，批量请求即其实际并发数
+        self.weight = weight
+        # 计入调用方在途上限的数量
+        self.client_units = client_units
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._controller._release(self)
+
+
+class AdmissionController:
+    """API截图运行的准入控制
+
+    统计在途（执行中和排队中）的API运行，超过容量时立即拒绝而不是让请求堆积到超时：
+    - 单个调用方超过自己的在途上限返回429，避免一个调用方占满容量，
+      批量请求按一个请求计入调用方上限，按实际并发占用总容量；
+    - 总容量已满返回503；
+    - 工作队列中有定时任务排队时，API在途数不超过 工作协程数 - 为定时任务保留的数量，
+      保证定时任务不被API请求饿死。
+    拒绝时附带根据队列深度和执行耗时估算的 Retry-After。
+    """
+
+    def __init__(self):
+        self.enabled: bool = get_setting("admission.enabled", True)
+        # 未配置时按截图容量，配置值也不超过该容量：Python爬虫在工作进程中串行运行时
+        # 容量为工作进程数，否则为本进程浏览器池的容量
+        capacity = (
+            spider_worker_pool.size
+            if spider_worker_pool.enabled
+            else browser_pool.capacity
+        )
+        configured: int = get_setting("admission.max_in_flight", 0)
+        self.max_in_flight: int = min(configured, capacity) if configured else capacity
+        self.per_client_max_in_flight: int = get_setting(
+            "admission.per_client_max_in_flight", 4
+        )
+        self.reserved_for_scheduler: int = get_setting(
+            "admission.reserved_for_scheduler", 2
+        )
+        self.max_retry_after: int = get_setting("admission.max_retry_after", 60)
+        self.in_flight = 0
+        self._by_client: Dict[str, int] = {}
+        self.admitted = 0
+        self.rejected_client = 0
+        self.rejected_capacity = 0
+
+    def _limit(self) -> int:
+        """当前允许的API在途数"""
+        if work_queue.pending("scheduler"):
+            return min(
+                self.max_in_flight,
+                max(1, work_queue.workers - self.reserved_for_scheduler),
+            )
+        return self.max_in_flight
+
+    def retry_after(self) -> int:
+        """估算排队中的任务被消化所需的秒数"""
+        per_run = work_queue.run_seconds_p50() or 1.0
+        waves = (work_queue.depth + 1) / max(work_queue.workers, 1)
+        return max(1, min(self.max_retry_after, math.ceil(per_run * waves)))
+
+    def acquire(
+        self, client: str, weight: int = 1, client_units: Optional[int] = None
+    ) -> AdmissionTicket:
+        """为调用方申请容量，容量不足时抛出 AdmissionRejected
+
+        weight 为占用的总容量，client_units 为计入调用方在途上限的数量（默认等于weight）。
+        weight 超过总容量时按总容量计，避免大批量请求永远无法被接纳，
+        调用方应按返回的 ticket.weight 执行。
+        """
+        if not self.enabled:
+            return AdmissionTicket(self, client, 0)
+
+        client_in_flight = self._by_client.get(client, 0)
+        weight = max(1, min(weight, self.max_in_flight))
+        client_units = weight if client_units is None else client_units
+        if client_in_flight + client_units > self.per_client_max_in_flight:
+            self.rejected_client += 1
+            raise AdmissionRejected(
+                429,
+                f"Too many in-flight runs for client {client} "
+                f"({client_in_flight}/{self.per_client_max_in_flight})",
+                self.retry_after(),
+            )
+
+        limit = self._limit()
+        if self.in_flight > 0 and self.in_flight + weight > limit:
+            self.rejected_capacity += 1
+            raise AdmissionRejected(
+                503,
+                f"Capture capacity is full ({self.in_flight}/{limit} in flight)",
+                self.retry_after(),
+            )
+
+        self.in_flight += weight
+        self._by_client[client] = client_in_flight + client_units
+        self.admitted += 1
+        return AdmissionTicket(self, client, weight, client_units)
+
+    def _release(self, ticket: AdmissionTicket) -> None:
+        if not ticket.weight:
+            return
+        self.in_flight -= ticket.weight
+        remaining = self._by_client.get(ticket.client, 0) - ticket.client_units
+        if remaining > 0:
+            self._by_client[ticket.client] = remaining
+        else:
+            self._by_client.pop(ticket.client, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "in_flight": self.in_flight,
+            "limit": self._limit(),
+            "max_in_flight": self.max_in_flight,
+            "per_client_max_in_flight": self.per_client_max_in_flight,
+            "clients": len(self._by_client),
+            "admitted": self.admitted,
+            "rejected_client": self.rejected_client,
+            "rejected_capacity": self.rejected_capacity,
+            "retry_after": self.retry_after(),
+        }
+
+
+# --- 实例化 ---
+admission = AdmissionController()
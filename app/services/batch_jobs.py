@@ -0,0 +1,567 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+
+from sqlalchemy import func, insert, literal, or_, select, update
+
+from app.database.database import db_manager
+from app.database.models import BatchJob, BatchJobItem, SpiderTarget
+from app.services.spider_logic_service import SpiderLogicService
+from app.services.work_queue import PRIORITY_BACKGROUND
+from config.load_config import get_setting
+
+logger = logging.getLogger(__name__)
+
+# 创建批量任务时每次插入的条目数
+_INSERT_CHUNK = 5000
+
+
+def _lease_interval(seconds: float):
+    return func.make_interval(0, 0, 0, 0, 0, 0, seconds)
+
+
+class _BatchRun:
+    """本节点上正在执行的一个批量任务"""
+
+    def __init__(self, row: Any):
+        self.batch_id: int = row.id
+        self.spider_id: int = row.spider_id
+        self.params: Dict[str, Any] = row.params or {}
+        self.concurrency: int = row.concurrency or 1
+        self.max_attempts: int = row.max_attempts or 1
+        self.task: Optional[asyncio.Task] = None
+        self.in_flight: Set[asyncio.Task] = set()
+        # 尚未写入检查点的条目结果
+        self.updates: List[Dict[str, Any]] = []
+        self.succeeded = 0
+        self.failed = 0
+        self.lock = asyncio.Lock()
+        self.started = time.monotonic()
+        # 本次恢复以来完成（成功或最终失败）的条目数，用于计算吞吐量
+        self.finished = 0
+        # 任务被其他节点接管，本节点不再写入结果
+        self.lost_lease = False
+        # 任务已被取消，写入已完成条目的检查点后停止
+        self.cancelled = False
+
+    @property
+    def stopped(self) -> bool:
+        return self.lost_lease or self.cancelled
+
+
+class BatchJobRunner:
+    """可恢复的长时间批量爬取任务
+
+    每个条目的结果先缓存在内存中，按数量或时间间隔批量写入检查点，
+    检查点同时更新任务计数并续约；进程重启或节点宕机后，
+    租约过期的任务由任一节点领取，只重新执行尚未写入检查点的条目。
+    失败的条目在本轮扫描结束后单独重试，直到达到最大尝试次数。
+    """
+
+    def __init__(self):
+        self.enabled: bool = get_setting("batch_jobs.enabled", True)
+        self.node_id: str = get_setting(
+            "job_queue.node_id", f"{socket.gethostname()}-{os.getpid()}"
+        )
+        self.default_concurrency: int = get_setting("batch_jobs.concurrency", 4)
+        self.max_attempts: int = get_setting("batch_jobs.max_attempts", 3)
+        self.page_size: int = get_setting("batch_jobs.page_size", 500)
+        self.checkpoint_size: int = get_setting("batch_jobs.checkpoint_size", 200)
+        self.checkpoint_interval: float = get_setting(
+            "batch_jobs.checkpoint_interval", 5
+        )
+        self.lease_seconds: float = get_setting("batch_jobs.lease_seconds", 120)
+        self.reap_interval: float = get_setting("batch_jobs.reap_interval", 30)
+        self.retry_backoff: float = get_setting("batch_jobs.retry_backoff", 30)
+        self._runs: Dict[int, _BatchRun] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    # --- 启停 ---
+    @property
+    def started(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self) -> None:
+        """恢复未完成的批量任务，并定期领取其他节点遗留的任务"""
+        if self.started or not self.enabled:
+            return
+        self._tasks = [
+            asyncio.create_task(self._resume_loop()),
+            asyncio.create_task(self._checkpoint_loop()),
+        ]
+        logger.info(f"Batch job runner {self.node_id} started")
+
+    async def close(self) -> None:
+        """停止所有批量任务，写入检查点后交还租约，由下次启动或其他节点继续"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        runs = list(self._runs.values())
+        for run in runs:
+            run.task.cancel()
+        await asyncio.gather(*(run.task for run in runs), return_exceptions=True)
+        if runs:
+            try:
+                async with db_manager.session() as db:
+                    await db.execute(
+                        update(BatchJob)
+                        .where(
+                            BatchJob.id.in_([run.batch_id for run in runs]),
+                            BatchJob.locked_by == self.node_id,
+                        )
+                        .values(locked_by=None, lease_expires_at=None)
+                        .execution_options(synchronize_session=False)
+                    )
+                    await db.commit()
+            except Exception as e:
+                logger.error(f"Failed to release batch jobs of {self.node_id}: {e}")
+
+    # --- 创建 ---
+    async def create(
+        self,
+        spider_id: int,
+        urls: Optional[List[str]] = None,
+        from_targets: bool = False,
+        params: Optional[Dict[str, Any]] = None,
+        concurrency: Optional[int] = None,
+        max_attempts: Optional[int] = None,
+        description: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """创建批量任务并在本节点开始执行
+
+        条目来自 urls，或 from_targets 时来自该爬虫在 spider_targets 中的全部目标。
+        """
+        spider = await SpiderLogicService.load_spider_definition(spider_id)
+        urls = [url.strip() for url in urls or [] if url and url.strip()]
+        if not urls and not from_targets:
+            raise ValueError("No URLs given")
+
+        async with db_manager.session() as db:
+            batch = BatchJob(
+                spider_id=spider_id,
+                params=params or {},
+                description=description,
+                status="running",
+                concurrency=concurrency or self.default_concurrency,
+                max_attempts=max_attempts or self.max_attempts,
+                total_items=0,
+                completed_items=0,
+                failed_items=0,
+                started_at=func.now(),
+            )
+            db.add(batch)
+            await db.flush()
+            total = 0
+            for start in range(0, len(urls), _INSERT_CHUNK):
+                chunk = urls[start : start + _INSERT_CHUNK]
+                await db.execute(
+                    insert(BatchJobItem),
+                    [
+                        {
+                            "batch_id": batch.id,
+                            "url": url,
+                            "status": "pending",
+                            "attempts": 0,
+                        }
+                        for url in chunk
+                    ],
+                )
+                total += len(chunk)
+            if from_targets:
+                result = await db.execute(
+                    insert(BatchJobItem).from_select(
+                        ["batch_id", "url", "status", "attempts"],
+                        select(
+                            literal(batch.id),
+                            SpiderTarget.url,
+                            literal("pending"),
+                            literal(0),
+                        )
+                        .where(SpiderTarget.spider_name == spider.name)
+                        .order_by(SpiderTarget.id),
+                    )
+                )
+                total += result.rowcount
+            batch.total_items = total
+            batch_id = batch.id
+            await db.commit()
+
+        logger.info(
+            f"Created batch job {batch_id} of spider {spider_id} with {total} items"
+        )
+        await self._claim(batch_id)
+        return await self.progress(batch_id)
+
+    # --- 领取和恢复 ---
+    async def _claim(self, batch_id: Optional[int] = None) -> List[int]:
+        """领取运行中且无人持有租约的批量任务并在本节点执行"""
+        conditions = [
+            BatchJob.status == "running",
+            or_(
+                BatchJob.locked_by.is_(None),
+                BatchJob.lease_expires_at < func.now(),
+            ),
+        ]
+        if batch_id is not None:
+            conditions.append(BatchJob.id == batch_id)
+        stmt = (
+            update(BatchJob)
+            .where(*conditions)
+            .values(
+                locked_by=self.node_id,
+                lease_expires_at=func.now() + _lease_interval(self.lease_seconds),
+            )
+            .returning(
+                BatchJob.id,
+                BatchJob.spider_id,
+                BatchJob.params,
+                BatchJob.concurrency,
+                BatchJob.max_attempts,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        async with db_manager.session() as db:
+            rows = (await db.execute(stmt)).all()
+            await db.commit()
+        for row in rows:
+            run = _BatchRun(row)
+            run.task = asyncio.create_task(self._run(run))
+            self._runs[run.batch_id] = run
+            run.task.add_done_callback(
+                lambda _, batch_id=run.batch_id: self._runs.pop(batch_id, None)
+            )
+            logger.info(f"Batch job {run.batch_id} running on {self.node_id}")
+        return [row.id for row in rows]
+
+    async def _resume_loop(self) -> None:
+        while True:
+            try:
+                await self._claim()
+            except Exception as e:
+                logger.error(f"Failed to resume batch jobs: {e}")
+            await asyncio.sleep(self.reap_interval)
+
+    # --- 执行 ---
+    async def _run(self, run: _BatchRun) -> None:
+        try:
+            spider = await SpiderLogicService.load_spider_definition(run.spider_id)
+        except ValueError as e:
+            logger.error(f"Batch job {run.batch_id} cannot run: {e}")
+            await self._finish(run, "cancelled")
+            return
+
+        semaphore = asyncio.Semaphore(run.concurrency)
+        try:
+            while True:
+                # 按ID扫描一轮待处理条目，本轮失败的条目留到下一轮重试
+                after_id = 0
+                scanned = 0
+                while not run.stopped:
+                    async with db_manager.session() as db:
+                        rows = (
+                            await db.execute(
+                                select(
+                                    BatchJobItem.id,
+                                    BatchJobItem.url,
+                                    BatchJobItem.attempts,
+                                )
+                                .where(
+                                    BatchJobItem.batch_id == run.batch_id,
+                                    BatchJobItem.status == "pending",
+                                    BatchJobItem.id > after_id,
+                                )
+                                .order_by(BatchJobItem.id)
+                                .limit(self.page_size)
+                            )
+                        ).all()
+                    if not rows:
+                        break
+                    scanned += len(rows)
+                    for row in rows:
+                        await semaphore.acquire()
+                        if run.stopped:
+                            semaphore.release()
+                            break
+                        task = asyncio.create_task(self._run_item(run, spider, row))
+                        run.in_flight.add(task)
+                        task.add_done_callback(run.in_flight.discard)
+                        task.add_done_callback(lambda _: semaphore.release())
+                    after_id = rows[-1].id
+                if run.in_flight:
+                    await asyncio.gather(*run.in_flight, return_exceptions=True)
+                await self._checkpoint(run)
+                if run.lost_lease:
+                    logger.warning(f"Batch job {run.batch_id} lease lost, stopping")
+                    return
+                if run.cancelled:
+                    await self._finish(run, "cancelled")
+                    return
+                if not scanned or not await self._pending_count(run.batch_id):
+                    break
+                await asyncio.sleep(self.retry_backoff)
+            await self._finish(run, "completed")
+        except asyncio.CancelledError:
+            # 执行中的条目不写入结果，恢复后重新执行
+            for task in list(run.in_flight):
+                task.cancel()
+            await asyncio.gather(*run.in_flight, return_exceptions=True)
+            await self._checkpoint(run)
+            if run.cancelled and not run.lost_lease:
+                await self._finish(run, "cancelled")
+            raise
+        except Exception as e:
+            logger.error(f"Batch job {run.batch_id} failed: {e}", exc_info=True)
+            await self._checkpoint(run)
+
+    async def _run_item(self, run: _BatchRun, spider: Any, row: Any) -> None:
+        error: Optional[str] = None
+        try:
+            result = await SpiderLogicService.run_loaded_spider(
+                spider,
+                {**run.params, "url": row.url},
+                priority=PRIORITY_BACKGROUND,
+                source="batch",
+            )
+            inner = result.get("result") if isinstance(result, dict) else None
+            if isinstance(inner, dict) and inner.get("status") == "error":
+                error = inner.get("message", "error")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            error = str(e)
+
+        attempts = row.attempts + 1
+        update_row = {"id": row.id, "attempts": attempts, "error": error}
+        if error is None:
+            update_row.update(status="succeeded", finished_at=datetime.now())
+            run.succeeded += 1
+            run.finished += 1
+        elif attempts >= run.max_attempts:
+            update_row.update(status="failed", finished_at=datetime.now())
+            run.failed += 1
+            run.finished += 1
+        else:
+            # 保持 pending，下一轮扫描时重试
+            update_row.update(status="pending", finished_at=None)
+        run.updates.append(update_row)
+        if len(run.updates) >= self.checkpoint_size:
+            await self._checkpoint(run)
+
+    async def _pending_count(self, batch_id: int) -> int:
+        async with db_manager.session() as db:
+            result = await db.execute(
+                select(func.count())
+                .select_from(BatchJobItem)
+                .where(
+                    BatchJobItem.batch_id == batch_id,
+                    BatchJobItem.status == "pending",
+                )
+            )
+            return result.scalar_one()
+
+    # --- 检查点 ---
+    async def _checkpoint(self, run: _BatchRun) -> None:
+        """把已完成条目的结果和任务计数写入同一事务，并续约
+
+        任务已被取消时仍写入本节点已完成的条目，之后停止执行；
+        只有租约被其他节点接管时才丢弃未写入的结果。
+        """
+        async with run.lock:
+            updates, run.updates = run.updates, []
+            succeeded, run.succeeded = run.succeeded, 0
+            failed, run.failed = run.failed, 0
+            try:
+                async with db_manager.session() as db:
+                    owned = await db.execute(
+                        update(BatchJob)
+                        .where(
+                            BatchJob.id == run.batch_id,
+                            BatchJob.locked_by == self.node_id,
+                            BatchJob.status.in_(("running", "cancelled")),
+                        )
+                        .values(
+                            completed_items=BatchJob.completed_items + succeeded,
+                            failed_items=BatchJob.failed_items + failed,
+                            lease_expires_at=func.now()
+                            + _lease_interval(self.lease_seconds),
+                        )
+                        .returning(BatchJob.status)
+                        .execution_options(synchronize_session=False)
+                    )
+                    status = owned.scalar()
+                    if status is None:
+                        await db.rollback()
+                        run.lost_lease = True
+                        return
+                    # 成功和失败的行字段相同，按主键批量更新
+                    if updates:
+                        await db.execute(update(BatchJobItem), updates)
+                    await db.commit()
+                    if status == "cancelled":
+                        run.cancelled = True
+            except Exception as e:
+                logger.error(f"Failed to checkpoint batch job {run.batch_id}: {e}")
+                run.updates[:0] = updates
+                run.succeeded += succeeded
+                run.failed += failed
+
+    async def _checkpoint_loop(self) -> None:
+        """定期为所有本节点的批量任务写入检查点并续约"""
+        while True:
+            await asyncio.sleep(self.checkpoint_interval)
+            for run in list(self._runs.values()):
+                await self._checkpoint(run)
+                if run.stopped and run.task is not None:
+                    run.task.cancel()
+
+    async def _finish(self, run: _BatchRun, status: str) -> None:
+        async with db_manager.session() as db:
+            await db.execute(
+                update(BatchJob)
+                .where(BatchJob.id == run.batch_id, BatchJob.locked_by == self.node_id)
+                .values(
+                    status=status,
+                    finished_at=func.now(),
+                    locked_by=None,
+                    lease_expires_at=None,
+                )
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+        logger.info(f"Batch job {run.batch_id} {status}")
+
+    # --- 管理 ---
+    async def cancel(self, batch_id: int) -> Dict[str, Any]:
+        """取消批量任务
+
+        本节点执行的任务等待执行中的条目取消、已完成条目写入检查点后返回；
+        在其他节点执行时，该节点在下一次检查点写入已完成条目后停止。
+        """
+        async with db_manager.session() as db:
+            result = await db.execute(
+                update(BatchJob)
+                .where(BatchJob.id == batch_id, BatchJob.status == "running")
+                .values(status="cancelled", finished_at=func.now())
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+        if result.rowcount == 0:
+            raise ValueError(f"Batch job {batch_id} is not running")
+        run = self._runs.get(batch_id)
+        if run is not None and run.task is not None:
+            run.cancelled = True
+            run.task.cancel()
+            await asyncio.gather(run.task, return_exceptions=True)
+        return await self.progress(batch_id)
+
+    async def retry_failed(self, batch_id: int) -> Dict[str, Any]:
+        """把最终失败的条目重置为待处理，重新运行批量任务"""
+        async with db_manager.session() as db:
+            batch = await db.get(BatchJob, batch_id)
+            if batch is None:
+                raise ValueError(f"Batch job {batch_id} not found")
+            if batch.status == "running":
+                raise ValueError(f"Batch job {batch_id} is still running")
+            result = await db.execute(
+                update(BatchJobItem)
+                .where(
+                    BatchJobItem.batch_id == batch_id,
+                    BatchJobItem.status == "failed",
+                )
+                .values(status="pending", attempts=0, finished_at=None)
+                .execution_options(synchronize_session=False)
+            )
+            reset = result.rowcount
+            await db.execute(
+                update(BatchJob)
+                .where(BatchJob.id == batch_id)
+                .values(
+                    status="running",
+                    failed_items=BatchJob.failed_items - reset,
+                    finished_at=None,
+                    locked_by=None,
+                    lease_expires_at=None,
+                )
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+        await self._claim(batch_id)
+        return await self.progress(batch_id)
+
+    # --- 进度 ---
+    async def progress(self, batch_id: int) -> Optional[Dict[str, Any]]:
+        """进度、吞吐量（条目/秒）和预计剩余时间"""
+        async with db_manager.session() as db:
+            batch = await db.get(BatchJob, batch_id)
+            if batch is None:
+                return None
+            elapsed = (
+                await db.execute(
+                    select(func.extract("epoch", func.now() - BatchJob.started_at))
+                    .where(BatchJob.id == batch_id)
+                )
+            ).scalar()
+
+        total = batch.total_items or 0
+        done = (batch.completed_items or 0) + (batch.failed_items or 0)
+        run = self._runs.get(batch_id)
+        if run is not None:
+            # 本节点执行时，包含尚未写入检查点的条目，吞吐量按本次恢复以来计算
+            done += run.succeeded + run.failed
+            throughput = run.finished / max(time.monotonic() - run.started, 1e-9)
+        else:
+            throughput = done / float(elapsed) if elapsed else 0.0
+        remaining = max(total - done, 0)
+        eta = remaining / throughput if throughput > 0 else None
+        return {
+            "batch_id": batch.id,
+            "spider_id": batch.spider_id,
+            "description": batch.description,
+            "status": batch.status,
+            "total": total,
+            "succeeded": (batch.completed_items or 0)
+            + (run.succeeded if run else 0),
+            "failed": (batch.failed_items or 0) + (run.failed if run else 0),
+            "remaining": remaining,
+            "percent": round(done * 100 / total, 2) if total else 100.0,
+            "throughput_per_second": round(throughput, 3),
+            "eta_seconds": round(eta) if eta is not None else None,
+            "concurrency": batch.concurrency,
+            "max_attempts": batch.max_attempts,
+            "running_on": batch.locked_by,
+            "in_flight": len(run.in_flight) if run else 0,
+            "started_at": batch.started_at,
+            "finished_at": batch.finished_at,
+        }
+
+    async def list_items(
+        self,
+        batch_id: int,
+        status: Optional[str] = None,
+        after_id: int = 0,
+        limit: int = 100,
+    ) -> List[Dict[str, Any]]:
+        """按ID分页查看条目，可按状态过滤（如只看失败的条目）"""
+        stmt = select(BatchJobItem).where(
+            BatchJobItem.batch_id == batch_id, BatchJobItem.id > after_id
+        )
+        if status is not None:
+            stmt = stmt.where(BatchJobItem.status == status)
+        async with db_manager.session() as db:
+            result = await db.execute(stmt.order_by(BatchJobItem.id).limit(limit))
+            return [
+                {
+                    column.name: getattr(item, column.name)
+                    for column in BatchJobItem.__table__.columns
+                }
+                for item in result.scalars().all()
+            ]
+
+
+# --- 实例化 ---
+batch_runner = BatchJobRunner()
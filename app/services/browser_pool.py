@@ -0,0 +1,309 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
+
+from playwright.async_api import (Browser, BrowserContext, Page, Playwright,
+                                  async_playwright)
+
+from app.services.storage_state import storage_state_cache
+from config.load_config import get_config_instance, get_setting
+
+logger = logging.getLogger(__name__)
+
+
+class _PooledBrowser:
+    """浏览器池中的单个浏览器实例及其使用计数"""
+
+    def __init__(self, browser: Browser):
+        self.browser = browser
+        # 已分配的页面数（用于达到上限后回收）
+        self.pages_served = 0
+        # 当前正在使用的上下文数
+        self.active = 0
+        # 达到回收上限后不再分配新的上下文，空闲后关闭
+        self.retiring = False
+        # 已加载登录态的空闲上下文: cookie文件路径 -> [(文件版本, 上下文)]
+        self.idle_contexts: Dict[str, List[Tuple[float, BrowserContext]]] = {}
+
+
+class BrowserPool:
+    """进程级常驻Chromium浏览器池
+
+    启动时预热N个浏览器，每次运行分配一个全新的上下文和页面，
+    浏览器累计服务M个页面后在空闲时回收重启。
+    """
+
+    def __init__(self):
+        self.size: int = get_setting("browser_pool.size", 2)
+        self.max_pages_per_browser: int = get_setting(
+            "browser_pool.max_pages_per_browser", 50
+        )
+        # 每个浏览器同时打开的页面数，用于估算池的并发容量
+        self.max_active_per_browser: int = get_setting(
+            "browser_pool.max_active_per_browser", 4
+        )
+        self.headless: bool = get_setting("browser_pool.headless", False)
+        self.launch_args: List[str] = get_setting("browser_pool.launch_args", [])
+        # 启动时预热的登录态cookie文件（相对项目根目录）
+        self.storage_states: List[str] = get_setting("browser_pool.storage_states", [])
+        self.max_idle_contexts: int = get_setting(
+            "browser_pool.max_idle_contexts_per_browser", 2
+        )
+        self._playwright: Optional[Playwright] = None
+        self._browsers: List[_PooledBrowser] = []
+        self._lock = asyncio.Lock()
+        self._started = False
+        # 正在启动（已占用名额但尚未加入池中）的浏览器数
+        self._launching = 0
+        # 每次启动结束（无论成功失败）时设置，唤醒等待空位的调用方
+        self._launch_done = asyncio.Event()
+
+    @property
+    def started(self) -> bool:
+        return self._started
+
+    async def start(self) -> None:
+        """启动Playwright并预热浏览器"""
+        async with self._lock:
+            if self._started:
+                return
+            self._playwright = await async_playwright().start()
+            try:
+                for _ in range(self.size):
+                    self._browsers.append(_PooledBrowser(await self._launch()))
+            except Exception:
+                # 部分浏览器启动失败时关闭已启动的浏览器和Playwright，下次再整体重试
+                for pooled in self._browsers:
+                    await self._close_browser(pooled)
+                self._browsers.clear()
+                await self._playwright.stop()
+                self._playwright = None
+                raise
+            self._started = True
+            logger.info(f"Browser pool started with {self.size} browsers")
+
+        await self._prewarm()
+
+    async def _prewarm(self) -> None:
+        """为每个浏览器预先创建已登录的上下文"""
+        base_dir = get_config_instance().BASE_DIR
+        for relative_path in self.storage_states:
+            key = str(base_dir / relative_path)
+            version, state = await asyncio.to_thread(storage_state_cache.get, key)
+            if version is None:
+                continue
+            for pooled in list(self._browsers):
+                context = await pooled.browser.new_context(storage_state=state)
+                pooled.idle_contexts.setdefault(key, []).append((version, context))
+            logger.info(f"Pre-warmed authenticated contexts for {key}")
+
+    async def close(self) -> None:
+        """关闭所有浏览器并停止Playwright"""
+        async with self._lock:
+            if not self._started:
+                return
+            for pooled in self._browsers:
+                await self._close_browser(pooled)
+            self._browsers.clear()
+            if self._playwright:
+                await self._playwright.stop()
+                self._playwright = None
+            self._started = False
+            logger.info("Browser pool closed")
+
+    async def _launch(self) -> Browser:
+        """启动一个新的Chromium实例"""
+        return await self._playwright.chromium.launch(
+            headless=self.headless, args=self.launch_args
+        )
+
+    async def _close_browser(self, pooled: _PooledBrowser) -> None:
+        pooled.idle_contexts.clear()
+        try:
+            await pooled.browser.close()
+        except Exception as e:
+            logger.warning(f"Error closing pooled browser: {e}")
+
+    async def _checkout(self) -> _PooledBrowser:
+        """选出当前负载最低的可用浏览器
+
+        池中浏览器不足时在锁内只占用名额，在锁外启动Chromium，
+        启动期间其他调用方仍可使用已有的浏览器。
+        """
+        if not self._started:
+            await self.start()
+
+        while True:
+            async with self._lock:
+                # 剔除已断开的浏览器
+                for pooled in [
+                    b for b in self._browsers if not b.browser.is_connected()
+                ]:
+                    logger.warning("Pooled browser disconnected, discarding")
+                    self._browsers.remove(pooled)
+
+                candidates = [b for b in self._browsers if not b.retiring]
+                if len(candidates) + self._launching < self.size:
+                    self._launching += 1
+                    break
+                if candidates:
+                    return self._assign(min(candidates, key=lambda b: b.active))
+                # 名额都在启动中，等待其中一个完成
+                launch_done = self._launch_done
+            await launch_done.wait()
+
+        try:
+            browser = await self._launch()
+        except BaseException:
+            async with self._lock:
+                self._launch_finished()
+            raise
+        async with self._lock:
+            self._launch_finished()
+            if self._started:
+                pooled = _PooledBrowser(browser)
+                self._browsers.append(pooled)
+                return self._assign(pooled)
+        # 启动期间浏览器池已关闭
+        await browser.close()
+        raise RuntimeError("Browser pool closed")
+
+    def _launch_finished(self) -> None:
+        """释放启动名额并唤醒等待的调用方（需持有锁）"""
+        self._launching -= 1
+        self._launch_done.set()
+        self._launch_done = asyncio.Event()
+
+    def _assign(self, pooled: _PooledBrowser) -> _PooledBrowser:
+        """为一次使用占用浏览器，达到回收上限后标记为待回收"""
+        pooled.active += 1
+        pooled.pages_served += 1
+        if pooled.pages_served >= self.max_pages_per_browser:
+            pooled.retiring = True
+        return pooled
+
+    async def _checkin(self, pooled: _PooledBrowser) -> None:
+        """归还浏览器，若已达到回收条件且空闲则关闭"""
+        async with self._lock:
+            pooled.active -= 1
+            if pooled.retiring and pooled.active == 0:
+                if pooled in self._browsers:
+                    self._browsers.remove(pooled)
+                await self._close_browser(pooled)
+                logger.info(
+                    f"Recycled browser after {pooled.pages_served} pages"
+                )
+
+    @asynccontextmanager
+    async def acquire_context(
+        self, **context_options: Any
+    ) -> AsyncIterator[BrowserContext]:
+        """从池中获取一个全新的浏览器上下文，使用完毕后自动关闭"""
+        pooled = await self._checkout()
+        context: Optional[BrowserContext] = None
+        try:
+            context = await pooled.browser.new_context(**context_options)
+            yield context
+        finally:
+            if context is not None:
+                await self._close_context(context)
+            await self._checkin(pooled)
+
+    @asynccontextmanager
+    async def acquire_auth_context(
+        self, storage_state_path: Union[str, Path]
+    ) -> AsyncIterator[BrowserContext]:
+        """获取已加载登录态的上下文，使用完毕后归还池中复用
+
+        cookie文件只在mtime变化时重新解析，命中空闲上下文时无需任何登录态设置。
+        """
+        key = str(storage_state_path)
+        current_version = storage_state_cache.version(key)
+        pooled = await self._checkout()
+        context: Optional[BrowserContext] = None
+        version: Optional[float] = None
+        try:
+            idle = pooled.idle_contexts.get(key, [])
+            while idle:
+                version, context = idle.pop()
+                if version == current_version:
+                    break
+                # cookie文件已更新，丢弃旧上下文
+                await self._close_context(context)
+                context = None
+            if context is None:
+                version, state = await asyncio.to_thread(storage_state_cache.get, key)
+                context = await pooled.browser.new_context(storage_state=state)
+            yield context
+        finally:
+            if context is not None:
+                await self._return_auth_context(pooled, key, version, context)
+            await self._checkin(pooled)
+
+    async def _return_auth_context(
+        self,
+        pooled: _PooledBrowser,
+        key: str,
+        version: Optional[float],
+        context: BrowserContext,
+    ) -> None:
+        """归还登录态上下文：关闭页面后放回空闲列表，不满足复用条件时直接关闭"""
+        idle = pooled.idle_contexts.setdefault(key, [])
+        reusable = (
+            not pooled.retiring
+            and version is not None
+            and version == storage_state_cache.version(key)
+            and len(idle) < self.max_idle_contexts
+        )
+        if not reusable:
+            await self._close_context(context)
+            return
+        try:
+            for page in list(context.pages):
+                await page.close()
+        except Exception as e:
+            logger.warning(f"Error cleaning up browser context: {e}")
+            await self._close_context(context)
+            return
+        idle.append((version, context))
+
+    async def _close_context(self, context: BrowserContext) -> None:
+        try:
+            await context.close()
+        except Exception as e:
+            logger.warning(f"Error closing browser context: {e}")
+
+    @asynccontextmanager
+    async def acquire_page(self, **context_options: Any) -> AsyncIterator[Page]:
+        """获取一个新页面（位于独立的上下文中）"""
+        async with self.acquire_context(**context_options) as context:
+            yield await context.new_page()
+
+    @property
+    def capacity(self) -> int:
+        """浏览器池可同时承载的页面数"""
+        return self.size * self.max_active_per_browser
+
+    def stats(self) -> Dict[str, Any]:
+        """浏览器池当前状态"""
+        return {
+            "started": self._started,
+            "size": self.size,
+            "capacity": self.capacity,
+            "max_pages_per_browser": self.max_pages_per_browser,
+            "browsers": [
+                {
+                    "active": b.active,
+                    "pages_served": b.pages_served,
+                    "retiring": b.retiring,
+                    "idle_contexts": sum(len(v) for v in b.idle_contexts.values()),
+                }
+                for b in self._browsers
+            ],
+        }
+
+
+# --- 实例化 ---
+browser_pool = BrowserPool()
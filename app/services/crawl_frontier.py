@@ -0,0 +1,472 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+from urllib.parse import urlsplit
+
+from sqlalchemy import (Boolean, Float, and_, bindparam, case, func, or_,
+                        select, update)
+
+from app.database.database import db_manager
+from app.database.models import SpiderTarget
+from app.schemas.spider import SpiderResponse
+from app.services.spider_logic_service import SpiderLogicService
+from app.services.work_queue import PRIORITY_BACKGROUND
+from config.load_config import get_setting
+
+logger = logging.getLogger(__name__)
+
+
+def _lease_interval(seconds: Any):
+    return func.make_interval(0, 0, 0, 0, 0, 0, seconds)
+
+
+# 按主键批量写回爬取结果；时间都用数据库的 now()，与领取和租约的比较保持同一时钟
+_targets = SpiderTarget.__table__
+_RECORD_CRAWL = (
+    update(_targets)
+    .where(_targets.c.id == bindparam("b_id"))
+    .values(
+        next_due_at=func.now() + _lease_interval(bindparam("b_delay", type_=Float)),
+        last_captured_at=case(
+            (bindparam("b_captured", type_=Boolean), func.now()),
+            else_=_targets.c.last_captured_at,
+        ),
+        last_status=bindparam("b_status"),
+        last_error=bindparam("b_error"),
+        failures=bindparam("b_failures"),
+        updated_at=func.now(),
+    )
+)
+
+
+class _Target:
+    __slots__ = ("id", "spider_id", "url", "priority", "revisit_seconds", "failures")
+
+    def __init__(self, row: Any, spider_id: int):
+        self.id = row.id
+        self.spider_id = spider_id
+        self.url = row.url
+        self.priority = row.priority or 0
+        self.revisit_seconds = row.revisit_seconds
+        self.failures = row.failures or 0
+
+
+class _HostQueue:
+    """单个主机的待爬目标和礼貌性状态"""
+
+    def __init__(self, host: str):
+        self.host = host
+        self.targets: Deque[_Target] = deque()
+        self.in_flight = 0
+        # 下一次允许向该主机发起请求的 monotonic 时间
+        self.next_allowed = 0.0
+        self.completed = 0
+        self.failed = 0
+
+
+class CrawlFrontier:
+    """按 spider_targets 表持续爬取目标的调度器
+
+    每个主机一个待爬队列，按主机轮询分发，保证同一主机的并发和请求频率不超过上限，
+    同时让全局并发数保持在工作队列容量附近，使浏览器池在多个域名间保持饱和。
+    目标用 FOR UPDATE SKIP LOCKED 领取并延后 next_due_at 作为租约，多个节点可同时运行；
+    爬取完成后批量写回 last_captured_at 并按重新爬取间隔计算下一次到期时间。
+    """
+
+    def __init__(self):
+        self.concurrency: int = get_setting(
+            "frontier.concurrency", get_setting("work_queue.workers", 8)
+        )
+        self.per_host_concurrency: int = get_setting("frontier.per_host_concurrency", 2)
+        # 每个主机每秒最多发起的请求数
+        self.per_host_rate: float = get_setting("frontier.per_host_rate", 1.0)
+        self.revisit_seconds: int = get_setting("frontier.revisit_seconds", 86400)
+        self.retry_seconds: int = get_setting("frontier.retry_seconds", 600)
+        self.lease_seconds: int = get_setting("frontier.lease_seconds", 900)
+        # 本地队列的目标总数和单个主机的目标数上限
+        self.max_queued: int = get_setting("frontier.max_queued", 2000)
+        self.per_host_queue: int = get_setting("frontier.per_host_queue", 20)
+        self.poll_interval: float = get_setting("frontier.poll_interval", 5)
+        self.flush_interval: float = get_setting("frontier.flush_interval", 2)
+        self._renewed_at = time.monotonic()
+        # 爬虫ID -> 爬虫定义
+        self._spiders: Dict[int, SpiderResponse] = {}
+        self._hosts: Dict[str, _HostQueue] = {}
+        # 有待爬目标的主机，按轮询顺序排列
+        self._ready: Deque[str] = deque()
+        self._queued = 0
+        self._in_flight: Dict[int, asyncio.Task] = {}
+        self._updates: List[Dict[str, Any]] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        self.completed = 0
+        self.failed = 0
+
+    # --- 启停 ---
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start_crawl(self, spider_id: int) -> Dict[str, Any]:
+        """开始按目标列表持续爬取指定爬虫"""
+        spider = await SpiderLogicService.load_spider_definition(spider_id)
+        self._spiders[spider_id] = spider
+        if not self.running:
+            self._wakeup = asyncio.Event()
+            self._tasks = [
+                asyncio.create_task(self._refill_loop()),
+                asyncio.create_task(self._dispatch_loop()),
+                asyncio.create_task(self._flush_loop()),
+            ]
+            logger.info("Crawl frontier started")
+        self._wakeup.set()
+        logger.info(f"Crawling targets of spider {spider_id} ({spider.name})")
+        return {"spider_id": spider_id, "spider_name": spider.name, "active": True}
+
+    async def stop_crawl(self, spider_id: int) -> Dict[str, Any]:
+        """停止爬取指定爬虫，已排队的目标释放回数据库，执行中的目标继续完成"""
+        spider = self._spiders.pop(spider_id, None)
+        if spider is None:
+            raise ValueError(f"Spider {spider_id} is not being crawled")
+        released = self._drop_queued(lambda target: target.spider_id == spider_id)
+        await self._release(released)
+        logger.info(f"Stopped crawling targets of spider {spider_id}")
+        return {"spider_id": spider_id, "active": False, "released": len(released)}
+
+    async def close(self) -> None:
+        """停止调度，取消执行中的目标并释放所有已领取的目标"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        in_flight = list(self._in_flight.values())
+        for task in in_flight:
+            task.cancel()
+        await asyncio.gather(*in_flight, return_exceptions=True)
+        await self._release(self._drop_queued(lambda target: True))
+        await self.flush()
+        self._spiders.clear()
+
+    # --- 领取 ---
+    async def _claim(self, spider: SpiderResponse, limit: int) -> List[Any]:
+        """领取到期目标，跳过其他节点锁定的行
+
+        每个主机一次最多领取 per_host_queue 个，且只为本地队列已空的主机领取，
+        单个主机的目标数量再多也不会占满本地队列，排队时间远小于租约。
+        """
+        busy_hosts = [host for host, queue in self._hosts.items() if queue.targets]
+        conditions = [
+            SpiderTarget.spider_name == spider.name,
+            or_(
+                SpiderTarget.next_due_at.is_(None),
+                SpiderTarget.next_due_at <= func.now(),
+            ),
+        ]
+        if busy_hosts:
+            conditions.append(
+                or_(SpiderTarget.host.is_(None), SpiderTarget.host.notin_(busy_hosts))
+            )
+        order = (
+            SpiderTarget.next_due_at.asc().nulls_first(),
+            SpiderTarget.priority.desc(),
+            SpiderTarget.id,
+        )
+        # 窗口函数不能与 FOR UPDATE 同层使用，先在子查询中按主机编号
+        ranked = (
+            select(
+                SpiderTarget.id,
+                func.row_number()
+                .over(partition_by=SpiderTarget.host, order_by=order)
+                .label("rank"),
+            )
+            .where(and_(*conditions))
+            .subquery()
+        )
+        claimable = (
+            select(SpiderTarget.id)
+            .where(
+                SpiderTarget.id.in_(
+                    select(ranked.c.id).where(ranked.c.rank <= self.per_host_queue)
+                )
+            )
+            .order_by(*order)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        stmt = (
+            update(SpiderTarget)
+            .where(SpiderTarget.id.in_(claimable))
+            .values(next_due_at=func.now() + _lease_interval(self.lease_seconds))
+            .returning(
+                SpiderTarget.id,
+                SpiderTarget.url,
+                SpiderTarget.host,
+                SpiderTarget.priority,
+                SpiderTarget.revisit_seconds,
+                SpiderTarget.failures,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        async with db_manager.session() as db:
+            rows = (await db.execute(stmt)).all()
+            await db.commit()
+        return rows
+
+    async def _refill_loop(self) -> None:
+        while True:
+            free = self.max_queued - self._queued
+            if free > 0 and self._spiders:
+                # 在活跃爬虫之间平均分配本轮的领取数量
+                share = max(1, free // len(self._spiders))
+                for spider_id, spider in list(self._spiders.items()):
+                    try:
+                        rows = await self._claim(spider, share)
+                    except Exception as e:
+                        logger.error(f"Failed to claim targets of spider {spider_id}: {e}")
+                        continue
+                    if spider_id not in self._spiders:
+                        # 领取期间爬取已停止
+                        await self._release([row.id for row in rows])
+                        continue
+                    for row in rows:
+                        host = row.host or urlsplit(row.url).hostname or ""
+                        self._enqueue(host, _Target(row, spider_id))
+                    if rows:
+                        self._wakeup.set()
+            await asyncio.sleep(self.poll_interval)
+
+    def _enqueue(self, host: str, target: _Target) -> None:
+        queue = self._hosts.get(host)
+        if queue is None:
+            queue = self._hosts[host] = _HostQueue(host)
+        if not queue.targets:
+            self._ready.append(host)
+        # 同一主机内按优先级排序，优先级高的插到前面
+        if queue.targets and target.priority > queue.targets[-1].priority:
+            index = next(
+                i for i, t in enumerate(queue.targets) if target.priority > t.priority
+            )
+            queue.targets.insert(index, target)
+        else:
+            queue.targets.append(target)
+        self._queued += 1
+
+    def _drop_queued(self, predicate) -> List[int]:
+        """移除本地队列中满足条件的目标，返回其ID"""
+        dropped: List[int] = []
+        for queue in self._hosts.values():
+            kept = deque()
+            for target in queue.targets:
+                if predicate(target):
+                    dropped.append(target.id)
+                else:
+                    kept.append(target)
+            queue.targets = kept
+        self._queued -= len(dropped)
+        self._ready = deque(host for host in self._ready if self._hosts[host].targets)
+        return dropped
+
+    async def _release(self, target_ids: List[int]) -> None:
+        """把未爬取的目标立即标记为到期，供本节点或其他节点重新领取"""
+        if not target_ids:
+            return
+        try:
+            async with db_manager.session() as db:
+                await db.execute(
+                    update(SpiderTarget)
+                    .where(SpiderTarget.id.in_(target_ids))
+                    .values(next_due_at=func.now())
+                    .execution_options(synchronize_session=False)
+                )
+                await db.commit()
+        except Exception as e:
+            # 租约到期后目标仍会被重新领取
+            logger.error(f"Failed to release {len(target_ids)} targets: {e}")
+
+    # --- 分发 ---
+    def _next_ready(self) -> Optional[float]:
+        """按主机轮询取出一个可以立即爬取的目标并启动；返回None表示已启动，
+        否则返回最早可以再次尝试的等待秒数（没有待爬目标时为poll_interval）"""
+        now = time.monotonic()
+        wait = self.poll_interval
+        min_interval = 1 / self.per_host_rate if self.per_host_rate > 0 else 0
+        for _ in range(len(self._ready)):
+            host = self._ready[0]
+            self._ready.rotate(-1)
+            queue = self._hosts[host]
+            if queue.in_flight >= self.per_host_concurrency:
+                continue
+            if queue.next_allowed > now:
+                wait = min(wait, queue.next_allowed - now)
+                continue
+            target = queue.targets.popleft()
+            self._queued -= 1
+            if not queue.targets:
+                self._ready.remove(host)
+            queue.in_flight += 1
+            queue.next_allowed = now + min_interval
+            task = asyncio.create_task(self._crawl(queue, target))
+            self._in_flight[target.id] = task
+            task.add_done_callback(lambda _, tid=target.id: self._on_done(tid))
+            return None
+        return wait
+
+    async def _dispatch_loop(self) -> None:
+        while True:
+            if len(self._in_flight) < self.concurrency:
+                wait = self._next_ready()
+                if wait is None:
+                    continue
+            else:
+                wait = self.poll_interval
+            # 等待目标完成、新目标入队或某个主机的频率限制解除
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+
+    def _on_done(self, target_id: int) -> None:
+        self._in_flight.pop(target_id, None)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _crawl(self, queue: _HostQueue, target: _Target) -> None:
+        error: Optional[str] = None
+        try:
+            # 每次从进程内缓存读取，爬虫定义更新后立即生效
+            spider = await SpiderLogicService.load_spider_definition(target.spider_id)
+            result = await SpiderLogicService.run_loaded_spider(
+                spider,
+                {"url": target.url, "cache": False},
+                priority=PRIORITY_BACKGROUND,
+                source="frontier",
+            )
+            inner = result.get("result") if isinstance(result, dict) else None
+            if isinstance(inner, dict) and inner.get("status") == "error":
+                error = inner.get("message", "error")
+        except asyncio.CancelledError:
+            await self._release([target.id])
+            raise
+        except Exception as e:
+            error = str(e)
+        finally:
+            queue.in_flight -= 1
+
+        if error is None:
+            queue.completed += 1
+            self.completed += 1
+            self._updates.append(
+                {
+                    "b_id": target.id,
+                    "b_captured": True,
+                    "b_delay": target.revisit_seconds or self.revisit_seconds,
+                    "b_status": "succeeded",
+                    "b_error": None,
+                    "b_failures": 0,
+                }
+            )
+        else:
+            queue.failed += 1
+            self.failed += 1
+            logger.warning(f"Crawl of target {target.id} ({target.url}) failed: {error}")
+            # 连续失败时逐步拉长重试间隔，不超过重新爬取间隔
+            failures = target.failures + 1
+            retry = min(
+                self.retry_seconds * failures,
+                target.revisit_seconds or self.revisit_seconds,
+            )
+            self._updates.append(
+                {
+                    "b_id": target.id,
+                    "b_captured": False,
+                    "b_delay": retry,
+                    "b_status": "failed",
+                    "b_error": error[:1000],
+                    "b_failures": failures,
+                }
+            )
+
+    # --- 状态写回 ---
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+            if time.monotonic() - self._renewed_at >= self.lease_seconds / 3:
+                await self._renew_leases()
+                self._renewed_at = time.monotonic()
+
+    async def _renew_leases(self) -> None:
+        """为仍在本地排队的目标续约，避免租约过期后被重复领取"""
+        queued = [t.id for q in self._hosts.values() for t in q.targets]
+        queued.extend(self._in_flight)
+        if not queued:
+            return
+        try:
+            async with db_manager.session() as db:
+                await db.execute(
+                    update(SpiderTarget)
+                    .where(SpiderTarget.id.in_(queued))
+                    .values(
+                        next_due_at=func.now() + _lease_interval(self.lease_seconds)
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+                await db.commit()
+        except Exception as e:
+            logger.error(f"Failed to renew leases of {len(queued)} targets: {e}")
+
+    async def flush(self) -> None:
+        """批量写回已完成目标的爬取状态，失败时保留到下一轮"""
+        if not self._updates:
+            return
+        updates, self._updates = self._updates, []
+        try:
+            async with db_manager.session() as db:
+                await db.execute(_RECORD_CRAWL, updates)
+                await db.commit()
+        except Exception as e:
+            logger.error(f"Failed to write crawl state of {len(updates)} targets: {e}")
+            self._updates[:0] = updates
+
+    # --- 状态 ---
+    def stats(self, top_hosts: int = 20) -> Dict[str, Any]:
+        busiest = sorted(
+            self._hosts.values(),
+            key=lambda q: (q.in_flight, len(q.targets)),
+            reverse=True,
+        )[:top_hosts]
+        return {
+            "running": self.running,
+            "spiders": [
+                {"spider_id": spider_id, "spider_name": spider.name}
+                for spider_id, spider in self._spiders.items()
+            ],
+            "concurrency": self.concurrency,
+            "per_host_concurrency": self.per_host_concurrency,
+            "per_host_rate": self.per_host_rate,
+            "in_flight": len(self._in_flight),
+            "queued": self._queued,
+            "hosts": len(self._hosts),
+            "ready_hosts": len(self._ready),
+            "completed": self.completed,
+            "failed": self.failed,
+            "pending_updates": len(self._updates),
+            "top_hosts": [
+                {
+                    "host": q.host,
+                    "queued": len(q.targets),
+                    "in_flight": q.in_flight,
+                    "completed": q.completed,
+                    "failed": q.failed,
+                }
+                for q in busiest
+            ],
+        }
+
+
+# --- 实例化 ---
+crawl_frontier = CrawlFrontier()
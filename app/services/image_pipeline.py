@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from typing import Any, Dict, List, Optional
+
+from config.load_config import get_setting
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow未安装时原样输出PNG
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+_EXTENSIONS = {"webp": "webp", "jpeg": "jpg", "png": "png"}
+
+
+def _save(image: "Image.Image", fmt: str, quality: int) -> bytes:
+    out = BytesIO()
+    if fmt == "jpeg":
+        image.convert("RGB").save(
+            out, "JPEG", quality=quality, optimize=True, progressive=True
+        )
+    elif fmt == "webp":
+        image.save(out, "WEBP", quality=quality, method=4)
+    else:
+        image.save(out, "PNG", optimize=True)
+    return out.getvalue()
+
+
+def _encode(
+    raw: bytes, fmt: str, quality: int, thumbnail_widths: List[int]
+) -> Dict[str, Any]:
+    """在子进程中执行：将原始PNG编码为目标格式并生成缩略图"""
+    image = Image.open(BytesIO(raw))
+    image.load()
+    width, height = image.size
+
+    thumbnails = []
+    for thumb_width in thumbnail_widths:
+        if thumb_width >= width:
+            continue
+        thumb = image.copy()
+        thumb.thumbnail((thumb_width, max(1, height * thumb_width // width)))
+        thumbnails.append(
+            {"width": thumb.size[0], "data": _save(thumb, fmt, quality)}
+        )
+
+    return {
+        "data": _save(image, fmt, quality),
+        "format": fmt,
+        "extension": _EXTENSIONS[fmt],
+        "width": width,
+        "height": height,
+        "thumbnails": thumbnails,
+    }
+
+
+class ImagePipeline:
+    """截图后处理流水线
+
+    在进程池中完成编码（WebP/JPEG/PNG优化）和缩略图生成，
+    事件循环和浏览器页面不会因压缩而阻塞。
+    """
+
+    def __init__(self):
+        fmt = str(get_setting("image.format", "webp")).lower()
+        self.format = "jpeg" if fmt == "jpg" else fmt
+        if self.format not in _EXTENSIONS:
+            logger.warning(f"Unsupported image format {fmt}, falling back to png")
+            self.format = "png"
+        self.quality: int = get_setting("image.quality", 80)
+        self.thumbnail_widths: List[int] = get_setting("image.thumbnail_widths", [])
+        self.workers: int = get_setting("image.workers", max(1, (os.cpu_count() or 2) // 2))
+        # 为False时在线程中编码，用于已经运行在独立进程中的爬虫工作进程
+        self.use_processes = True
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    async def encode(self, raw: bytes) -> Dict[str, Any]:
+        """编码原始PNG截图，返回编码结果和缩略图"""
+        if Image is None:
+            return {
+                "data": raw,
+                "format": "png",
+                "extension": "png",
+                "thumbnails": [],
+            }
+
+        if not self.use_processes:
+            return await asyncio.to_thread(
+                _encode, raw, self.format, self.quality, self.thumbnail_widths
+            )
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._get_executor(),
+            _encode,
+            raw,
+            self.format,
+            self.quality,
+            self.thumbnail_widths,
+        )
+
+    def close(self) -> None:
+        """关闭进程池"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# --- 实例化 ---
+image_pipeline = ImagePipeline()
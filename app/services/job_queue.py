@@ -0,0 +1,411 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, exists, func, insert, literal, select, update
+
+from app.database.database import db_manager
+from app.database.models import Job
+from app.database.notify import PgListener, notify
+from app.services.spider_logic_service import SpiderLogicService
+from app.services.work_queue import PRIORITY_API
+from config.load_config import get_setting
+
+logger = logging.getLogger(__name__)
+
+# 新任务入队时通知工作节点立即领取
+JOB_CHANNEL = "jobs"
+# skip_if_pending 入队时按爬虫加锁的咨询锁命名空间
+_ENQUEUE_LOCK = 19019
+
+
+def _lease_interval(seconds: float):
+    return func.make_interval(0, 0, 0, 0, 0, 0, seconds)
+
+
+def _to_json(value: Any) -> Any:
+    """结果中可能包含无法序列化的值，统一转为JSON兼容的结构"""
+    return json.loads(json.dumps(value, ensure_ascii=False, default=str))
+
+
+class JobQueue:
+    """基于Postgres的持久化执行队列
+
+    调度器和API把爬虫运行写入 jobs 表；每个工作节点用 FOR UPDATE SKIP LOCKED 领取任务，
+    领取后持有租约并定期心跳续约，节点宕机后租约过期的任务由任一节点回收重新入队。
+    不需要额外的消息中间件，吞吐随工作节点数量线性扩展。
+    """
+
+    def __init__(self):
+        self.enabled: bool = get_setting("job_queue.enabled", False)
+        self.node_id: str = get_setting(
+            "job_queue.node_id", f"{socket.gethostname()}-{os.getpid()}"
+        )
+        self.concurrency: int = get_setting(
+            "job_queue.concurrency", get_setting("work_queue.workers", 8)
+        )
+        self.lease_seconds: float = get_setting("job_queue.lease_seconds", 60)
+        self.poll_interval: float = get_setting("job_queue.poll_interval", 2)
+        self.reap_interval: float = get_setting("job_queue.reap_interval", 15)
+        self.max_attempts: int = get_setting("job_queue.max_attempts", 3)
+        self.retry_backoff: float = get_setting("job_queue.retry_backoff", 30)
+        self._running: Dict[int, asyncio.Task] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        self._listener: Optional[PgListener] = None
+        self.completed = 0
+        self.failed = 0
+
+    # --- 入队 ---
+
+    async def enqueue(
+        self,
+        spider_id: int,
+        params: Optional[Dict[str, Any]] = None,
+        priority: int = PRIORITY_API,
+        source: str = "api",
+        task_id: Optional[int] = None,
+        skip_if_pending: bool = False,
+    ) -> Optional[int]:
+        """写入一个任务并通知工作节点，返回任务ID
+
+        skip_if_pending 为真时，同一爬虫已有排队或运行中的任务则不再入队，返回None。
+        """
+        values = {
+            "spider_id": spider_id,
+            "task_id": task_id,
+            "params": _to_json(params or {}),
+            "priority": priority,
+            "source": source,
+            "status": "queued",
+            "attempts": 0,
+            "max_attempts": self.max_attempts,
+        }
+        async with db_manager.session() as db:
+            if skip_if_pending:
+                # 同一爬虫的入队串行化：READ COMMITTED 下并发的 NOT EXISTS 检查都会通过，
+                # 事务级咨询锁在提交时释放，后到者的检查能看到先到者提交的任务
+                await db.execute(
+                    select(func.pg_advisory_xact_lock(_ENQUEUE_LOCK, spider_id))
+                )
+                pending = exists().where(
+                    Job.spider_id == spider_id, Job.status.in_(("queued", "running"))
+                )
+                stmt = (
+                    insert(Job)
+                    .from_select(
+                        list(values),
+                        select(
+                            *[
+                                literal(value, Job.__table__.c[key].type)
+                                for key, value in values.items()
+                            ]
+                        ).where(~pending),
+                    )
+                    .returning(Job.id)
+                )
+            else:
+                stmt = insert(Job).values(**values).returning(Job.id)
+            job_id = (await db.execute(stmt)).scalar()
+            if job_id is not None:
+                await notify(db, JOB_CHANNEL, {"job_id": job_id})
+            await db.commit()
+        return job_id
+
+    async def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        async with db_manager.session() as db:
+            job = await db.get(Job, job_id)
+            if job is None:
+                return None
+            return {
+                column.name: getattr(job, column.name)
+                for column in Job.__table__.columns
+            }
+
+    async def stats(self) -> Dict[str, Any]:
+        """各状态的任务数和本节点的运行情况"""
+        async with db_manager.session() as db:
+            result = await db.execute(
+                select(Job.status, func.count()).group_by(Job.status)
+            )
+            counts = {status: count for status, count in result.all()}
+            oldest = (
+                await db.execute(
+                    select(func.extract("epoch", func.now() - func.min(Job.created_at)))
+                    .where(Job.status == "queued")
+                )
+            ).scalar()
+        return {
+            "by_status": counts,
+            "oldest_queued_seconds": round(float(oldest or 0), 1),
+            "node": {
+                "node_id": self.node_id,
+                "enabled": self.enabled,
+                "concurrency": self.concurrency,
+                "running": len(self._running),
+                "completed": self.completed,
+                "failed": self.failed,
+            },
+        }
+
+    # --- 工作节点 ---
+
+    @property
+    def started(self) -> bool:
+        return self._wakeup is not None
+
+    def start(self) -> None:
+        """在当前进程中启动工作节点：领取、心跳和回收过期租约"""
+        if self.started:
+            return
+        self._wakeup = asyncio.Event()
+        self._listener = PgListener(JOB_CHANNEL, self._on_job_notification)
+        self._listener.start()
+        self._tasks = [
+            asyncio.create_task(self._claim_loop()),
+            asyncio.create_task(self._heartbeat_loop()),
+            asyncio.create_task(self._reap_loop()),
+        ]
+        logger.info(
+            f"Job queue worker {self.node_id} started with concurrency {self.concurrency}"
+        )
+
+    async def close(self) -> None:
+        if not self.started:
+            return
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._listener is not None:
+            await self._listener.close()
+            self._listener = None
+
+        # 取消本节点正在执行的任务，并交还给其他节点
+        running = list(self._running.values())
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+        self._running.clear()
+        try:
+            await self._release_all()
+        except Exception as e:
+            logger.error(f"Failed to release jobs of {self.node_id}: {e}")
+        self._wakeup = None
+
+    async def _on_job_notification(self, message: Dict[str, Any]) -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _claim(self, limit: int) -> List[Any]:
+        """领取最多limit个任务，已被其他节点锁定的行直接跳过"""
+        claimable = (
+            select(Job.id)
+            .where(Job.status == "queued", Job.run_after <= func.now())
+            .order_by(Job.priority, Job.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        stmt = (
+            update(Job)
+            .where(Job.id.in_(claimable))
+            .values(
+                status="running",
+                locked_by=self.node_id,
+                attempts=Job.attempts + 1,
+                started_at=func.now(),
+                heartbeat_at=func.now(),
+                lease_expires_at=func.now() + _lease_interval(self.lease_seconds),
+            )
+            .returning(
+                Job.id,
+                Job.spider_id,
+                Job.task_id,
+                Job.params,
+                Job.priority,
+                Job.source,
+                Job.attempts,
+                Job.max_attempts,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        async with db_manager.session() as db:
+            rows = (await db.execute(stmt)).all()
+            await db.commit()
+        # 按优先级顺序执行
+        return sorted(rows, key=lambda row: (row.priority, row.id))
+
+    async def _claim_loop(self) -> None:
+        while True:
+            claimed = 0
+            free = self.concurrency - len(self._running)
+            if free > 0:
+                try:
+                    rows = await self._claim(free)
+                except Exception as e:
+                    logger.error(f"Failed to claim jobs: {e}")
+                    rows = []
+                for row in rows:
+                    task = asyncio.create_task(self._execute(row))
+                    self._running[row.id] = task
+                    task.add_done_callback(
+                        lambda _, job_id=row.id: self._on_job_done(job_id)
+                    )
+                claimed = len(rows)
+
+            # 领满后立即再试；否则等待新任务通知、任务完成或轮询超时
+            if claimed and claimed == free:
+                continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def _on_job_done(self, job_id: int) -> None:
+        self._running.pop(job_id, None)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _execute(self, row: Any) -> None:
+        result: Optional[Dict[str, Any]] = None
+        error: Optional[str] = None
+        try:
+            result = await SpiderLogicService.run_spider(
+                row.spider_id,
+                row.params or {},
+                priority=row.priority,
+                source=row.source or "job",
+                task_id=row.task_id,
+            )
+            inner = result.get("result") if isinstance(result, dict) else None
+            if isinstance(inner, dict) and inner.get("status") == "error":
+                error = inner.get("message", "error")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            error = str(e)
+
+        try:
+            await self._finish(row, result, error)
+        except Exception as e:
+            logger.error(f"Failed to record result of job {row.id}: {e}")
+
+    async def _finish(
+        self, row: Any, result: Optional[Dict[str, Any]], error: Optional[str]
+    ) -> None:
+        """记录执行结果；失败且未超过最大次数时延迟重新入队"""
+        if error is None:
+            values = {"status": "succeeded", "result": _to_json(result)}
+            self.completed += 1
+        elif row.attempts < row.max_attempts:
+            values = {
+                "status": "queued",
+                "error": error,
+                "run_after": func.now()
+                + _lease_interval(self.retry_backoff * row.attempts),
+            }
+        else:
+            values = {"status": "failed", "error": error}
+            self.failed += 1
+
+        if values["status"] != "queued":
+            values["finished_at"] = func.now()
+        async with db_manager.session() as db:
+            # 只更新本节点仍持有租约的任务，租约已被回收的结果直接丢弃
+            await db.execute(
+                update(Job)
+                .where(
+                    Job.id == row.id,
+                    Job.locked_by == self.node_id,
+                    Job.status == "running",
+                )
+                .values(locked_by=None, lease_expires_at=None, **values)
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+
+    async def _heartbeat_loop(self) -> None:
+        """定期为本节点正在执行的任务续约"""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            if not self._running:
+                continue
+            try:
+                async with db_manager.session() as db:
+                    await db.execute(
+                        update(Job)
+                        .where(
+                            Job.id.in_(list(self._running)),
+                            Job.locked_by == self.node_id,
+                        )
+                        .values(
+                            heartbeat_at=func.now(),
+                            lease_expires_at=func.now()
+                            + _lease_interval(self.lease_seconds),
+                        )
+                        .execution_options(synchronize_session=False)
+                    )
+                    await db.commit()
+            except Exception as e:
+                logger.error(f"Failed to send job heartbeats: {e}")
+
+    async def _reap_loop(self) -> None:
+        """回收租约已过期（节点宕机或失联）的任务"""
+        while True:
+            await asyncio.sleep(self.reap_interval)
+            try:
+                reaped = await self.reap_expired()
+                if reaped:
+                    logger.warning(f"Reclaimed {reaped} jobs with expired leases")
+                    self._wakeup.set()
+            except Exception as e:
+                logger.error(f"Failed to reap expired jobs: {e}")
+
+    async def reap_expired(self) -> int:
+        expired = and_(Job.status == "running", Job.lease_expires_at < func.now())
+        async with db_manager.session() as db:
+            failed = await db.execute(
+                update(Job)
+                .where(expired, Job.attempts >= Job.max_attempts)
+                .values(
+                    status="failed",
+                    error="Lease expired",
+                    finished_at=func.now(),
+                    locked_by=None,
+                    lease_expires_at=None,
+                )
+                .execution_options(synchronize_session=False)
+            )
+            requeued = await db.execute(
+                update(Job)
+                .where(expired)
+                .values(status="queued", locked_by=None, lease_expires_at=None)
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+        return failed.rowcount + requeued.rowcount
+
+    async def _release_all(self) -> None:
+        """节点退出时把未完成的任务交还队列，不计入尝试次数"""
+        async with db_manager.session() as db:
+            await db.execute(
+                update(Job)
+                .where(Job.locked_by == self.node_id, Job.status == "running")
+                .values(
+                    status="queued",
+                    attempts=Job.attempts - 1,
+                    locked_by=None,
+                    lease_expires_at=None,
+                )
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+
+
+# --- 实例化 ---
+job_queue = JobQueue()
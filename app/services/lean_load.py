@@ -0,0 +1,129 @@
+import logging
+import re
+from typing import Any, Dict, List, Optional, Pattern
+
+from playwright.async_api import Page, Response, Route
+
+from config.load_config import get_setting
+
+logger = logging.getLogger(__name__)
+
+# 未观测到实际大小时，各资源类型被拦截请求的估算字节数
+_DEFAULT_ESTIMATED_SIZES = {
+    "image": 40_000,
+    "media": 500_000,
+    "font": 40_000,
+    "script": 60_000,
+    "stylesheet": 20_000,
+}
+
+# 各资源类型已放行响应的累计大小，用于估算被拦截请求节省的字节数: 类型 -> [次数, 字节数]
+_observed_sizes: Dict[str, List[int]] = {}
+
+
+class LeanLoadRules:
+    """单个爬虫的资源拦截规则
+
+    配置位于 config.toml 的 [lean_load.<爬虫名>]，未配置的项继承 [lean_load.default]。
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        resource_types: Optional[List[str]] = None,
+        url_patterns: Optional[List[str]] = None,
+        allow_patterns: Optional[List[str]] = None,
+        estimated_sizes: Optional[Dict[str, int]] = None,
+    ):
+        self.enabled = enabled
+        self.resource_types = set(resource_types or [])
+        self.url_patterns: List[Pattern] = [re.compile(p) for p in url_patterns or []]
+        self.allow_patterns: List[Pattern] = [
+            re.compile(p) for p in allow_patterns or []
+        ]
+        self.estimated_sizes = {**_DEFAULT_ESTIMATED_SIZES, **(estimated_sizes or {})}
+
+    @classmethod
+    def for_spider(cls, spider_name: str) -> "LeanLoadRules":
+        """从配置读取指定爬虫的拦截规则"""
+        options = {
+            **get_setting("lean_load.default", {}),
+            **get_setting(f"lean_load.{spider_name}", {}),
+        }
+        return cls(
+            enabled=options.get("enabled", False),
+            resource_types=options.get("resource_types"),
+            url_patterns=options.get("url_patterns"),
+            allow_patterns=options.get("allow_patterns"),
+            estimated_sizes=options.get("estimated_sizes"),
+        )
+
+    def should_block(self, resource_type: str, url: str) -> bool:
+        """判断请求是否应被拦截，allow_patterns优先"""
+        if any(p.search(url) for p in self.allow_patterns):
+            return False
+        if resource_type in self.resource_types:
+            return True
+        return any(p.search(url) for p in self.url_patterns)
+
+
+class ResourceBlocker:
+    """基于 page.route 的资源拦截器，统计本次运行节省的请求数和字节数"""
+
+    def __init__(self, rules: LeanLoadRules):
+        self.rules = rules
+        self.blocked_requests = 0
+        self.blocked_by_type: Dict[str, int] = {}
+        self.bytes_saved_estimate = 0
+        self.loaded_requests = 0
+        self.bytes_loaded = 0
+
+    async def attach(self, page: Page) -> None:
+        """在页面上安装拦截规则（规则未启用时只统计加载量）"""
+        page.on("response", self._on_response)
+        if self.rules.enabled:
+            await page.route("**/*", self._handle_route)
+
+    async def _handle_route(self, route: Route) -> None:
+        request = route.request
+        resource_type = request.resource_type
+        if not self.rules.should_block(resource_type, request.url):
+            await route.continue_()
+            return
+
+        self.blocked_requests += 1
+        self.blocked_by_type[resource_type] = (
+            self.blocked_by_type.get(resource_type, 0) + 1
+        )
+        self.bytes_saved_estimate += self._estimate_size(resource_type)
+        await route.abort()
+
+    def _on_response(self, response: Response) -> None:
+        try:
+            size = int(response.headers.get("content-length", 0))
+        except ValueError:
+            size = 0
+        resource_type = response.request.resource_type
+        self.loaded_requests += 1
+        self.bytes_loaded += size
+        if size:
+            observed = _observed_sizes.setdefault(resource_type, [0, 0])
+            observed[0] += 1
+            observed[1] += size
+
+    def _estimate_size(self, resource_type: str) -> int:
+        """优先使用实际观测到的平均大小，否则使用配置的估算值"""
+        count, total = _observed_sizes.get(resource_type, (0, 0))
+        if count:
+            return total // count
+        return self.rules.estimated_sizes.get(resource_type, 0)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.rules.enabled,
+            "requests_blocked": self.blocked_requests,
+            "blocked_by_type": self.blocked_by_type,
+            "bytes_saved_estimate": self.bytes_saved_estimate,
+            "requests_loaded": self.loaded_requests,
+            "bytes_loaded": self.bytes_loaded,
+        }
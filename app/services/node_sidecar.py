@@ -0,0 +1,225 @@
+import asyncio
+import itertools
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+from config.load_config import get_config_instance, get_setting
+
+logger = logging.getLogger(__name__)
+
+
+def get_node_path() -> str:
+    """获取Node.js可执行文件路径"""
+    # 尝试从环境变量获取
+    node_path = os.environ.get("NODE_PATH")
+    if node_path and os.path.exists(node_path):
+        return node_path
+
+    # 尝试标准安装路径
+    if os.name == "nt":  # Windows
+        standard_paths = [
+            "C:\\Program Files\\nodejs\\node.exe",
+            "C:\\Program Files (x86)\\nodejs\\node.exe",
+        ]
+    else:  # Unix-like
+        standard_paths = ["/usr/bin/node", "/usr/local/bin/node"]
+
+    for path in standard_paths:
+        if os.path.exists(path):
+            return path
+
+    raise ValueError(
+        "Node.js not found. Please install Node.js or set NODE_PATH environment variable."
+    )
+
+
+class _NodeWorker:
+    """单个常驻Node进程，按请求ID复用同一条stdin/stdout通道"""
+
+    def __init__(self, index: int, on_exit):
+        self.index = index
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.pending: Dict[str, asyncio.Future] = {}
+        self._on_exit = on_exit
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    async def start(self) -> None:
+        script = get_config_instance().BASE_DIR / "spider" / "puppeteer_worker.js"
+        self.process = await asyncio.create_subprocess_exec(
+            get_node_path(),
+            str(script),
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            cwd=str(get_config_instance().BASE_DIR),
+            limit=4 * 1024 * 1024,
+        )
+        self._tasks = [
+            asyncio.create_task(self._read_stdout()),
+            asyncio.create_task(self._read_stderr()),
+        ]
+        logger.info(f"Node worker {self.index} started (pid {self.process.pid})")
+
+    async def _read_stdout(self) -> None:
+        """分发响应到对应的等待者；进程退出时让所有等待中的请求失败"""
+        try:
+            async for line in self.process.stdout:
+                try:
+                    message = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"Node worker {self.index} output: {line!r}")
+                    continue
+                future = self.pending.pop(str(message.get("id")), None)
+                if future is None or future.done():
+                    continue
+                if "error" in message:
+                    future.set_exception(ValueError(message["error"]))
+                else:
+                    future.set_result(message.get("result"))
+        finally:
+            await self.process.wait()
+            error = RuntimeError(
+                f"Node worker {self.index} exited with code {self.process.returncode}"
+            )
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_exception(error)
+            self.pending.clear()
+            self._on_exit(self)
+
+    async def _read_stderr(self) -> None:
+        async for line in self.process.stderr:
+            logger.info(
+                f"[node worker {self.index}] "
+                f"{line.decode('utf-8', errors='replace').rstrip()}"
+            )
+
+    async def request(self, request_id: str, payload: Dict[str, Any]) -> Any:
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = future
+        self.process.stdin.write(
+            (json.dumps({"id": request_id, **payload}) + "\n").encode("utf-8")
+        )
+        try:
+            await self.process.stdin.drain()
+            return await future
+        finally:
+            self.pending.pop(request_id, None)
+
+    async def close(self) -> None:
+        if not self.alive:
+            return
+        # 关闭stdin后工作进程会关闭浏览器并退出
+        self.process.stdin.close()
+        try:
+            await asyncio.wait_for(self.process.wait(), timeout=10)
+        except asyncio.TimeoutError:
+            self.process.kill()
+        for task in self._tasks:
+            task.cancel()
+
+
+class NodeSidecarPool:
+    """常驻Node Puppeteer工作进程池
+
+    替代每次运行都启动 `node puppeteer_spider.js` 的方式：工作进程保持浏览器打开，
+    Python端通过请求ID在同一进程上复用多个并发请求，进程崩溃后自动重启。
+    """
+
+    def __init__(self):
+        self.size: int = get_setting("node_sidecar.size", 1)
+        self.request_timeout: float = get_setting("node_sidecar.request_timeout", 120)
+        self.restart_delay: float = get_setting("node_sidecar.restart_delay", 1)
+        self._workers: List[Optional[_NodeWorker]] = []
+        self._ids = itertools.count(1)
+        self._lock = asyncio.Lock()
+        self._closing = False
+
+    async def start(self) -> None:
+        async with self._lock:
+            if self._workers:
+                return
+            self._closing = False
+            self._workers = [None] * self.size
+            for index in range(self.size):
+                await self._spawn(index)
+
+    async def _spawn(self, index: int) -> _NodeWorker:
+        worker = _NodeWorker(index, self._on_worker_exit)
+        await worker.start()
+        self._workers[index] = worker
+        return worker
+
+    def _on_worker_exit(self, worker: _NodeWorker) -> None:
+        if self._closing or self._workers[worker.index] is not worker:
+            return
+        logger.warning(f"Node worker {worker.index} crashed, restarting")
+        asyncio.create_task(self._restart(worker.index))
+
+    async def _restart(self, index: int) -> None:
+        await asyncio.sleep(self.restart_delay)
+        async with self._lock:
+            if self._closing:
+                return
+            current = self._workers[index]
+            if current is None or not current.alive:
+                try:
+                    await self._spawn(index)
+                except Exception as e:
+                    logger.error(f"Failed to restart node worker {index}: {e}")
+
+    async def _pick_worker(self) -> _NodeWorker:
+        """选出待处理请求最少的存活工作进程，必要时同步拉起"""
+        if not self._workers:
+            await self.start()
+        alive = [w for w in self._workers if w is not None and w.alive]
+        if alive:
+            return min(alive, key=lambda w: len(w.pending))
+        async with self._lock:
+            for index, worker in enumerate(self._workers):
+                if worker is None or not worker.alive:
+                    return await self._spawn(index)
+            return self._workers[0]
+
+    async def run(self, url: str, spider_name: Optional[str] = None) -> Dict[str, Any]:
+        """在常驻工作进程中运行一次Puppeteer截图，按爬虫名称选择 [lean_load] 规则"""
+        worker = await self._pick_worker()
+        request_id = str(next(self._ids))
+        payload = {"url": url}
+        if spider_name:
+            payload["spider"] = spider_name
+        return await asyncio.wait_for(
+            worker.request(request_id, payload), timeout=self.request_timeout
+        )
+
+    async def close(self) -> None:
+        self._closing = True
+        async with self._lock:
+            for worker in self._workers:
+                if worker is not None:
+                    await worker.close()
+            self._workers = []
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "size": self.size,
+            "workers": [
+                {
+                    "index": index,
+                    "alive": worker is not None and worker.alive,
+                    "pid": worker.process.pid if worker and worker.process else None,
+                    "pending": len(worker.pending) if worker else 0,
+                }
+                for index, worker in enumerate(self._workers)
+            ],
+        }
+
+
+# --- 实例化 ---
+node_sidecar = NodeSidecarPool()
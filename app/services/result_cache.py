@@ -0,0 +1,142 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from app.utils.url import normalize_url
+from config.load_config import get_setting
+
+logger = logging.getLogger(__name__)
+
+
+class _Inflight:
+    """正在执行的截图及其等待者数量"""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class ResultCache:
+    """截图结果缓存
+
+    以 爬虫ID + 规范化URL + 截图参数 为键，带TTL和LRU淘汰；
+    相同键的并发请求合并为一次截图，其余请求等待其结果。
+    """
+
+    def __init__(self):
+        self.enabled: bool = get_setting("result_cache.enabled", True)
+        self.ttl: float = get_setting("result_cache.ttl_seconds", 300)
+        self.max_entries: int = get_setting("result_cache.max_entries", 1000)
+        # 键 -> (过期时间, 结果)
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._inflight: Dict[str, _Inflight] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def make_key(spider_id: int, params: Dict[str, Any]) -> Optional[str]:
+        """生成缓存键，没有URL时返回None（不缓存）"""
+        url = params.get("url")
+        if not url:
+            return None
+        options = {k: v for k, v in params.items() if k != "url"}
+        return (
+            f"{spider_id}|{normalize_url(url)}|"
+            f"{json.dumps(options, sort_keys=True, default=str)}"
+        )
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """读取未过期且截图文件仍存在的缓存结果"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, result = entry
+        screenshot_path = result.get("screenshot_path")
+        if expires_at < time.monotonic() or (
+            screenshot_path and not os.path.exists(screenshot_path)
+        ):
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return result
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, spider_id: Optional[int] = None) -> None:
+        """清除指定爬虫或全部缓存"""
+        if spider_id is None:
+            self._entries.clear()
+            return
+        prefix = f"{spider_id}|"
+        for key in [k for k in self._entries if k.startswith(prefix)]:
+            del self._entries[key]
+
+    async def get_or_run(
+        self,
+        key: Optional[str],
+        factory: Callable[[], Awaitable[Dict[str, Any]]],
+    ) -> Dict[str, Any]:
+        """命中缓存直接返回，否则执行factory；相同键的并发调用只执行一次"""
+        if not self.enabled or key is None:
+            return await factory()
+
+        cached = self.get(key)
+        if cached is not None:
+            self.hits += 1
+            return {**cached, "cached": True}
+
+        inflight = self._inflight.get(key)
+        coalesced = inflight is not None
+        if coalesced:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            # 截图在独立任务中执行，不属于任何一个调用方，调用方断开不会影响其他等待者
+            inflight = _Inflight(asyncio.create_task(self._run(key, factory)))
+            self._inflight[key] = inflight
+
+        inflight.waiters += 1
+        try:
+            result = await asyncio.shield(inflight.task)
+        except asyncio.CancelledError:
+            # 最后一个等待者也离开时才取消截图
+            if inflight.waiters == 1 and not inflight.task.done():
+                inflight.task.cancel()
+            raise
+        finally:
+            inflight.waiters -= 1
+        return {**result, "coalesced": True} if coalesced else result
+
+    async def _run(
+        self, key: str, factory: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        try:
+            result = await factory()
+            if isinstance(result, dict) and result.get("status", "success") == "success":
+                self.put(key, result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+        }
+
+
+# --- 实例化 ---
+result_cache = ResultCache()
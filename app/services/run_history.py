@@ -0,0 +1,193 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from sqlalchemy import Float, case, cast, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.database import db_manager
+from app.database.models import SpiderRun
+from app.services.run_tracker import start_phase_timer
+from config.load_config import get_setting
+
+logger = logging.getLogger(__name__)
+
+
+class _RunContext:
+    """一次执行的记录上下文，执行方把结果写入 result"""
+
+    def __init__(self):
+        self.result: Any = None
+
+
+class RunHistoryWriter:
+    """运行历史的批量异步写入
+
+    每次执行结束时只把记录放入内存缓冲区，由后台协程定时或在缓冲区满时批量插入，
+    记录历史不会给每次运行增加一次数据库往返。
+    """
+
+    def __init__(self):
+        self.enabled: bool = get_setting("run_history.enabled", True)
+        self.flush_interval: float = get_setting("run_history.flush_interval", 5)
+        self.batch_size: int = get_setting("run_history.batch_size", 500)
+        # 数据库不可用时缓冲区最多保留的记录数，超出后丢弃最早的记录
+        self.max_buffer: int = get_setting("run_history.max_buffer", 50000)
+        self._buffer: List[Dict[str, Any]] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.written = 0
+        self.dropped = 0
+
+    def start(self) -> None:
+        if not self.enabled or self._task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._flush_loop())
+        logger.info("Run history writer started")
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        # 写入剩余记录
+        await self.flush()
+
+    def record(self, **row: Any) -> None:
+        """放入一条运行记录，等待批量写入"""
+        if not self.enabled:
+            return
+        self._buffer.append(row)
+        overflow = len(self._buffer) - self.max_buffer
+        if overflow > 0:
+            del self._buffer[:overflow]
+            self.dropped += overflow
+        if self._wakeup is not None and len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+
+    @asynccontextmanager
+    async def track(
+        self, spider_id: int, task_id: Optional[int] = None, source: str = "api"
+    ) -> AsyncIterator[_RunContext]:
+        """记录包裹的一次执行：起止时间、各阶段耗时、状态和截图路径"""
+        context = _RunContext()
+        started_at = datetime.now()
+        marks = start_phase_timer()
+        started = time.monotonic()
+        error: Optional[str] = None
+        try:
+            yield context
+        except BaseException as e:
+            # 包括取消，取消的运行也记为失败
+            error = str(e) or type(e).__name__
+            raise
+        finally:
+            finished = time.monotonic()
+            result = context.result if isinstance(context.result, dict) else {}
+            if error is None and result.get("status") == "error":
+                error = result.get("message", "error")
+
+            phase_durations: Dict[str, int] = {}
+            previous = started
+            for phase, at in marks:
+                phase_durations[phase] = int((at - previous) * 1000)
+                previous = at
+
+            self.record(
+                spider_id=spider_id,
+                task_id=task_id,
+                source=source,
+                status="failed" if error is not None else "succeeded",
+                error=error,
+                started_at=started_at,
+                finished_at=started_at + timedelta(seconds=finished - started),
+                duration_ms=int((finished - started) * 1000),
+                phase_durations=phase_durations,
+                artifact_path=result.get("screenshot_path")
+                or result.get("screenshotPath"),
+            )
+
+    async def _flush_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> None:
+        """批量插入缓冲区中的记录，失败时放回缓冲区等待下次重试"""
+        while self._buffer:
+            rows = self._buffer[: self.batch_size]
+            del self._buffer[: self.batch_size]
+            try:
+                async with db_manager.session() as db:
+                    await db.execute(insert(SpiderRun), rows)
+                    await db.commit()
+                self.written += len(rows)
+            except Exception as e:
+                logger.error(f"Failed to write {len(rows)} run history rows: {e}")
+                self._buffer[:0] = rows
+                return
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "buffered": len(self._buffer),
+            "written": self.written,
+            "dropped": self.dropped,
+        }
+
+
+async def latency_stats(
+    db: AsyncSession, hours: float = 24, spider_id: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """按爬虫统计时间窗口内运行耗时的p50/p95/p99和成功率（在数据库中计算）"""
+    since = datetime.now() - timedelta(hours=hours)
+    stmt = (
+        select(
+            SpiderRun.spider_id,
+            func.count().label("runs"),
+            func.avg(
+                case((SpiderRun.status == "succeeded", 1.0), else_=0.0)
+            ).label("success_rate"),
+            func.percentile_cont(0.5)
+            .within_group(SpiderRun.duration_ms)
+            .label("p50_ms"),
+            func.percentile_cont(0.95)
+            .within_group(SpiderRun.duration_ms)
+            .label("p95_ms"),
+            func.percentile_cont(0.99)
+            .within_group(SpiderRun.duration_ms)
+            .label("p99_ms"),
+            cast(func.avg(SpiderRun.duration_ms), Float).label("avg_ms"),
+        )
+        .where(SpiderRun.started_at >= since)
+        .group_by(SpiderRun.spider_id)
+        .order_by(SpiderRun.spider_id)
+    )
+    if spider_id is not None:
+        stmt = stmt.where(SpiderRun.spider_id == spider_id)
+
+    result = await db.execute(stmt)
+    return [
+        {
+            "spider_id": row.spider_id,
+            "runs": row.runs,
+            "success_rate": round(float(row.success_rate or 0), 4),
+            "p50_ms": round(row.p50_ms or 0),
+            "p95_ms": round(row.p95_ms or 0),
+            "p99_ms": round(row.p99_ms or 0),
+            "avg_ms": round(row.avg_ms or 0),
+        }
+        for row in result
+    ]
+
+
+# --- 实例化 ---
+run_history = RunHistoryWriter()
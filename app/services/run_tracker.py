@@ -0,0 +1,309 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import bindparam, delete, func, insert, select, update
+
+from app.database.database import db_manager
+from app.database.models import AsyncRun
+from config.load_config import get_setting
+
+logger = logging.getLogger(__name__)
+
+# 运行阶段：queued -> started -> browser_acquired -> navigated -> element_visible
+#          -> captured -> encoded -> succeeded / failed
+TERMINAL_STATUSES = {"succeeded", "failed"}
+
+_runs_table = AsyncRun.__table__
+
+# 按 run_id 批量写入快照（executemany），时间用数据库的 now()
+_SAVE_SNAPSHOT = (
+    update(_runs_table)
+    .where(_runs_table.c.run_id == bindparam("b_run_id"))
+    .values(
+        status=bindparam("b_status"),
+        snapshot=bindparam("b_snapshot"),
+        updated_at=func.now(),
+    )
+)
+
+# 当前协程所属的运行ID，爬虫通过 report_phase 上报进度
+_current_run_id: ContextVar[Optional[str]] = ContextVar("current_run_id", default=None)
+# 当前执行记录的阶段时间点 [(阶段, monotonic时间)]，用于写入运行历史
+_phase_marks: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar(
+    "phase_marks", default=None
+)
+
+
+class RunRecord:
+    """一次异步提交的爬虫运行"""
+
+    def __init__(self, spider_id: int, params: Dict[str, Any]):
+        self.id = uuid.uuid4().hex
+        self.spider_id = spider_id
+        self.params = params
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.events: List[Dict[str, Any]] = []
+        self.subscribers: List[asyncio.Queue] = []
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "run_id": self.id,
+            "spider_id": self.spider_id,
+            "params": self.params,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error,
+            "events": self.events,
+        }
+
+
+class RunTracker:
+    """运行状态和阶段事件
+
+    运行在提交它的进程内执行，阶段事件实时推送给本进程的订阅者（SSE），
+    已结束的运行按数量上限淘汰。状态快照同时写入 async_runs 表：
+    创建时立即写入，之后由后台协程每 persist_interval 秒合并写入一次，
+    其他API进程收到的查询和订阅从表中读取，多个API worker 时同样可用。
+    """
+
+    def __init__(self):
+        self.max_history: int = get_setting("runs.max_history", 10000)
+        self.persist_interval: float = get_setting("runs.persist_interval", 1)
+        self.retention_hours: float = get_setting("runs.retention_hours", 24)
+        self._runs: "OrderedDict[str, RunRecord]" = OrderedDict()
+        # 状态有变化、尚未写入数据库的运行ID
+        self._dirty: Set[str] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._last_purge = 0.0
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._persist_loop())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    async def create(self, spider_id: int, params: Dict[str, Any]) -> RunRecord:
+        """创建运行记录并写入数据库，返回后任意进程都能查到该运行"""
+        record = RunRecord(spider_id, params)
+        self._runs[record.id] = record
+        self._prune()
+        self.emit(record.id, "queued")
+        self._dirty.discard(record.id)
+        async with db_manager.session() as db:
+            await db.execute(
+                insert(AsyncRun).values(
+                    run_id=record.id,
+                    spider_id=spider_id,
+                    status=record.status,
+                    snapshot=self._snapshot(record),
+                )
+            )
+            await db.commit()
+        return record
+
+    def get(self, run_id: str) -> Optional[RunRecord]:
+        return self._runs.get(run_id)
+
+    async def load(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """读取运行状态，本进程没有时从数据库读取快照"""
+        record = self._runs.get(run_id)
+        if record is not None:
+            return record.to_dict()
+        async with db_manager.session() as db:
+            return (
+                await db.execute(
+                    select(AsyncRun.snapshot).where(AsyncRun.run_id == run_id)
+                )
+            ).scalar()
+
+    async def follow(self, run_id: str) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """按快照轮询其他进程中运行的阶段事件，运行结束后停止
+
+        某次轮询没有新事件时产出None，调用方可借此发送心跳。
+        """
+        sent = 0
+        while True:
+            snapshot = await self.load(run_id)
+            if snapshot is None:
+                return
+            events = snapshot.get("events") or []
+            if len(events) == sent:
+                yield None
+            for event in events[sent:]:
+                yield event
+            sent = len(events)
+            if snapshot.get("status") in TERMINAL_STATUSES:
+                return
+            await asyncio.sleep(self.persist_interval)
+
+    @staticmethod
+    def _snapshot(record: RunRecord) -> Dict[str, Any]:
+        # 结果中可能有无法直接序列化为JSON的值
+        return json.loads(json.dumps(record.to_dict(), default=str))
+
+    async def flush(self) -> None:
+        """把有变化的运行状态批量写入数据库"""
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, set()
+        rows = [
+            {
+                "b_run_id": record.id,
+                "b_status": record.status,
+                "b_snapshot": self._snapshot(record),
+            }
+            for record in (self._runs.get(run_id) for run_id in dirty)
+            if record is not None
+        ]
+        if not rows:
+            return
+        try:
+            async with db_manager.session() as db:
+                await db.execute(_SAVE_SNAPSHOT, rows)
+                await db.commit()
+        except Exception as e:
+            # 下次重试，期间本进程内的查询不受影响
+            self._dirty.update(row["b_run_id"] for row in rows)
+            logger.error(f"Failed to persist run states: {e}")
+
+    async def _purge(self) -> None:
+        """删除超过保留时间的已结束运行"""
+        async with db_manager.session() as db:
+            await db.execute(
+                delete(AsyncRun).where(
+                    AsyncRun.status.in_(TERMINAL_STATUSES),
+                    AsyncRun.updated_at
+                    < func.now()
+                    - func.make_interval(0, 0, 0, 0, 0, 0, self.retention_hours * 3600),
+                )
+            )
+            await db.commit()
+
+    async def _persist_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.persist_interval)
+            await self.flush()
+            if time.monotonic() - self._last_purge > 600:
+                self._last_purge = time.monotonic()
+                try:
+                    await self._purge()
+                except Exception as e:
+                    logger.error(f"Failed to purge old run states: {e}")
+
+    def _prune(self) -> None:
+        """超出上限时淘汰最早的已结束运行"""
+        overflow = len(self._runs) - self.max_history
+        if overflow <= 0:
+            return
+        for run_id in [
+            rid for rid, r in self._runs.items() if r.status in TERMINAL_STATUSES
+        ][:overflow]:
+            del self._runs[run_id]
+
+    def emit(self, run_id: str, phase: str, **data: Any) -> None:
+        """记录阶段事件并推送给订阅者"""
+        record = self._runs.get(run_id)
+        if record is None:
+            return
+        now = time.time()
+        event = {
+            "phase": phase,
+            "ts": now,
+            "elapsed_ms": int((now - record.created_at) * 1000),
+            **data,
+        }
+        record.events.append(event)
+        self._dirty.add(run_id)
+        if phase == "started":
+            record.status = "running"
+            record.started_at = now
+        elif phase in TERMINAL_STATUSES:
+            record.status = phase
+            record.finished_at = now
+        for queue in record.subscribers:
+            queue.put_nowait(event)
+
+    def finish(
+        self,
+        run_id: str,
+        result: Optional[Dict[str, Any]] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        record = self._runs.get(run_id)
+        if record is None:
+            return
+        record.result = result
+        record.error = error
+        if error is None:
+            self.emit(run_id, "succeeded")
+        else:
+            self.emit(run_id, "failed", error=error)
+
+    def subscribe(self, run_id: str) -> Optional[asyncio.Queue]:
+        """订阅运行事件，返回的队列中先放入已有事件，之后实时推送新事件"""
+        record = self._runs.get(run_id)
+        if record is None:
+            return None
+        queue: asyncio.Queue = asyncio.Queue()
+        for event in record.events:
+            queue.put_nowait(event)
+        record.subscribers.append(queue)
+        return queue
+
+    def unsubscribe(self, run_id: str, queue: asyncio.Queue) -> None:
+        record = self._runs.get(run_id)
+        if record is not None and queue in record.subscribers:
+            record.subscribers.remove(queue)
+
+    def set_current(self, run_id: Optional[str]):
+        """将当前协程绑定到运行ID，返回用于恢复的token"""
+        return _current_run_id.set(run_id)
+
+    def reset_current(self, token) -> None:
+        _current_run_id.reset(token)
+
+    def stats(self) -> Dict[str, Any]:
+        counts: Dict[str, int] = {}
+        for record in self._runs.values():
+            counts[record.status] = counts.get(record.status, 0) + 1
+        return {"total": len(self._runs), "by_status": counts}
+
+
+# --- 实例化 ---
+run_tracker = RunTracker()
+
+
+def start_phase_timer() -> List[Tuple[str, float]]:
+    """在当前上下文中开始记录阶段时间点，返回记录列表"""
+    marks: List[Tuple[str, float]] = []
+    _phase_marks.set(marks)
+    return marks
+
+
+def report_phase(phase: str, **data: Any) -> None:
+    """爬虫上报当前运行的阶段，不在异步运行中调用时忽略"""
+    marks = _phase_marks.get()
+    if marks is not None:
+        marks.append((phase, time.monotonic()))
+    run_id = _current_run_id.get()
+    if run_id is not None:
+        run_tracker.emit(run_id, phase, **data)
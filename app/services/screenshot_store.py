@@ -0,0 +1,158 @@
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app.utils.url import normalize_url
+from config.load_config import get_config_instance, get_setting
+
+logger = logging.getLogger(__name__)
+
+
+class ScreenshotStore:
+    """按内容哈希寻址的截图存储
+
+    文件以 sha256 命名并按哈希前缀分层存放（如 ab/cd/abcd....webp），
+    相同内容只保存一份；另用 SQLite 维护 URL、时间、哈希、大小的索引以便快速查找。
+    Puppeteer 爬虫按同样的规则写文件，再由 record() 登记索引。
+    """
+
+    def __init__(self):
+        self.root = get_config_instance().BASE_DIR / get_setting(
+            "screenshot_store.root", "public/pic"
+        )
+        self.shard_depth: int = get_setting("screenshot_store.shard_depth", 2)
+        self.index_path = self.root / "index.sqlite3"
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _get_conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.root.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.index_path), check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS screenshots (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    url TEXT,
+                    sha256 TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    kind TEXT NOT NULL DEFAULT 'screenshot',
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_screenshots_url ON screenshots (url, created_at)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_screenshots_sha256 ON screenshots (sha256)"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def shard_path(self, digest: str, extension: str) -> Path:
+        """根据哈希计算分层存储路径"""
+        parts = [digest[i * 2 : i * 2 + 2] for i in range(self.shard_depth)]
+        return self.root.joinpath(*parts, f"{digest}.{extension}")
+
+    def _put_sync(
+        self, data: bytes, extension: str, url: Optional[str], kind: str
+    ) -> Dict[str, Any]:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.shard_path(digest, extension)
+        deduplicated = path.exists()
+        if not deduplicated:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # 先写临时文件再原子替换，避免并发写入读到半个文件
+            tmp_path = path.with_name(f".{digest}.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+
+        self._record_sync(digest, path, len(data), url, kind)
+        return {
+            "path": str(path),
+            "sha256": digest,
+            "size": len(data),
+            "deduplicated": deduplicated,
+        }
+
+    def _record_sync(
+        self, digest: str, path: Path, size: int, url: Optional[str], kind: str
+    ) -> None:
+        with self._lock:
+            conn = self._get_conn()
+            conn.execute(
+                "INSERT INTO screenshots (url, sha256, path, size, kind, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    normalize_url(url) if url else None,
+                    digest,
+                    str(path),
+                    size,
+                    kind,
+                    time.time(),
+                ),
+            )
+            conn.commit()
+
+    async def put(
+        self,
+        data: bytes,
+        extension: str,
+        url: Optional[str] = None,
+        kind: str = "screenshot",
+    ) -> Dict[str, Any]:
+        """写入图片并登记索引，返回路径、哈希、大小及是否命中去重"""
+        return await asyncio.to_thread(self._put_sync, data, extension, url, kind)
+
+    async def record(
+        self,
+        digest: str,
+        path: str,
+        size: int,
+        url: Optional[str] = None,
+        kind: str = "screenshot",
+    ) -> None:
+        """登记由外部进程（如Puppeteer）写入存储的图片"""
+        await asyncio.to_thread(self._record_sync, digest, Path(path), size, url, kind)
+
+    def _query_sync(self, sql: str, args: tuple) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._get_conn().execute(sql, args).fetchall()
+        return [dict(row) for row in rows]
+
+    async def find_by_url(self, url: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """按URL查找截图，最新的在前"""
+        return await asyncio.to_thread(
+            self._query_sync,
+            "SELECT * FROM screenshots WHERE url = ? ORDER BY created_at DESC LIMIT ?",
+            (normalize_url(url), limit),
+        )
+
+    async def find_by_hash(self, digest: str) -> List[Dict[str, Any]]:
+        """按内容哈希查找截图记录"""
+        return await asyncio.to_thread(
+            self._query_sync,
+            "SELECT * FROM screenshots WHERE sha256 = ? ORDER BY created_at DESC",
+            (digest,),
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# --- 实例化 ---
+screenshot_store = ScreenshotStore()
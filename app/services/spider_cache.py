@@ -0,0 +1,134 @@
+import logging
+import time
+import uuid
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.database import db_manager
+from app.database.models import Spider
+from app.database.notify import PgListener, notify
+from app.schemas.spider import SpiderResponse
+from app.services.result_cache import result_cache
+from app.services.spider_registry import spider_registry
+from config.load_config import get_setting
+
+logger = logging.getLogger(__name__)
+
+# 爬虫定义变更的通知频道
+SPIDER_CHANNEL = "spider_changes"
+
+
+class SpiderDefinitionCache:
+    """进程内的爬虫定义缓存
+
+    执行路径只需要 module_path、class_name、language、is_active 这些几乎不变的字段，
+    缓存后运行爬虫不再读取数据库。本进程内的创建、更新、删除直接写入缓存，
+    并通过 LISTEN/NOTIFY 通知其他进程（API worker、调度进程、工作节点）失效。
+    """
+
+    def __init__(self):
+        self.enabled: bool = get_setting("spider_cache.enabled", True)
+        # 兜底过期时间（秒），防止错过通知后长期使用旧定义，0为不过期
+        self.ttl: float = get_setting("spider_cache.ttl_seconds", 600)
+        # 区分自己发出的通知
+        self._origin = uuid.uuid4().hex
+        # 爬虫ID -> (缓存时间, 定义)
+        self._entries: Dict[int, Tuple[float, SpiderResponse]] = {}
+        self._listener: Optional[PgListener] = None
+        self.hits = 0
+        self.misses = 0
+
+    async def start(self) -> None:
+        """开始监听变更通知并预热所有爬虫定义
+
+        预热失败不影响监听：缓存为空时按需从数据库加载，监听重连后会再次预热。
+        """
+        if not self.enabled:
+            return
+        if self._listener is None:
+            self._listener = PgListener(
+                SPIDER_CHANNEL, self._on_change, on_reconnect=self.warm
+            )
+            self._listener.start()
+        try:
+            await self.warm()
+        except Exception as e:
+            logger.warning(f"Failed to warm spider definition cache: {e}")
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            await self._listener.close()
+            self._listener = None
+        self._entries.clear()
+
+    async def warm(self) -> None:
+        """一次查询加载所有爬虫定义"""
+        async with db_manager.session() as db:
+            result = await db.execute(select(Spider))
+            spiders = [SpiderResponse.model_validate(s) for s in result.scalars()]
+        now = time.monotonic()
+        self._entries = {spider.id: (now, spider) for spider in spiders}
+        logger.info(f"Spider definition cache warmed with {len(spiders)} spiders")
+
+    async def get(self, spider_id: int) -> Optional[SpiderResponse]:
+        """读取爬虫定义，未命中时从数据库加载；不存在时返回None"""
+        entry = self._entries.get(spider_id) if self.enabled else None
+        if entry is not None and (
+            not self.ttl or time.monotonic() - entry[0] < self.ttl
+        ):
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        async with db_manager.session() as db:
+            spider = await db.get(Spider, spider_id)
+            if spider is None:
+                self._entries.pop(spider_id, None)
+                return None
+            return self.put(spider)
+
+    def put(self, spider: Any) -> SpiderResponse:
+        """写入（或覆盖）一个爬虫定义"""
+        snapshot = (
+            spider
+            if isinstance(spider, SpiderResponse)
+            else SpiderResponse.model_validate(spider)
+        )
+        if self.enabled:
+            self._entries[snapshot.id] = (time.monotonic(), snapshot)
+        return snapshot
+
+    def invalidate(self, spider_id: int) -> None:
+        self._entries.pop(spider_id, None)
+
+    async def publish(self, db: AsyncSession, spider_id: int) -> None:
+        """通知其他进程爬虫定义已变更，随当前事务提交后送达"""
+        await notify(
+            db, SPIDER_CHANNEL, {"spider_id": spider_id, "origin": self._origin}
+        )
+
+    async def _on_change(self, message: Dict[str, Any]) -> None:
+        if message.get("origin") == self._origin:
+            return
+        spider_id = message.get("spider_id")
+        if spider_id is None:
+            return
+        # 其他进程修改了爬虫，本进程的定义、类和结果缓存一并失效
+        self.invalidate(spider_id)
+        spider_registry.invalidate(spider_id)
+        result_cache.invalidate(spider_id)
+        logger.info(f"Spider {spider_id} changed in another process, cache invalidated")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+# --- 实例化 ---
+spider_cache = SpiderDefinitionCache()
@@ -1,70 +1,108 @@
-import importlib
 import logging
 import os
 import asyncio
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
 
-from sqlalchemy import func, select
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from config.load_config import Config
+from config.load_config import Config, get_setting
+from app.database.database import db_manager
+from app.database.pagination import (count_rows, decode_cursor, encode_cursor,
+                                     fetch_keyset_page, iter_keyset_pages)
 from app.database.models import Spider
-from app.schemas.spider import SpiderCreate, SpiderUpdate
+from app.schemas.spider import SpiderCreate, SpiderResponse, SpiderUpdate
+from app.services.node_sidecar import node_sidecar
+from app.services.result_cache import ResultCache, result_cache
+from app.services.run_history import run_history
+from app.services.run_tracker import RunRecord, report_phase, run_tracker
+from app.services.screenshot_store import screenshot_store
+from app.services.spider_cache import spider_cache
+from app.services.spider_registry import spider_registry
+from app.services.spider_worker_pool import spider_worker_pool
+from app.services.work_queue import PRIORITY_API, work_queue
 
 logger = logging.getLogger(__name__)
 
+# 所有批量任务共享的全局并发上限
+BATCH_MAX_CONCURRENCY: int = get_setting("batch.max_concurrency", 8)
+# 单个批量请求最多包含的URL数量
+BATCH_MAX_URLS: int = get_setting("batch.max_urls", 1000)
+_batch_semaphore = asyncio.Semaphore(BATCH_MAX_CONCURRENCY)
+# 持有后台任务的引用，避免被垃圾回收
+_background_runs: set = set()
+
 
 class SpiderLogicService:
     @staticmethod
     async def run_spider_with_language(
-        spider_id: int, language: Optional[str], db: AsyncSession
+        spider_id: int,
+        language: Optional[str],
+        params: Optional[Dict[str, Any]] = None,
     ) -> Dict[str, Any]:
-        """运行指定ID的爬虫，支持指定语言类型"""
-        # 获取爬虫信息
-        spider = await db.get(Spider, spider_id)
-        if not spider:
-            raise ValueError(f"Spider with id {spider_id} not found")
+        """运行指定ID的爬虫，支持指定语言类型
 
-        if not spider.is_active:
-            raise ValueError(f"Spider {spider_id} is not active")
+        爬虫信息从进程内缓存读取，只有需要更新语言时才短暂使用数据库会话。
+        """
+        # 获取爬虫信息
+        spider = await SpiderLogicService.load_spider_definition(spider_id)
 
         # 如果指定了语言且与爬虫当前语言不同，更新爬虫语言
         if language and spider.language != language:
-            update_data = SpiderUpdate(language=language)
-            spider = await SpiderLogicService.update_spider(spider_id, update_data, db)
+            async with db_manager.session() as db:
+                update_data = SpiderUpdate(language=language)
+                updated = await SpiderLogicService.update_spider(
+                    spider_id, update_data, db
+                )
+                spider = SpiderResponse.model_validate(updated)
             logger.info(f"Updated spider {spider_id} language to {language}")
 
         # 运行爬虫
-        return await SpiderLogicService.run_spider(spider_id, db)
+        return await SpiderLogicService.run_loaded_spider(spider, params)
 
     @staticmethod
-    async def run_spider(spider_id: int, db: AsyncSession) -> Dict[str, Any]:
-        """运行指定ID的爬虫"""
-        # 获取爬虫信息
-        spider = await db.get(Spider, spider_id)
+    async def load_spider_definition(spider_id: int) -> SpiderResponse:
+        """读取激活的爬虫，返回与会话无关的快照
+
+        优先使用进程内缓存，未命中时才用短会话读取数据库。
+        """
+        spider = await spider_cache.get(spider_id)
         if not spider:
             raise ValueError(f"Spider with id {spider_id} not found")
 
         if not spider.is_active:
             raise ValueError(f"Spider {spider_id} is not active")
+        return spider
+
+    @staticmethod
+    async def run_spider(
+        spider_id: int,
+        params: Optional[Dict[str, Any]] = None,
+        priority: int = PRIORITY_API,
+        source: str = "api",
+        task_id: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """运行指定ID的爬虫，截图期间不持有数据库连接"""
+        spider = await SpiderLogicService.load_spider_definition(spider_id)
+        return await SpiderLogicService.run_loaded_spider(
+            spider, params, priority, source, task_id
+        )
 
+    @staticmethod
+    async def run_loaded_spider(
+        spider: SpiderResponse,
+        params: Optional[Dict[str, Any]] = None,
+        priority: int = PRIORITY_API,
+        source: str = "api",
+        task_id: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """运行已加载的爬虫定义"""
+        spider_id = spider.id
         # 根据爬虫语言类型选择不同的执行方式
         try:
-            # 为了兼容，我们仍然支持通过module_path和class_name调用自定义JS爬虫
-            # 但优先使用我们新的Puppeteer爬虫实现
-            if spider.language == "python":
-                result = await SpiderLogicService._run_python_spider(spider)
-            elif spider.language == "javascript":
-                # 如果指定了module_path，则使用自定义JS爬虫
-                if spider.module_path:
-                    result = await SpiderLogicService._run_javascript_spider(spider)
-                else:
-                    # 否则使用默认的Puppeteer爬虫
-                    result = await SpiderLogicService._run_default_puppeteer_spider(
-                        spider
-                    )
-            else:
-                raise ValueError(f"Unsupported spider language: {spider.language}")
+            result = await SpiderLogicService._execute_spider_cached(
+                spider, params, priority, source, task_id
+            )
 
             logger.info(f"Spider {spider_id} ({spider.name}) run successfully")
             return {
@@ -77,19 +115,166 @@ class SpiderLogicService:
             raise ValueError(f"Error running spider: {e}")
 
     @staticmethod
-    async def _run_python_spider(spider: Spider) -> Dict[str, Any]:
+    async def submit_run(
+        spider_id: int,
+        params: Optional[Dict[str, Any]] = None,
+        on_done: Optional[Callable[[], None]] = None,
+    ) -> RunRecord:
+        """异步提交一次运行，立即返回运行记录，进度通过run_tracker查询和订阅
+
+        on_done 在运行结束（无论成功失败）后调用。
+        """
+        spider = await SpiderLogicService.load_spider_definition(spider_id)
+        record = await run_tracker.create(spider_id, params or {})
+        task = asyncio.create_task(SpiderLogicService._run_tracked(spider, record))
+        _background_runs.add(task)
+        task.add_done_callback(_background_runs.discard)
+        if on_done is not None:
+            task.add_done_callback(lambda _: on_done())
+        return record
+
+    @staticmethod
+    async def _run_tracked(spider: SpiderResponse, record: RunRecord) -> None:
+        """执行异步提交的运行，并在当前上下文中绑定运行ID以便上报阶段"""
+        token = run_tracker.set_current(record.id)
+        try:
+            result = await SpiderLogicService._execute_spider_cached(
+                spider, record.params
+            )
+            if isinstance(result, dict) and result.get("status") == "error":
+                run_tracker.finish(
+                    record.id, result, error=result.get("message", "error")
+                )
+            else:
+                run_tracker.finish(record.id, result)
+        except Exception as e:
+            logger.error(f"Async run {record.id} of spider {spider.id} failed: {e}")
+            run_tracker.finish(record.id, error=str(e))
+        finally:
+            run_tracker.reset_current(token)
+
+    @staticmethod
+    async def _execute_spider(
+        spider: Spider, params: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """根据爬虫语言类型执行一次爬虫，返回爬虫自身的结果"""
+        params = params or {}
+        # 为了兼容，我们仍然支持通过module_path和class_name调用自定义JS爬虫
+        # 但优先使用我们新的Puppeteer爬虫实现
+        if spider.language == "python":
+            return await SpiderLogicService._run_python_spider(spider, params)
+        elif spider.language == "javascript":
+            # 如果指定了module_path，则使用自定义JS爬虫
+            if spider.module_path:
+                return await SpiderLogicService._run_javascript_spider(spider, params)
+            # 否则使用默认的Puppeteer爬虫
+            return await SpiderLogicService._run_default_puppeteer_spider(
+                spider, params
+            )
+        raise ValueError(f"Unsupported spider language: {spider.language}")
+
+    @staticmethod
+    async def _execute_spider_cached(
+        spider: Spider,
+        params: Optional[Dict[str, Any]] = None,
+        priority: int = PRIORITY_API,
+        source: str = "api",
+        task_id: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """执行爬虫，相同URL和参数的结果在TTL内直接复用，并发的相同请求只截图一次
+
+        未命中缓存时按优先级进入工作队列，由固定数量的工作协程执行，
+        每次实际执行都写入运行历史。
+        params中传入 cache=False 可跳过缓存。
+        """
+        params = dict(params or {})
+        use_cache = params.pop("cache", True)
+        key = ResultCache.make_key(spider.id, params) if use_cache else None
+
+        async def execute() -> Dict[str, Any]:
+            async with run_history.track(spider.id, task_id, source) as run:
+                report_phase("started")
+                run.result = await SpiderLogicService._execute_spider(spider, params)
+            return run.result
+
+        return await result_cache.get_or_run(
+            key, lambda: work_queue.run(execute, priority, source)
+        )
+
+    @staticmethod
+    async def run_spider_batch(
+        spider: Spider,
+        urls: List[str],
+        params: Optional[Dict[str, Any]] = None,
+        max_concurrency: Optional[int] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """批量运行爬虫，按完成顺序逐个产出每个URL的结果
+
+        所有URL共享浏览器池，单个批次由 max_concurrency 个工作协程依次领取URL，
+        所有批次的总并发不超过全局上限；协程数量与URL数量无关。
+        """
+        limit = min(max_concurrency or BATCH_MAX_CONCURRENCY, BATCH_MAX_CONCURRENCY)
+        pending = iter(enumerate(urls))
+        results: asyncio.Queue = asyncio.Queue()
+
+        async def run_one(index: int, url: str) -> Dict[str, Any]:
+            async with _batch_semaphore:
+                try:
+                    result = await SpiderLogicService._execute_spider_cached(
+                        spider, {**(params or {}), "url": url}
+                    )
+                    status = (
+                        result.get("status", "success")
+                        if isinstance(result, dict)
+                        else "success"
+                    )
+                    return {
+                        "index": index,
+                        "url": url,
+                        "status": status,
+                        "result": result,
+                    }
+                except Exception as e:
+                    logger.error(f"Batch run of spider {spider.id} failed for {url}: {e}")
+                    return {
+                        "index": index,
+                        "url": url,
+                        "status": "error",
+                        "message": str(e),
+                    }
+
+        async def worker() -> None:
+            for index, url in pending:
+                await results.put(await run_one(index, url))
+
+        workers = [
+            asyncio.create_task(worker()) for _ in range(min(limit, len(urls)))
+        ]
+        try:
+            for _ in range(len(urls)):
+                yield await results.get()
+        finally:
+            # 客户端断开时取消剩余任务
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    @staticmethod
+    async def _run_python_spider(
+        spider: Spider, params: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
         """运行Python爬虫"""
+        # 开启工作进程池时在预启动的子进程中运行，不占用API进程的事件循环
+        if spider_worker_pool.enabled:
+            result = await spider_worker_pool.run(spider, params or {})
+            report_phase("captured")
+            return result
+
         try:
-            # 动态导入爬虫模块
-            import importlib
-
-            module = importlib.import_module(spider.module_path)
-            # 获取爬虫类
-            spider_class = getattr(module, spider.class_name)
-            # 实例化爬虫
-            spider_instance = spider_class()
-            # 运行爬虫
-            result = await spider_instance.run()
+            # 从缓存获取爬虫类和实例，模块文件变化时自动重新加载
+            spider_instance = spider_registry.get_instance(spider)
+            # 运行爬虫，params作为关键字参数传入（如url）
+            result = await spider_instance.run(**(params or {}))
             return result
         except ImportError as e:
             logger.error(f"Failed to import spider module {spider.module_path}: {e}")
@@ -101,123 +286,73 @@ class SpiderLogicService:
             raise ValueError(f"Failed to find spider class: {e}")
 
     @staticmethod
-    async def _run_javascript_spider(spider: Spider) -> Dict[str, Any]:
+    async def _run_javascript_spider(
+        spider: Spider, params: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
         """运行JavaScript爬虫"""
         try:
-            # 获取Node.js路径
-            node_path = SpiderLogicService._get_node_path()
-
-            # 构造命令 - 直接调用puppeteer_spider.js并传递URL参数
-            # 假设spider.class_name存储的是要爬取的URL
-            command = [
-                node_path,
-                os.path.join(
-                    os.path.dirname(__file__), "..", "spider", "puppeteer_spider.js"
-                ),
-                spider.class_name,  # 这里用作URL参数
-            ]
-
-            logger.info(f"Running JavaScript spider command: {' '.join(command)}")
-
-            # 运行命令
-            process = await asyncio.create_subprocess_exec(
-                *command, stdout=subprocess.PIPE, stderr=subprocess.PIPE
-            )
-
-            # 获取输出
-            stdout, stderr = await process.communicate()
-
-            if process.returncode != 0:
-                error_msg = stderr.decode("utf-8", errors="replace").strip()
-                logger.error(f"JavaScript spider error: {error_msg}")
-                raise ValueError(f"JavaScript spider failed: {error_msg}")
-
-            # 解析输出
-            result_str = stdout.decode("utf-8", errors="replace").strip()
-            try:
-                import json
-
-                result = json.loads(result_str)
-                return result
-            except json.JSONDecodeError:
-                logger.error(f"Failed to parse JavaScript spider output: {result_str}")
-                raise ValueError(f"Failed to parse JavaScript spider output")
+            # 通过常驻Node工作进程运行puppeteer_spider.js
+            # 优先使用传入的url，否则class_name用作URL参数
+            url = (params or {}).get("url") or spider.class_name
+            logger.info(f"Running JavaScript spider {spider.id} for {url}")
+
+            result = await node_sidecar.run(url, spider.name)
+            report_phase("captured")
+            await SpiderLogicService._record_js_screenshot(result, url)
+            return result
         except Exception as e:
             logger.error(f"Error running JavaScript spider: {e}")
             raise ValueError(f"Error running JavaScript spider: {e}")
 
     @staticmethod
-    async def _run_default_puppeteer_spider(spider: Spider) -> Dict[str, Any]:
+    async def _run_default_puppeteer_spider(
+        spider: Spider, params: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
         """运行默认的Puppeteer爬虫"""
         try:
-            # 获取Node.js路径
-            node_path = SpiderLogicService._get_node_path()
-
-            # 构造命令 - 调用puppeteer_spider.js并传递URL参数
-            # 假设spider.name存储的是要爬取的URL
-            command = [
-                node_path,
-                os.path.join(
-                    os.path.dirname(__file__), "..", "spider", "puppeteer_spider.js"
-                ),
-                spider.name,  # 使用爬虫名称作为URL
-            ]
-
-            logger.info(
-                f"Running default Puppeteer spider command: {' '.join(command)}"
-            )
-
-            # 运行命令
-            process = await asyncio.create_subprocess_exec(
-                *command, stdout=subprocess.PIPE, stderr=subprocess.PIPE
-            )
-
-            # 获取输出
-            stdout, stderr = await process.communicate()
-
-            if process.returncode != 0:
-                error_msg = stderr.decode("utf-8", errors="replace").strip()
-                logger.error(f"Puppeteer spider error: {error_msg}")
-                raise ValueError(f"Puppeteer spider failed: {error_msg}")
-
-            # 解析输出
-            result_str = stdout.decode("utf-8", errors="replace").strip()
-            try:
-                import json
-
-                result = json.loads(result_str)
-                return result
-            except json.JSONDecodeError:
-                logger.error(f"Failed to parse Puppeteer spider output: {result_str}")
-                raise ValueError(f"Failed to parse Puppeteer spider output")
+            # 通过常驻Node工作进程运行puppeteer_spider.js
+            # 优先使用传入的url，否则使用爬虫名称作为URL
+            url = (params or {}).get("url") or spider.name
+            logger.info(f"Running default Puppeteer spider {spider.id} for {url}")
+
+            result = await node_sidecar.run(url, spider.name)
+            report_phase("captured")
+            await SpiderLogicService._record_js_screenshot(result, url)
+            return result
         except Exception as e:
             logger.error(f"Error running Puppeteer spider: {e}")
             raise ValueError(f"Error running Puppeteer spider: {e}")
 
     @staticmethod
-    def _get_node_path() -> str:
-        """获取Node.js可执行文件路径"""
-        # 尝试从环境变量获取
-        node_path = os.environ.get("NODE_PATH")
-        if node_path and os.path.exists(node_path):
-            return node_path
-
-        # 尝试标准安装路径
-        if os.name == "nt":  # Windows
-            standard_paths = [
-                "C:\\Program Files\\nodejs\\node.exe",
-                "C:\\Program Files (x86)\\nodejs\\node.exe",
-            ]
-        else:  # Unix-like
-            standard_paths = ["/usr/bin/node", "/usr/local/bin/node"]
-
-        for path in standard_paths:
-            if os.path.exists(path):
-                return path
-
-        raise ValueError(
-            "Node.js not found. Please install Node.js or set NODE_PATH environment variable."
-        )
+    async def _record_js_screenshot(result: Dict[str, Any], url: str) -> None:
+        """Puppeteer爬虫直接写入内容寻址存储，这里补登记索引"""
+        if not isinstance(result, dict) or not result.get("sha256"):
+            return
+        try:
+            await screenshot_store.record(
+                result["sha256"], result["screenshotPath"], result.get("size", 0), url
+            )
+        except Exception as e:
+            logger.warning(f"Failed to index Puppeteer screenshot: {e}")
+
+    @staticmethod
+    async def reload_spider(spider_id: int, db: AsyncSession) -> Dict[str, Any]:
+        """强制重新加载Python爬虫模块"""
+        spider = await SpiderLogicService.get_spider_by_id(spider_id, db)
+        if spider.language != "python":
+            raise ValueError(f"Spider {spider_id} is not a python spider")
+        try:
+            spider_class = spider_registry.reload(spider)
+        except (ImportError, AttributeError) as e:
+            raise ValueError(f"Failed to reload spider module: {e}")
+        result_cache.invalidate(spider_id)
+
+        logger.info(f"Spider {spider_id} ({spider.name}) reloaded")
+        return {
+            "status": "success",
+            "message": f"Spider {spider_id} reloaded",
+            "class": f"{spider_class.__module__}.{spider_class.__name__}",
+        }
 
     @staticmethod
     async def get_spider_by_id(spider_id: int, db: AsyncSession) -> Spider:
@@ -232,25 +367,49 @@ class SpiderLogicService:
         db: AsyncSession, skip: int = 0, limit: int = 100
     ) -> List[Spider]:
         """获取所有爬虫"""
-        query = select(Spider).offset(skip).limit(limit)
+        query = select(Spider).order_by(Spider.id).offset(skip).limit(limit)
         result = await db.execute(query)
         return result.scalars().all()
 
     @staticmethod
-    async def get_spider_count(db: AsyncSession) -> int:
-        """获取爬虫总数"""
-        query = select(func.count(Spider.id))
-        result = await db.execute(query)
-        return result.scalar_one()
+    async def get_spider_count(db: AsyncSession, approximate: bool = False) -> int:
+        """获取爬虫总数，approximate 时使用表统计估计值"""
+        return await count_rows(db, Spider, approximate)
 
     @staticmethod
     async def get_spiders_with_count(
-        db: AsyncSession, skip: int = 0, limit: int = 100
+        db: AsyncSession,
+        skip: int = 0,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        count: str = "exact",
     ) -> Dict[str, Any]:
-        """获取带总数的爬虫列表"""
-        spiders = await SpiderLogicService.get_all_spiders(db, skip, limit)
-        total = await SpiderLogicService.get_spider_count(db)
-        return {"total": total, "spiders": spiders}
+        """获取带总数的爬虫列表
+
+        传入 cursor 时按ID做游标分页（忽略skip）；count 为 exact / approximate / none。
+        """
+        next_cursor = None
+        if cursor is not None:
+            spiders, next_cursor = await fetch_keyset_page(
+                db, select(Spider), Spider.id, limit, decode_cursor(cursor)
+            )
+        else:
+            spiders = await SpiderLogicService.get_all_spiders(db, skip, limit)
+            if len(spiders) == limit:
+                next_cursor = encode_cursor(spiders[-1].id)
+
+        total = None
+        if count != "none":
+            total = await SpiderLogicService.get_spider_count(
+                db, approximate=count == "approximate"
+            )
+        return {"total": total, "spiders": spiders, "next_cursor": next_cursor}
+
+    @staticmethod
+    async def iter_spiders(page_size: int = 1000) -> AsyncIterator[List[Spider]]:
+        """分页遍历所有爬虫，用于流式导出"""
+        async for rows in iter_keyset_pages(select(Spider), Spider.id, page_size):
+            yield rows
 
     @staticmethod
     async def create_spider_with_validation(
@@ -262,9 +421,7 @@ class SpiderLogicService:
             # 检查Python模块是否存在
             module_path = spider_data.module_path
             try:
-                import importlib
-
-                module = importlib.import_module(module_path)
+                module = spider_registry.load_module(module_path)
                 # 检查类是否存在
                 if not hasattr(module, spider_data.class_name):
                     raise ValueError(
@@ -310,8 +467,11 @@ class SpiderLogicService:
         )
 
         db.add(db_spider)
+        await db.flush()
+        await spider_cache.publish(db, db_spider.id)
         await db.commit()
         await db.refresh(db_spider)
+        spider_cache.put(db_spider)
 
         logger.info(f"Spider {db_spider.id} ({db_spider.name}) created successfully")
         return db_spider
@@ -330,8 +490,12 @@ class SpiderLogicService:
             setattr(db_spider, key, value)
 
         db.add(db_spider)
+        await spider_cache.publish(db, spider_id)
         await db.commit()
         await db.refresh(db_spider)
+        spider_cache.put(db_spider)
+        result_cache.invalidate(spider_id)
+        spider_registry.invalidate(spider_id)
 
         logger.info(f"Spider {spider_id} ({db_spider.name}) updated successfully")
         return db_spider
@@ -395,6 +559,13 @@ class SpiderLogicService:
 
         db_spider = await SpiderLogicService.create_spider(spider_data, db)
 
+        # 新文件上传后立即生效：让导入系统看到新文件，并加载/重新加载模块
+        if language == "python":
+            try:
+                spider_registry.load_module(module_path, force_reload=True)
+            except Exception as e:
+                logger.warning(f"Uploaded spider module {module_path} failed to load: {e}")
+
         logger.info(f"爬虫 {name} 上传成功，文件保存至 {file_path}")
 
         return {"status": "success", "message": "爬虫上传成功", "spider": db_spider}
@@ -434,6 +605,10 @@ class SpiderLogicService:
 
         # 从数据库中删除爬虫记录
         await db.delete(spider)
+        await spider_cache.publish(db, spider_id)
         await db.commit()
+        spider_cache.invalidate(spider_id)
+        result_cache.invalidate(spider_id)
+        spider_registry.invalidate(spider_id)
 
         logger.info(f"Spider {spider_id} ({spider.name}) deleted successfully")
@@ -0,0 +1,138 @@
+import importlib
+import logging
+import os
+import sys
+from types import ModuleType
+from typing import Any, Dict, Optional
+
+from config.load_config import get_setting
+
+logger = logging.getLogger(__name__)
+
+
+def _module_mtime(module: ModuleType) -> Optional[float]:
+    path = getattr(module, "__file__", None)
+    if not path:
+        return None
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+class _RegistryEntry:
+    def __init__(self, module_path: str, class_name: str, spider_class: type):
+        self.module_path = module_path
+        self.class_name = class_name
+        self.spider_class = spider_class
+        self.instance: Optional[Any] = None
+
+
+class SpiderRegistry:
+    """Python爬虫类缓存
+
+    按爬虫ID缓存解析出的类（可选缓存实例），模块文件mtime变化时自动重新加载，
+    爬虫更新、删除或上传新文件时显式失效，无需重启服务。
+    """
+
+    def __init__(self):
+        self.reuse_instances: bool = get_setting(
+            "spider_registry.reuse_instances", False
+        )
+        self._entries: Dict[int, _RegistryEntry] = {}
+        # 模块路径 -> 加载时的文件mtime
+        self._module_mtimes: Dict[str, Optional[float]] = {}
+
+    def load_module(self, module_path: str, force_reload: bool = False) -> ModuleType:
+        """导入模块，文件有变化或强制时重新加载"""
+        module = sys.modules.get(module_path)
+        if module is None:
+            # 让导入系统看到新上传的文件
+            importlib.invalidate_caches()
+            module = importlib.import_module(module_path)
+            self._module_mtimes[module_path] = _module_mtime(module)
+            return module
+
+        mtime = _module_mtime(module)
+        if force_reload or mtime != self._module_mtimes.get(module_path, mtime):
+            logger.info(f"Reloading spider module {module_path}")
+            importlib.invalidate_caches()
+            module = importlib.reload(module)
+            # 依赖该模块的爬虫类需要重新解析
+            for spider_id in [
+                sid
+                for sid, entry in self._entries.items()
+                if entry.module_path == module_path
+            ]:
+                del self._entries[spider_id]
+        self._module_mtimes[module_path] = mtime
+        return module
+
+    def resolve(
+        self, module_path: str, class_name: str, force_reload: bool = False
+    ) -> type:
+        """解析模块中的爬虫类，找不到时抛出ImportError/AttributeError"""
+        module = self.load_module(module_path, force_reload)
+        return getattr(module, class_name)
+
+    def _get_entry(self, spider: Any) -> _RegistryEntry:
+        # 先检查模块文件是否有变化，变化时会清掉相关条目
+        self.load_module(spider.module_path)
+        entry = self._entries.get(spider.id)
+        if (
+            entry is None
+            or entry.module_path != spider.module_path
+            or entry.class_name != spider.class_name
+        ):
+            entry = _RegistryEntry(
+                spider.module_path,
+                spider.class_name,
+                self.resolve(spider.module_path, spider.class_name),
+            )
+            self._entries[spider.id] = entry
+        return entry
+
+    def get_class(self, spider: Any) -> type:
+        """获取爬虫类（命中缓存时不再导入模块）"""
+        return self._get_entry(spider).spider_class
+
+    def get_instance(self, spider: Any) -> Any:
+        """获取爬虫实例，开启 reuse_instances 时复用同一实例
+
+        实例的 name 设为数据库中的爬虫名称，按名称区分的配置（如 [lean_load.<爬虫名>]）
+        对同一个类的不同爬虫分别生效。
+        """
+        entry = self._get_entry(spider)
+        if not self.reuse_instances:
+            instance = entry.spider_class()
+        else:
+            if entry.instance is None:
+                entry.instance = entry.spider_class()
+            instance = entry.instance
+        name = getattr(spider, "name", None)
+        if name:
+            instance.name = name
+        return instance
+
+    def invalidate(self, spider_id: int) -> None:
+        """清除指定爬虫的缓存"""
+        self._entries.pop(spider_id, None)
+
+    def reload(self, spider: Any) -> type:
+        """强制重新加载爬虫模块并返回新的类"""
+        self.invalidate(spider.id)
+        self.load_module(spider.module_path, force_reload=True)
+        return self.get_class(spider)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "reuse_instances": self.reuse_instances,
+            "spiders": {
+                spider_id: f"{entry.module_path}.{entry.class_name}"
+                for spider_id, entry in self._entries.items()
+            },
+        }
+
+
+# --- 实例化 ---
+spider_registry = SpiderRegistry()
@@ -0,0 +1,221 @@
+import asyncio
+import importlib
+import logging
+import multiprocessing
+import os
+import resource
+import sys
+from multiprocessing.connection import Connection
+from typing import Any, Dict, List, Optional
+
+from config.load_config import get_setting
+
+logger = logging.getLogger(__name__)
+
+
+def _rss_mb() -> float:
+    """当前进程的峰值常驻内存（MB）"""
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 返回字节，Linux 返回KB
+    return usage / (1024 * 1024) if sys.platform == "darwin" else usage / 1024
+
+
+def _worker_main(conn: Connection, preload: List[str]) -> None:
+    """工作进程入口：预先导入Playwright和爬虫模块，在常驻事件循环中串行执行爬虫"""
+    from app.services.browser_pool import browser_pool
+    from app.services.image_pipeline import image_pipeline
+    from app.services.spider_registry import spider_registry
+
+    # 工作进程本身已在API进程之外，截图编码放到线程中，不再嵌套进程池
+    image_pipeline.use_processes = False
+    # 工作进程串行执行爬虫，每个进程只需要少量浏览器，而不是完整的 [browser_pool]
+    browser_pool.size = get_setting("python_workers.browsers_per_worker", 1)
+
+    for module_path in preload:
+        try:
+            importlib.import_module(module_path)
+        except Exception as e:
+            logger.warning(f"Failed to preload spider module {module_path}: {e}")
+
+    # 常驻事件循环，使浏览器池在多次运行间保持打开
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    class _Spider:
+        def __init__(self, spider: Dict[str, Any]):
+            self.__dict__.update(spider)
+
+    try:
+        while True:
+            try:
+                message = conn.recv()
+            except EOFError:
+                break
+            if message is None:
+                break
+
+            try:
+                spider_instance = spider_registry.get_instance(_Spider(message["spider"]))
+                result = loop.run_until_complete(
+                    spider_instance.run(**message["params"])
+                )
+                conn.send({"result": result, "rss_mb": _rss_mb()})
+            except Exception as e:
+                conn.send(
+                    {"error": f"{type(e).__name__}: {e}", "rss_mb": _rss_mb()}
+                )
+    finally:
+        loop.run_until_complete(browser_pool.close())
+        loop.close()
+
+
+class _Worker:
+    def __init__(self, process: multiprocessing.Process, conn: Connection):
+        self.process = process
+        self.conn = conn
+        self.runs = 0
+
+    @property
+    def alive(self) -> bool:
+        return self.process.is_alive()
+
+
+class SpiderWorkerPool:
+    """预启动的Python爬虫工作进程池
+
+    工作进程预先导入Playwright和已注册的爬虫模块，爬虫运行通过管道分发到工作进程，
+    API进程的事件循环不再被阻塞型或CPU密集型爬虫拖慢。
+    工作进程累计运行max_runs次或内存超过上限后回收重启。
+    """
+
+    def __init__(self):
+        self.enabled: bool = get_setting("python_workers.enabled", False)
+        self.size: int = get_setting("python_workers.size", os.cpu_count() or 2)
+        self.browsers_per_worker: int = get_setting(
+            "python_workers.browsers_per_worker", 1
+        )
+        self.max_runs: int = get_setting("python_workers.max_runs", 100)
+        self.max_memory_mb: float = get_setting("python_workers.max_memory_mb", 1024)
+        self.preload: List[str] = get_setting(
+            "python_workers.preload", ["spider.screen_shot_service"]
+        )
+        self._ctx = multiprocessing.get_context("spawn")
+        self._idle: Optional[asyncio.Queue] = None
+        self._workers: List[_Worker] = []
+
+    @property
+    def started(self) -> bool:
+        return self._idle is not None
+
+    def _spawn(self) -> _Worker:
+        parent_conn, child_conn = self._ctx.Pipe()
+        # 非守护进程：爬虫内部的截图编码等可能再创建子进程，由 close() 显式回收
+        process = self._ctx.Process(
+            target=_worker_main, args=(child_conn, self.preload), daemon=False
+        )
+        process.start()
+        child_conn.close()
+        worker = _Worker(process, parent_conn)
+        self._workers.append(worker)
+        return worker
+
+    async def start(self, preload: Optional[List[str]] = None) -> None:
+        """启动工作进程，preload为额外需要预导入的爬虫模块"""
+        if self.started:
+            return
+        if preload:
+            self.preload = list(dict.fromkeys([*self.preload, *preload]))
+        self._idle = asyncio.Queue()
+        for _ in range(self.size):
+            self._idle.put_nowait(await asyncio.to_thread(self._spawn))
+        logger.info(f"Python spider worker pool started with {self.size} workers")
+
+    async def _retire(self, worker: _Worker) -> None:
+        if worker in self._workers:
+            self._workers.remove(worker)
+        try:
+            worker.conn.send(None)
+        except Exception:
+            pass
+        await asyncio.to_thread(worker.process.join, 10)
+        if worker.process.is_alive():
+            worker.process.kill()
+        worker.conn.close()
+
+    @staticmethod
+    def _roundtrip(worker: _Worker, message: Dict[str, Any]) -> Dict[str, Any]:
+        worker.conn.send(message)
+        return worker.conn.recv()
+
+    async def run(self, spider: Any, params: Dict[str, Any]) -> Dict[str, Any]:
+        """在空闲工作进程中运行爬虫"""
+        if not self.started:
+            await self.start()
+
+        worker: _Worker = await self._idle.get()
+        if not worker.alive:
+            await self._retire(worker)
+            worker = await asyncio.to_thread(self._spawn)
+
+        message = {
+            "spider": {
+                "id": spider.id,
+                "name": spider.name,
+                "module_path": spider.module_path,
+                "class_name": spider.class_name,
+            },
+            "params": params,
+        }
+        response: Optional[Dict[str, Any]] = None
+        call = asyncio.ensure_future(
+            asyncio.to_thread(self._roundtrip, worker, message)
+        )
+        try:
+            response = await asyncio.shield(call)
+        except asyncio.CancelledError:
+            # 线程仍阻塞在 recv 上，结束工作进程使其返回，再回收线程
+            worker.process.kill()
+            await asyncio.gather(call, return_exceptions=True)
+            raise
+        except (EOFError, OSError) as e:
+            raise ValueError(f"Spider worker process died: {e}")
+        finally:
+            worker.runs += 1
+            over_memory = (
+                response is not None
+                and response.get("rss_mb", 0) > self.max_memory_mb
+            )
+            if over_memory:
+                logger.info(
+                    f"Spider worker {worker.process.pid} exceeded memory cap "
+                    f"({response['rss_mb']:.0f} MB), recycling"
+                )
+            if response is None or over_memory or worker.runs >= self.max_runs:
+                await self._retire(worker)
+                worker = await asyncio.to_thread(self._spawn)
+            self._idle.put_nowait(worker)
+
+        if "error" in response:
+            raise ValueError(response["error"])
+        return response["result"]
+
+    async def close(self) -> None:
+        for worker in list(self._workers):
+            await self._retire(worker)
+        self._idle = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "size": self.size,
+            "browsers_per_worker": self.browsers_per_worker,
+            "idle": self._idle.qsize() if self._idle else 0,
+            "workers": [
+                {"pid": w.process.pid, "alive": w.alive, "runs": w.runs}
+                for w in self._workers
+            ],
+        }
+
+
+# --- 实例化 ---
+spider_worker_pool = SpiderWorkerPool()
@@ -0,0 +1,108 @@
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# 浏览器导出cookie的sameSite取值 -> Playwright取值
+_SAME_SITE_MAP = {
+    "strict": "Strict",
+    "lax": "Lax",
+    "none": "None",
+    "no_restriction": "None",
+}
+
+
+def normalize_cookies(raw_cookies: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """将浏览器插件导出的cookie转换为Playwright storage_state格式"""
+    cookies = []
+    for raw in raw_cookies:
+        if "name" not in raw or "value" not in raw:
+            continue
+
+        same_site = _SAME_SITE_MAP.get(str(raw.get("sameSite", "")).lower(), "Lax")
+        expires = raw.get("expires", raw.get("expirationDate"))
+        if raw.get("session") or expires is None:
+            expires = -1
+
+        cookies.append(
+            {
+                "name": raw["name"],
+                "value": raw["value"],
+                "domain": raw.get("domain", ""),
+                "path": raw.get("path", "/"),
+                "expires": float(expires),
+                "httpOnly": bool(raw.get("httpOnly", False)),
+                "secure": bool(raw.get("secure", False)),
+                "sameSite": same_site,
+            }
+        )
+    return cookies
+
+
+class StorageStateCache:
+    """cookie文件解析缓存
+
+    cookie文件只解析一次并转换为Playwright的storage_state，
+    文件mtime变化时自动失效。
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def version(self, path: Union[str, Path]) -> Optional[float]:
+        """返回文件当前的mtime，文件不存在时返回None"""
+        try:
+            return os.stat(path).st_mtime
+        except OSError:
+            return None
+
+    def get(self, path: Union[str, Path]) -> Tuple[Optional[float], Dict[str, Any]]:
+        """获取(版本, storage_state)，文件未变化时直接返回缓存"""
+        key = str(path)
+        mtime = self.version(key)
+        if mtime is None:
+            logger.warning(f"Cookie file not found: {key}")
+            return None, {"cookies": [], "origins": []}
+
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached and cached[0] == mtime:
+                return cached
+
+        try:
+            with open(key, "r", encoding="utf-8") as f:
+                raw = json.load(f)
+        except Exception as e:
+            logger.error(f"Error loading cookies from {key}: {e}")
+            return None, {"cookies": [], "origins": []}
+
+        # 兼容直接保存的storage_state文件
+        if isinstance(raw, dict):
+            state = {
+                "cookies": normalize_cookies(raw.get("cookies", [])),
+                "origins": raw.get("origins", []),
+            }
+        else:
+            state = {"cookies": normalize_cookies(raw), "origins": []}
+
+        with self._lock:
+            self._entries[key] = (mtime, state)
+        logger.info(f"Parsed storage state from {key} ({len(state['cookies'])} cookies)")
+        return mtime, state
+
+    def invalidate(self, path: Optional[Union[str, Path]] = None) -> None:
+        """清除指定文件或全部缓存"""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(str(path), None)
+
+
+# --- 实例化 ---
+storage_state_cache = StorageStateCache()
@@ -0,0 +1,253 @@
+import codecs
+import csv
+import hashlib
+import json
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from app.database.database import db_manager
+from app.utils.url import normalize_url
+from config.load_config import get_setting
+
+logger = logging.getLogger(__name__)
+
+_STAGING_TABLE = "spider_targets_staging"
+
+_CREATE_STAGING = f"""
+CREATE TEMP TABLE IF NOT EXISTS {_STAGING_TABLE} (
+    spider_name text NOT NULL,
+    url text NOT NULL,
+    url_hash text NOT NULL,
+    host text NOT NULL
+) ON COMMIT DELETE ROWS
+"""
+
+_MERGE_STAGING = f"""
+INSERT INTO spider_targets
+    (spider_name, url, url_hash, host, priority, failures, created_at, updated_at)
+SELECT spider_name, url, url_hash, host, 0, 0, now(), now() FROM {_STAGING_TABLE}
+ON CONFLICT (spider_name, url_hash) DO NOTHING
+"""
+
+_PENDING_BACKFILL = """
+SELECT id, spider_name, url FROM spider_targets
+WHERE url_hash IS NULL AND id > $1 ORDER BY id LIMIT $2
+"""
+
+# 与已有记录重复的行只补 host，url_hash 留空以免违反唯一索引
+_BACKFILL_ROW = """
+UPDATE spider_targets AS t
+SET host = $2,
+    url_hash = CASE WHEN $3::text IS NULL OR EXISTS (
+        SELECT 1 FROM spider_targets AS d
+        WHERE d.spider_name = t.spider_name AND d.url_hash = $3::text
+    ) THEN NULL ELSE $3::text END
+WHERE t.id = $1
+"""
+
+
+def url_hash(normalized_url: str) -> str:
+    """规范化URL的哈希，与 spider_name 一起构成唯一索引"""
+    return hashlib.sha1(normalized_url.encode("utf-8")).hexdigest()
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """把字节流按行切分，跨块的行和多字节字符会被正确拼接"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    buffer = ""
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer.rstrip("\r")
+
+
+class _CsvRows:
+    """逐行解析CSV；首行包含 url 列时作为表头，否则第一列即为URL"""
+
+    def __init__(self):
+        self._columns: Optional[Dict[str, int]] = None
+
+    def parse(self, line: str) -> Optional[Tuple[Optional[str], str]]:
+        fields = next(csv.reader([line]), [])
+        if not fields:
+            return None
+        if self._columns is None:
+            names = [field.strip().lower() for field in fields]
+            if "url" in names:
+                self._columns = {name: index for index, name in enumerate(names)}
+                return None
+            self._columns = {"url": 0}
+        url_index = self._columns["url"]
+        name_index = self._columns.get("spider_name")
+        url = fields[url_index] if url_index < len(fields) else ""
+        name = (
+            fields[name_index]
+            if name_index is not None and name_index < len(fields)
+            else None
+        )
+        return name or None, url
+
+
+def _parse_ndjson(line: str) -> Optional[Tuple[Optional[str], str]]:
+    """每行一个JSON对象 {"url": ..., "spider_name": ...} 或一个URL字符串"""
+    value = json.loads(line)
+    if isinstance(value, str):
+        return None, value
+    if isinstance(value, dict):
+        name, url = value.get("spider_name"), value.get("url")
+        return (str(name) if name else None), (str(url) if url else "")
+    raise ValueError("Expected an object or a string")
+
+
+class TargetIngestService:
+    """把CSV/NDJSON格式的爬取目标流式导入 spider_targets 表
+
+    请求体按行解析，每 chunk_size 行通过 asyncpg COPY 写入临时表，
+    再 INSERT ... ON CONFLICT DO NOTHING 合并进正式表，
+    依靠 (spider_name, url_hash) 唯一索引与已有记录去重，内存占用与文件大小无关。
+    """
+
+    def __init__(self):
+        self.chunk_size: int = get_setting("targets.import_chunk_size", 5000)
+
+    @staticmethod
+    def _prepare(
+        name: Optional[str], url: str, default_name: Optional[str]
+    ) -> Optional[Tuple[str, str, str, str]]:
+        """规范化一条目标，无效时返回None"""
+        spider_name = (name or default_name or "").strip()
+        url = (url or "").strip()
+        if not spider_name or not url:
+            return None
+        parts = urlsplit(url)
+        if parts.scheme.lower() not in ("http", "https") or not parts.hostname:
+            return None
+        normalized = normalize_url(url)
+        host = urlsplit(normalized).hostname
+        return spider_name, normalized, url_hash(normalized), host
+
+    async def ingest(
+        self,
+        chunks: AsyncIterator[bytes],
+        fmt: str = "csv",
+        spider_name: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """导入目标，返回接收、写入、跳过（重复）和无效的行数"""
+        if fmt not in ("csv", "ndjson"):
+            raise ValueError(f"Unsupported format: {fmt}")
+        parse = _CsvRows().parse if fmt == "csv" else _parse_ndjson
+        started = time.monotonic()
+        stats = {
+            "received": 0,
+            "inserted": 0,
+            "skipped": 0,
+            "invalid": 0,
+            "chunks": 0,
+        }
+        # (spider_name, url_hash) -> 行，合并文件内的重复
+        batch: Dict[Tuple[str, str], Tuple[str, str, str, str]] = {}
+
+        async with db_manager.engine.connect() as conn:
+            raw = await conn.get_raw_connection()
+            driver = raw.driver_connection
+            await driver.execute(_CREATE_STAGING)
+            try:
+                async for line in iter_lines(chunks):
+                    if not line.strip():
+                        continue
+                    try:
+                        parsed = parse(line)
+                    except ValueError:
+                        stats["received"] += 1
+                        stats["invalid"] += 1
+                        continue
+                    if parsed is None:
+                        continue
+                    stats["received"] += 1
+                    row = self._prepare(*parsed, spider_name)
+                    if row is None:
+                        stats["invalid"] += 1
+                        continue
+                    key = (row[0], row[2])
+                    if key in batch:
+                        stats["skipped"] += 1
+                        continue
+                    batch[key] = row
+                    if len(batch) >= self.chunk_size:
+                        await self._flush(driver, list(batch.values()), stats)
+                        batch.clear()
+                if batch:
+                    await self._flush(driver, list(batch.values()), stats)
+            finally:
+                if not driver.is_closed():
+                    await driver.execute(f"DROP TABLE IF EXISTS {_STAGING_TABLE}")
+
+        stats["duration_ms"] = int((time.monotonic() - started) * 1000)
+        logger.info(f"Imported spider targets: {stats}")
+        return stats
+
+    async def backfill(self) -> Dict[str, int]:
+        """为引入 url_hash/host 之前写入的目标补齐这两列
+
+        按ID分批处理 url_hash 为空的行；规范化后与已有记录重复的行只补 host。
+        """
+        stats = {"updated": 0, "duplicates": 0}
+        last_id = 0
+        async with db_manager.engine.connect() as conn:
+            raw = await conn.get_raw_connection()
+            driver = raw.driver_connection
+            while True:
+                rows = await driver.fetch(_PENDING_BACKFILL, last_id, self.chunk_size)
+                if not rows:
+                    break
+                last_id = rows[-1]["id"]
+                updates = []
+                for row in rows:
+                    try:
+                        normalized = normalize_url(row["url"] or "")
+                        host = urlsplit(normalized).hostname
+                    except ValueError:
+                        host = None
+                    updates.append(
+                        (row["id"], host, url_hash(normalized) if host else None)
+                    )
+                async with driver.transaction():
+                    await driver.executemany(_BACKFILL_ROW, updates)
+                    hashed = await driver.fetchval(
+                        "SELECT count(*) FROM spider_targets "
+                        "WHERE id = ANY($1::int[]) AND url_hash IS NOT NULL",
+                        [update[0] for update in updates],
+                    )
+                stats["updated"] += hashed
+                stats["duplicates"] += sum(1 for u in updates if u[2]) - hashed
+        if stats["updated"]:
+            logger.info(f"Backfilled url_hash/host for spider targets: {stats}")
+        return stats
+
+    @staticmethod
+    async def _flush(
+        driver, rows: List[Tuple[str, str, str, str]], stats: Dict[str, Any]
+    ) -> None:
+        """COPY 一批到临时表并合并，提交时临时表自动清空"""
+        async with driver.transaction():
+            await driver.copy_records_to_table(
+                _STAGING_TABLE,
+                records=rows,
+                columns=["spider_name", "url", "url_hash", "host"],
+            )
+            status = await driver.execute(_MERGE_STAGING)
+        # 状态形如 "INSERT 0 123"
+        inserted = int(status.rsplit(" ", 1)[-1])
+        stats["inserted"] += inserted
+        stats["skipped"] += len(rows) - inserted
+        stats["chunks"] += 1
+
+
+# --- 实例化 ---
+target_ingest = TargetIngestService()
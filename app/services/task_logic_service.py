@@ -1,16 +1,19 @@
 # app/services/task_logic_service.py
 import logging
-from typing import Any, Dict, List
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 # --- SQLAlchemy 2.0 导入 ---
 from sqlalchemy import delete, select  # 导入 select 和 delete
 from sqlalchemy.ext.asyncio import AsyncSession  # 导入 AsyncSession 类型提示
 
 # --- 内部导入 ---
+from app.database.pagination import (decode_cursor, fetch_keyset_page,
+                                     iter_keyset_pages)
 from app.database.models import Task as DBTask  # 确保模型导入正确
 from app.schemas.task import TaskCreate  # 确保 Pydantic 模型导入正确
 from app.services.spider_logic_service import SpiderLogicService
-from app.services.task_service import remove_task, schedule_task  # 确保调度服务导入正确
+from app.services.task_service import (publish_task_change,  # 确保调度服务导入正确
+                                       remove_task, schedule_task, scheduler)
 
 # --- 配置 ---
 logger = logging.getLogger(__name__)
@@ -35,6 +38,21 @@ class TaskLogicService:
         tasks = result.scalars().all()
         return tasks
 
+    @staticmethod
+    async def get_tasks_page(
+        db: AsyncSession, limit: int = 1000, cursor: Optional[str] = None
+    ) -> Tuple[List[DBTask], Optional[str]]:
+        """按ID游标分页获取任务，返回本页任务和下一页游标"""
+        return await fetch_keyset_page(
+            db, select(DBTask), DBTask.id, limit, decode_cursor(cursor)
+        )
+
+    @staticmethod
+    async def iter_tasks(page_size: int = 1000) -> AsyncIterator[List[DBTask]]:
+        """分页遍历所有任务，用于流式导出"""
+        async for rows in iter_keyset_pages(select(DBTask), DBTask.id, page_size):
+            yield rows
+
     # --- 修改 2: 类型提示 + SQLAlchemy 2.0 语法 ---
     @staticmethod
     async def get_task_by_id(
@@ -62,6 +80,12 @@ class TaskLogicService:
             spider_id=task.spider_id,
             cron_expression=task.cron_expression,
             description=task.description,
+            jitter_seconds=task.jitter_seconds,
+            spread_seconds=task.spread_seconds,
+            max_instances=task.max_instances,
+            coalesce=task.coalesce,
+            misfire_grace_time=task.misfire_grace_time,
+            skip_if_running=task.skip_if_running,
         )
         # 3. 添加到会话 (同步)
         db.add(db_task)
@@ -70,19 +94,30 @@ class TaskLogicService:
         # 5. 刷新对象以获取自动生成的 ID (异步，需要 await)
         await db.refresh(db_task)
 
+        if not scheduler.running:
+            # 6. 调度器运行在独立进程中，通过数据库通知其注册任务
+            db_task.job_id = f"task_{db_task.id}"
+            await publish_task_change(db, db_task.id, "upsert")
+            await db.commit()
+            logger.info(f"Task {db_task.id} sent to scheduler process")
+            return db_task
+
         try:
             # 6. 安排定时任务 (异步，需要 await)
             schedule_result = await schedule_task(
                 task_id=db_task.id,
                 spider_id=task.spider_id,
                 cron_expression=db_task.cron_expression,
+                jitter_seconds=db_task.jitter_seconds,
+                spread_seconds=db_task.spread_seconds,
+                max_instances=db_task.max_instances,
+                coalesce=db_task.coalesce,
+                misfire_grace_time=db_task.misfire_grace_time,
+                skip_if_running=db_task.skip_if_running,
             )
-            # 6. 更新数据库中的 job_id (如果需要的话)
-            #    注意：通常 job_id 不应该存储在数据库中，因为重启后会丢失。
-            #    更好的方式是在应用启动时根据数据库中的任务重新调度。
-            #    这里假设你的模型中有 job_id 字段。
-            # db_task.job_id = schedule_result["job_id"] # 如果模型有此字段
-            # await db.commit() # 如果更新了 db_task，需要再次提交
+            # 7. 更新数据库中的 job_id，重启后由 rehydrate_tasks 按数据库重新调度
+            db_task.job_id = schedule_result["job_id"]
+            await db.commit()
 
             logger.info(
                 f"Task {db_task.id} scheduled with job ID {schedule_result.get('job_id')}"
@@ -93,7 +128,7 @@ class TaskLogicService:
             # await db.rollback()
             # raise # 重新抛出异常
 
-        # 7. 返回创建好的任务对象
+        # 8. 返回创建好的任务对象
         return db_task
 
     # --- 修改 4: async def + await + SQLAlchemy 2.0 语法 ---
@@ -108,7 +143,11 @@ class TaskLogicService:
 
         try:
             # 2. 从调度器中移除任务 (异步，需要 await)
-            await remove_task(task_id)
+            #    调度器在独立进程中时发送通知，随删除一起提交
+            if scheduler.running:
+                await remove_task(task_id)
+            else:
+                await publish_task_change(db, task_id, "delete")
             logger.info(f"Task {task_id} removed from scheduler.")
         except Exception as e:
             logger.error(f"Failed to remove task {task_id} from scheduler: {e}")
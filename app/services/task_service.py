@@ -3,22 +3,134 @@ import json
 import logging
 import os
 import subprocess
-from typing import Any, Dict
+import time
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.base import BaseTrigger
 from apscheduler.triggers.cron import CronTrigger
 
-from config.load_config import Config
+from sqlalchemy import select, text
+
+from config.load_config import Config, get_setting
 from app.database.database import db_manager
-from app.database.models import Spider
+from app.database.models import Spider, Task
+from app.database.pagination import encode_cursor
+from app.database.notify import TASK_CHANNEL, PgListener, notify
+from app.services.job_queue import job_queue
 from app.services.spider_logic_service import SpiderLogicService
+from app.services.work_queue import PRIORITY_SCHEDULED
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 全局调度策略，任务上未设置的项使用这里的默认值
+SCHEDULER_DEFAULTS: Dict[str, Any] = {
+    "jitter_seconds": get_setting("scheduler.jitter_seconds", 0),
+    "spread_seconds": get_setting("scheduler.spread_seconds", 0),
+    "max_instances": get_setting("scheduler.max_instances", 1),
+    "coalesce": get_setting("scheduler.coalesce", True),
+    "misfire_grace_time": get_setting("scheduler.misfire_grace_time", 60),
+    "skip_if_running": get_setting("scheduler.skip_if_running", True),
+}
+
+# 是否在API进程内运行调度器；关闭时由独立的调度进程（python -m app.scheduler）运行
+SCHEDULER_EMBEDDED: bool = get_setting("scheduler.embedded", False)
+# 定期与数据库全量同步的间隔（秒），补偿错过的任务变更通知
+RESYNC_INTERVAL: float = get_setting("scheduler.resync_interval", 300)
+
 # 创建调度器
-scheduler = AsyncIOScheduler()
+scheduler = AsyncIOScheduler(
+    job_defaults={
+        "coalesce": SCHEDULER_DEFAULTS["coalesce"],
+        "max_instances": SCHEDULER_DEFAULTS["max_instances"],
+        "misfire_grace_time": SCHEDULER_DEFAULTS["misfire_grace_time"],
+    }
+)
+
+# 爬虫ID -> 正在运行的定时任务数，用于同一爬虫已在运行时跳过触发
+_running_spiders: Dict[int, int] = {}
+# job_id -> 注册时的调度签名，同步时据此判断任务是否需要替换
+_job_signatures: Dict[str, Tuple] = {}
+
+
+class OffsetCronTrigger(BaseTrigger):
+    """在cron触发时间上固定延后offset秒
+
+    cron表达式相同的任务按任务ID得到不同的偏移，触发时间均匀分散在窗口内。
+    """
+
+    def __init__(self, cron: CronTrigger, offset_seconds: int):
+        self.cron = cron
+        self.offset = timedelta(seconds=offset_seconds)
+
+    def get_next_fire_time(self, previous_fire_time, now):
+        if previous_fire_time is not None:
+            previous_fire_time = previous_fire_time - self.offset
+        next_fire_time = self.cron.get_next_fire_time(
+            previous_fire_time, now - self.offset
+        )
+        if next_fire_time is None:
+            return None
+        return next_fire_time + self.offset
+
+    def __str__(self) -> str:
+        return f"{self.cron} +{int(self.offset.total_seconds())}s"
+
+    def __repr__(self) -> str:
+        return f"<OffsetCronTrigger ({self.cron!r}, offset={self.offset})>"
+
+
+def resolve_policy(**overrides: Optional[Any]) -> Dict[str, Any]:
+    """合并任务上的调度策略和全局默认值"""
+    policy = dict(SCHEDULER_DEFAULTS)
+    for key, value in overrides.items():
+        if key in policy and value is not None:
+            policy[key] = value
+    return policy
+
+
+@lru_cache(maxsize=4096)
+def _compile_cron(cron_expression: str, jitter: Optional[int]) -> CronTrigger:
+    """编译cron表达式，相同表达式的任务共用同一个触发器"""
+    minute, hour, day, month, day_of_week = cron_expression.split()
+    return CronTrigger(
+        minute=minute,
+        hour=hour,
+        day=day,
+        month=month,
+        day_of_week=day_of_week,
+        jitter=jitter,
+        timezone=scheduler.timezone,
+    )
+
+
+def build_trigger(
+    task_id: int, cron_expression: str, policy: Dict[str, Any]
+) -> BaseTrigger:
+    """根据cron表达式和调度策略创建触发器"""
+    cron_parts = cron_expression.split()
+    if len(cron_parts) != 5:
+        raise ValueError(
+            "Invalid cron expression. Format: 'minute hour day month day_of_week'"
+        )
+
+    trigger = _compile_cron(" ".join(cron_parts), policy["jitter_seconds"] or None)
+
+    # 按任务ID固定错开，同一任务每次的偏移相同
+    spread = policy["spread_seconds"]
+    if spread:
+        return _offset_trigger(trigger, task_id * 7919 % spread)
+    return trigger
+
+
+@lru_cache(maxsize=4096)
+def _offset_trigger(cron: CronTrigger, offset_seconds: int) -> OffsetCronTrigger:
+    """相同cron和偏移的任务共用同一个触发器"""
+    return OffsetCronTrigger(cron, offset_seconds)
 
 
 def start_scheduler() -> None:
@@ -36,7 +148,7 @@ def shutdown_scheduler() -> None:
 
 
 async def schedule_task(
-    task_id: int, spider_id: int, cron_expression: str
+    task_id: int, spider_id: int, cron_expression: str, **policy: Optional[Any]
 ) -> Dict[str, Any]:
     """安排定时任务
 
@@ -44,23 +156,16 @@ async def schedule_task(
         task_id: 任务ID
         spider_id: 爬虫ID
         cron_expression: cron表达式
+        **policy: 调度策略（jitter_seconds、spread_seconds、max_instances、
+            coalesce、misfire_grace_time、skip_if_running），为空的项使用全局默认值
 
     Returns:
         任务调度结果
     """
-    # 解析cron表达式
-    cron_parts = cron_expression.split()
-    if len(cron_parts) != 5:
-        raise ValueError(
-            "Invalid cron expression. Format: 'minute hour day month day_of_week'"
-        )
-
-    minute, hour, day, month, day_of_week = cron_parts
+    policy = resolve_policy(**policy)
 
     # 创建触发器
-    trigger = CronTrigger(
-        minute=minute, hour=hour, day=day, month=month, day_of_week=day_of_week
-    )
+    trigger = build_trigger(task_id, cron_expression, policy)
 
     # 添加任务到调度器
     job_id = f"task_{task_id}"
@@ -70,8 +175,12 @@ async def schedule_task(
         id=job_id,
         name=f"Task for spider {spider_id}",
         replace_existing=True,
-        args=[spider_id],
+        args=[spider_id, task_id, policy["skip_if_running"]],
+        max_instances=policy["max_instances"],
+        coalesce=policy["coalesce"],
+        misfire_grace_time=policy["misfire_grace_time"],
     )
+    _job_signatures[job_id] = _task_signature(spider_id, cron_expression, policy)
 
     logger.info(
         f"Task {task_id} scheduled with cron expression: {cron_expression} for spider {spider_id}"
@@ -81,32 +190,65 @@ async def schedule_task(
 
 
 # 创建包装函数来处理异步调用
-async def run_spider_wrapper(spider_id: int) -> Dict[str, Any]:
+async def run_spider_wrapper(
+    spider_id: int, task_id: Optional[int] = None, skip_if_running: bool = False
+) -> Dict[str, Any]:
     """包装函数，用于在调度器中运行异步爬虫"""
+    if job_queue.enabled:
+        # 写入持久化队列，由各工作节点领取执行
+        try:
+            job_id = await job_queue.enqueue(
+                spider_id,
+                priority=PRIORITY_SCHEDULED,
+                source="scheduler",
+                task_id=task_id,
+                skip_if_pending=skip_if_running,
+            )
+        except Exception as e:
+            logger.error(f"Failed to enqueue task {task_id}: {str(e)}")
+            return {"status": "error", "message": f"Error enqueueing job: {str(e)}"}
+        if job_id is None:
+            logger.info(
+                f"Skipping task {task_id}: spider {spider_id} already has a pending job"
+            )
+            return {"status": "skipped", "message": "Spider already has a pending job"}
+        return {"status": "queued", "job_id": job_id}
+
+    if skip_if_running and _running_spiders.get(spider_id):
+        logger.info(
+            f"Skipping task {task_id}: spider {spider_id} is already running"
+        )
+        return {"status": "skipped", "message": "Spider is already running"}
+
+    _running_spiders[spider_id] = _running_spiders.get(spider_id, 0) + 1
     try:
-        return await run_spider_by_id(spider_id)
+        return await run_spider_by_id(spider_id, task_id)
     except Exception as e:
         logger.error(f"Error in scheduled task for spider {spider_id}: {str(e)}")
         return {"status": "error", "message": f"Error running spider: {str(e)}"}
+    finally:
+        _running_spiders[spider_id] -= 1
+        if not _running_spiders[spider_id]:
+            del _running_spiders[spider_id]
 
 
-async def run_spider_by_id(spider_id: int) -> Dict[str, Any]:
-    """根据爬虫ID运行爬虫"""
-    try:
-        # 获取数据库会话
-        session_gennerator = db_manager.get_db()
-        db_session = await anext(session_gennerator)
+async def run_spider_by_id(
+    spider_id: int, task_id: Optional[int] = None
+) -> Dict[str, Any]:
+    """根据爬虫ID运行爬虫
 
+    爬虫信息通过短会话读取，截图期间不持有数据库连接。
+    """
+    try:
         # 运行爬虫
-        result = await SpiderLogicService.run_spider(spider_id, db_session)
+        # 以定时任务优先级进入工作队列，避免同一时刻的大量触发直接并发执行
+        result = await SpiderLogicService.run_spider(
+            spider_id,
+            priority=PRIORITY_SCHEDULED,
+            source="scheduler",
+            task_id=task_id,
+        )
         logger.info(f"Scheduled run of spider {spider_id} completed successfully")
-
-        # 提交事务
-        try:
-            await anext(session_gennerator)
-        except StopAsyncIteration:
-            pass
-
         return result
     except Exception as e:
         logger.error(
@@ -121,37 +263,323 @@ async def remove_task(task_id: int) -> Dict[str, Any]:
     job_id = f"task_{task_id}"
     if scheduler.get_job(job_id):
         scheduler.remove_job(job_id)
+        _job_signatures.pop(job_id, None)
         logger.info(f"Task {task_id} removed")
         return {"message": f"Task {task_id} removed successfully"}
     else:
         raise ValueError(f"Task {task_id} not found in scheduler")
 
 
-def get_running_tasks() -> Dict[str, Any]:
-    """获取所有正在运行的定时任务"""
-    jobs = scheduler.get_jobs()
+# 启动恢复时每页读取的任务数
+REHYDRATE_PAGE_SIZE: int = get_setting("scheduler.rehydrate_page_size", 5000)
+
+_POLICY_FIELDS = (
+    "jitter_seconds",
+    "spread_seconds",
+    "max_instances",
+    "coalesce",
+    "misfire_grace_time",
+    "skip_if_running",
+)
+
+
+async def _active_tasks_page(after_id: int, limit: int) -> List[Any]:
+    """按ID读取一页激活爬虫的任务（调度相关字段），使用一个短会话"""
+    columns = [Task.id, Task.spider_id, Task.cron_expression] + [
+        getattr(Task, field) for field in _POLICY_FIELDS
+    ]
+    async with db_manager.session() as db:
+        result = await db.execute(
+            select(*columns)
+            .join(Spider, Spider.id == Task.spider_id)
+            .where(Task.id > after_id, Spider.is_active.is_(True))
+            .order_by(Task.id)
+            .limit(limit)
+        )
+        return result.all()
+
+
+async def _iter_active_tasks(page_size: int):
+    """按ID分页读取所有激活爬虫的任务，每页使用一个短会话"""
+    last_id = 0
+    while True:
+        rows = await _active_tasks_page(last_id, page_size)
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1].id
+
+
+def _task_signature(
+    spider_id: int, cron_expression: str, policy: Dict[str, Any]
+) -> Tuple:
+    """任务调度相关字段的签名，签名不变的任务在同步时保持原样"""
+    return (spider_id, " ".join(cron_expression.split()), tuple(sorted(policy.items())))
+
+
+def _add_jobs(specs: List[Tuple[int, int, BaseTrigger, Dict[str, Any]]]) -> int:
+    """通过 add_job 批量注册任务
+
+    注册期间暂停调度器，避免每添加一个任务都唤醒调度循环重新计算等待时间。
+    """
+    paused = scheduler.running
+    if paused:
+        scheduler.pause()
+    try:
+        for task_id, spider_id, trigger, policy in specs:
+            scheduler.add_job(
+                func=run_spider_wrapper,
+                trigger=trigger,
+                id=f"task_{task_id}",
+                name=f"Task for spider {spider_id}",
+                replace_existing=True,
+                args=[spider_id, task_id, policy["skip_if_running"]],
+                max_instances=policy["max_instances"],
+                coalesce=policy["coalesce"],
+                misfire_grace_time=policy["misfire_grace_time"],
+            )
+    finally:
+        if paused:
+            scheduler.resume()
+    return len(specs)
+
+
+async def rehydrate_tasks(page_size: Optional[int] = None) -> Dict[str, Any]:
+    """从数据库同步所有激活爬虫的定时任务，并回写 job_id
+
+    只添加缺失的任务、替换调度字段有变化的任务、移除已不存在的任务，
+    未变化的任务保持原样，不会重新计算下次运行时间（定期同步不会打乱抖动或跳过即将到来的触发）。
+    """
+    started = time.perf_counter()
+    page_size = page_size or REHYDRATE_PAGE_SIZE
+    existing = {job.id for job in scheduler.get_jobs() if job.id.startswith("task_")}
+    wanted: set = set()
+    specs: List[Tuple[int, int, BaseTrigger, Dict[str, Any]]] = []
+    signatures: Dict[str, Tuple] = {}
+    invalid: List[int] = []
+    loaded = 0
+
+    async for rows in _iter_active_tasks(page_size):
+        loaded += len(rows)
+        for row in rows:
+            job_id = f"task_{row.id}"
+            policy = resolve_policy(
+                **{field: getattr(row, field) for field in _POLICY_FIELDS}
+            )
+            signature = _task_signature(row.spider_id, row.cron_expression or "", policy)
+            if job_id in existing and _job_signatures.get(job_id) == signature:
+                wanted.add(job_id)
+                continue
+            try:
+                trigger = build_trigger(row.id, row.cron_expression or "", policy)
+            except ValueError as e:
+                logger.warning(f"Skipping task {row.id}: {e}")
+                invalid.append(row.id)
+                continue
+            wanted.add(job_id)
+            specs.append((row.id, row.spider_id, trigger, policy))
+            signatures[job_id] = signature
+    loaded_at = time.perf_counter()
+
+    registered = _add_jobs(specs)
+    _job_signatures.update(signatures)
+    registered_at = time.perf_counter()
+
+    # 回写 job_id：已调度的任务写入，无效的任务清空
+    async with db_manager.session() as db:
+        await db.execute(
+            text(
+                "UPDATE tasks SET job_id = 'task_' || tasks.id "
+                "FROM spiders WHERE spiders.id = tasks.spider_id "
+                "AND spiders.is_active AND tasks.job_id IS DISTINCT FROM 'task_' || tasks.id"
+            )
+        )
+        if invalid:
+            await db.execute(
+                text("UPDATE tasks SET job_id = NULL WHERE id = ANY(:ids)"),
+                {"ids": invalid},
+            )
+        await db.commit()
+
+    # 移除数据库中已不存在或爬虫已停用的任务
+    stale = existing - wanted
+    for job_id in stale:
+        scheduler.remove_job(job_id)
+        _job_signatures.pop(job_id, None)
+
+    summary = {
+        "loaded": loaded,
+        "scheduled": registered,
+        "unchanged": loaded - registered - len(invalid),
+        "removed": len(stale),
+        "invalid": len(invalid),
+        "load_seconds": round(loaded_at - started, 3),
+        "register_seconds": round(registered_at - loaded_at, 3),
+        "total_seconds": round(time.perf_counter() - started, 3),
+    }
+    logger.info(f"Rehydrated scheduled tasks: {summary}")
+    return summary
+
+
+async def publish_task_change(db, task_id: int, action: str) -> None:
+    """通知调度进程任务变更（upsert / delete），随当前事务提交后送达"""
+    await notify(db, TASK_CHANNEL, {"action": action, "task_id": task_id})
+
+
+async def handle_task_change(message: Dict[str, Any]) -> None:
+    """调度进程处理API进程发来的任务变更通知"""
+    action = message.get("action")
+    if action == "resync":
+        await rehydrate_tasks()
+        return
+
+    task_id = message.get("task_id")
+    if task_id is None:
+        return
+    job_id = f"task_{task_id}"
+
+    row = None
+    if action == "upsert":
+        async with db_manager.session() as db:
+            result = await db.execute(
+                select(Task.id, Task.spider_id, Task.cron_expression)
+                .add_columns(*[getattr(Task, field) for field in _POLICY_FIELDS])
+                .join(Spider, Spider.id == Task.spider_id)
+                .where(Task.id == task_id, Spider.is_active.is_(True))
+            )
+            row = result.first()
+
+    if row is None:
+        # 任务已删除或爬虫已停用
+        if scheduler.get_job(job_id):
+            scheduler.remove_job(job_id)
+            logger.info(f"Task {task_id} removed")
+        _job_signatures.pop(job_id, None)
+        return
+
+    await schedule_task(
+        task_id=row.id,
+        spider_id=row.spider_id,
+        cron_expression=row.cron_expression or "",
+        **{field: getattr(row, field) for field in _POLICY_FIELDS},
+    )
+
+
+_listener: Optional[PgListener] = None
+_resync_task: Optional[asyncio.Task] = None
+
+
+async def _resync_loop() -> None:
+    while True:
+        await asyncio.sleep(RESYNC_INTERVAL)
+        try:
+            await rehydrate_tasks()
+        except Exception as e:
+            logger.error(f"Failed to resync scheduled tasks: {e}", exc_info=True)
+
+
+async def start_scheduler_service() -> None:
+    """启动调度器：从数据库恢复任务，监听任务变更通知，并定期全量同步"""
+    global _listener, _resync_task
+
+    start_scheduler()
+    try:
+        await rehydrate_tasks()
+    except Exception as e:
+        logger.error(f"Failed to rehydrate scheduled tasks: {e}", exc_info=True)
+
+    _listener = PgListener(
+        TASK_CHANNEL, handle_task_change, on_reconnect=rehydrate_tasks
+    )
+    _listener.start()
+    if RESYNC_INTERVAL:
+        _resync_task = asyncio.create_task(_resync_loop())
+
+
+async def stop_scheduler_service() -> None:
+    """停止调度器和任务变更监听"""
+    global _listener, _resync_task
+
+    if _resync_task is not None:
+        _resync_task.cancel()
+        await asyncio.gather(_resync_task, return_exceptions=True)
+        _resync_task = None
+    if _listener is not None:
+        await _listener.close()
+        _listener = None
+    shutdown_scheduler()
+
+
+def get_running_tasks(after_id: int = 0, limit: int = 1000) -> Dict[str, Any]:
+    """按任务ID分页获取调度器中正在运行的定时任务"""
     running_tasks = []
 
-    for job in jobs:
+    for job in scheduler.get_jobs():
         # 提取任务ID (从job_id格式 "task_{task_id}" 中提取)
         if job.id.startswith("task_"):
             try:
                 task_id = int(job.id[5:])  # 去掉前缀 "task_"
-                running_tasks.append(
-                    {
-                        "task_id": task_id,
-                        "job_id": job.id,
-                        "name": job.name,
-                        "next_run_time": str(job.next_run_time),
-                        "trigger": str(job.trigger),
-                    }
-                )
             except ValueError:
                 # 如果无法提取task_id，跳过这个任务
                 continue
+            if task_id <= after_id:
+                continue
+            running_tasks.append(
+                {
+                    "task_id": task_id,
+                    "job_id": job.id,
+                    "name": job.name,
+                    "next_run_time": str(job.next_run_time),
+                    "trigger": str(job.trigger),
+                }
+            )
+
+    running_tasks.sort(key=lambda task: task["task_id"])
+    next_cursor = None
+    if len(running_tasks) > limit:
+        running_tasks = running_tasks[:limit]
+        next_cursor = encode_cursor(running_tasks[-1]["task_id"])
+    return {
+        "total_tasks": len(running_tasks),
+        "tasks": running_tasks,
+        "next_cursor": next_cursor,
+    }
+
+
+async def get_scheduled_tasks(after_id: int = 0, limit: int = 1000) -> Dict[str, Any]:
+    """按任务ID分页获取定时任务及下次运行时间
+
+    调度器运行在当前进程时直接读取调度器；否则调度器在独立进程中，
+    按数据库中的任务和调度策略计算本页任务的下次运行时间，
+    每次调用只读取和计算一页，与任务总数无关。
+    """
+    if scheduler.running:
+        return get_running_tasks(after_id, limit)
 
-    return {"total_tasks": len(running_tasks), "tasks": running_tasks}
-
+    now = datetime.now(scheduler.timezone)
+    rows = await _active_tasks_page(after_id, limit + 1)
+    next_cursor = encode_cursor(rows[limit - 1].id) if len(rows) > limit else None
+    running_tasks = []
+    for row in rows[:limit]:
+        policy = resolve_policy(
+            **{field: getattr(row, field) for field in _POLICY_FIELDS}
+        )
+        try:
+            trigger = build_trigger(row.id, row.cron_expression or "", policy)
+        except ValueError:
+            continue
+        running_tasks.append(
+            {
+                "task_id": row.id,
+                "job_id": f"task_{row.id}",
+                "name": f"Task for spider {row.spider_id}",
+                "next_run_time": str(trigger.get_next_fire_time(None, now)),
+                "trigger": str(trigger),
+            }
+        )
 
-# 启动调度器
-start_scheduler()
+    return {
+        "total_tasks": len(running_tasks),
+        "tasks": running_tasks,
+        "next_cursor": next_cursor,
+    }
@@ -0,0 +1,199 @@
+import asyncio
+import contextvars
+import itertools
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+from config.load_config import get_setting
+
+logger = logging.getLogger(__name__)
+
+# 优先级：数值越小越先执行
+PRIORITY_API = 0
+PRIORITY_SCHEDULED = 10
+PRIORITY_BACKGROUND = 20
+
+
+class _Job:
+    def __init__(
+        self,
+        priority: int,
+        source: str,
+        func: Callable[[], Awaitable[Any]],
+        future: asyncio.Future,
+    ):
+        self.priority = priority
+        self.source = source
+        self.func = func
+        self.future = future
+        self.enqueued_at = time.monotonic()
+        # 保留提交方的上下文（如当前运行ID），在工作协程中以该上下文执行
+        self.context = contextvars.copy_context()
+
+
+class WorkQueue:
+    """调度器/API 与爬虫执行之间的进程内优先级队列
+
+    定时任务和API调用按优先级入队，由固定数量的异步工作协程取出执行，
+    同一时间执行的运行数不超过工作协程数。
+    """
+
+    def __init__(self):
+        self.workers: int = get_setting("work_queue.workers", 8)
+        self.max_depth: int = get_setting("work_queue.max_depth", 10000)
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._sequence = itertools.count()
+        self._busy = 0
+        # 来源 -> 排队中的任务数
+        self._pending: Dict[str, int] = {}
+        self._busy_since: Dict[int, float] = {}
+        self._busy_seconds = 0.0
+        self._started_at = time.monotonic()
+        self._completed = 0
+        self._failed = 0
+        # 最近完成任务的排队等待时间和执行时间（秒）
+        self._wait_times: Deque[float] = deque(maxlen=1000)
+        self._run_times: Deque[float] = deque(maxlen=1000)
+
+    @property
+    def started(self) -> bool:
+        return self._queue is not None
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    def start(self) -> None:
+        if self.started:
+            return
+        self._queue = asyncio.PriorityQueue()
+        self._started_at = time.monotonic()
+        self._tasks = [
+            asyncio.create_task(self._worker(index)) for index in range(self.workers)
+        ]
+        logger.info(f"Work queue started with {self.workers} workers")
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._queue is not None:
+            # 取消尚未执行的任务
+            while not self._queue.empty():
+                _, _, job = self._queue.get_nowait()
+                job.future.cancel()
+        self._queue = None
+        self._pending.clear()
+
+    def submit(
+        self,
+        func: Callable[[], Awaitable[Any]],
+        priority: int = PRIORITY_API,
+        source: str = "api",
+    ) -> asyncio.Future:
+        """入队一个任务，返回其结果的Future"""
+        if not self.started:
+            self.start()
+        if self.depth >= self.max_depth:
+            raise RuntimeError(f"Work queue is full ({self.max_depth} jobs)")
+        future = asyncio.get_running_loop().create_future()
+        job = _Job(priority, source, func, future)
+        self._queue.put_nowait((priority, next(self._sequence), job))
+        self._pending[source] = self._pending.get(source, 0) + 1
+        return future
+
+    def pending(self, source: str) -> int:
+        """指定来源排队中（尚未开始执行）的任务数"""
+        return self._pending.get(source, 0)
+
+    async def run(
+        self,
+        func: Callable[[], Awaitable[Any]],
+        priority: int = PRIORITY_API,
+        source: str = "api",
+    ) -> Any:
+        """入队并等待执行结果"""
+        return await self.submit(func, priority, source)
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            _, _, job = await self._queue.get()
+            self._pending[job.source] -= 1
+            if job.future.cancelled():
+                continue
+            started = time.monotonic()
+            self._wait_times.append(started - job.enqueued_at)
+            self._busy += 1
+            self._busy_since[index] = started
+            try:
+                result = await asyncio.create_task(job.func(), context=job.context)
+            except asyncio.CancelledError:
+                job.future.cancel()
+                raise
+            except Exception as e:
+                self._failed += 1
+                if not job.future.done():
+                    job.future.set_exception(e)
+            else:
+                self._completed += 1
+                if not job.future.done():
+                    job.future.set_result(result)
+            finally:
+                finished = time.monotonic()
+                self._run_times.append(finished - started)
+                self._busy_seconds += finished - started
+                self._busy_since.pop(index, None)
+                self._busy -= 1
+
+    def run_seconds_p50(self) -> float:
+        """最近任务执行时间的中位数（秒）"""
+        return self._percentile(list(self._run_times), 0.5)
+
+    @staticmethod
+    def _percentile(values: List[float], percent: float) -> float:
+        if not values:
+            return 0.0
+        ordered = sorted(values)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percent))]
+
+    def stats(self) -> Dict[str, Any]:
+        """队列深度、等待时间和工作协程利用率"""
+        now = time.monotonic()
+        busy_seconds = self._busy_seconds + sum(
+            now - since for since in self._busy_since.values()
+        )
+        uptime = max(now - self._started_at, 1e-9)
+        depth_by_source = {
+            source: count for source, count in self._pending.items() if count
+        }
+        wait_times = list(self._wait_times)
+        run_times = list(self._run_times)
+        return {
+            "started": self.started,
+            "workers": self.workers,
+            "busy_workers": self._busy,
+            "depth": self.depth,
+            "depth_by_source": depth_by_source,
+            "max_depth": self.max_depth,
+            "completed": self._completed,
+            "failed": self._failed,
+            "utilization": round(busy_seconds / (uptime * self.workers), 4),
+            "current_utilization": round(self._busy / self.workers, 4),
+            "wait_seconds": {
+                "p50": round(self._percentile(wait_times, 0.5), 3),
+                "p95": round(self._percentile(wait_times, 0.95), 3),
+                "max": round(max(wait_times, default=0.0), 3),
+            },
+            "run_seconds": {
+                "p50": round(self._percentile(run_times, 0.5), 3),
+                "p95": round(self._percentile(run_times, 0.95), 3),
+            },
+        }
+
+
+# --- 实例化 ---
+work_queue = WorkQueue()
@@ -0,0 +1,35 @@
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# 不影响页面内容的跟踪参数
+_TRACKING_PARAMS = {"s", "t", "ref", "ref_src", "fbclid", "gclid"}
+
+
+def normalize_url(url: str) -> str:
+    """规范化URL，用于缓存键和去重
+
+    - scheme 和 host 小写，去掉默认端口
+    - 去掉 fragment、跟踪参数（utm_* 等）和末尾斜杠
+    - 查询参数按键排序
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if host == "twitter.com":
+        host = "x.com"
+    port = parts.port
+    if port and not (
+        (scheme == "http" and port == 80) or (scheme == "https" and port == 443)
+    ):
+        host = f"{host}:{port}"
+
+    path = parts.path.rstrip("/") or "/"
+    query = urlencode(
+        sorted(
+            (k, v)
+            for k, v in parse_qsl(parts.query, keep_blank_values=True)
+            if not k.startswith("utm_") and k not in _TRACKING_PARAMS
+        )
+    )
+    return urlunsplit((scheme, host, path, query, ""))
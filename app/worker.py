@@ -0,0 +1,44 @@
+"""工作节点进程
+
+    python -m app.worker
+
+从Postgres任务队列（jobs表）领取爬虫任务执行，并领取无人执行的批量任务，
+可以在多台机器上同时运行多个节点。
+"""
+import asyncio
+import logging
+import signal
+
+from app.database.database import start_services, stop_services
+from app.services.batch_jobs import batch_runner
+from app.services.job_queue import job_queue
+
+# 配置日志
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def main() -> None:
+    logger.info(f"Starting worker node {job_queue.node_id}...")
+    await start_services()
+    job_queue.start()
+    batch_runner.start()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    try:
+        await stop.wait()
+    finally:
+        logger.info("Shutting down worker node...")
+        # 先交还未完成的任务，再关闭截图服务
+        await job_queue.close()
+        await batch_runner.close()
+        await stop_services()
+        logger.info("Worker node shutdown complete")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
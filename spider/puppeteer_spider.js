@@ -1,8 +1,12 @@
 import puppeteer from 'puppeteer';
+import crypto from 'crypto';
 import fs from 'fs';
 import path from 'path';
+import { fileURLToPath } from 'url';
 import toml from 'toml';
 
+const ROOT_PATH = path.join(path.dirname(fileURLToPath(import.meta.url)), '..');
+
 class PuppeteerSpider {
     constructor() {
         this.config = this.loadConfig();
@@ -11,29 +15,28 @@ class PuppeteerSpider {
     loadConfig() {
         // 读取配置文件
         try {
-            const configPath = path.join(path.dirname(import.meta.url).replace('file:///', ''), '..', 'config', 'config.toml');
+            const configPath = path.join(ROOT_PATH, 'config', 'config.toml');
             const configContent = fs.readFileSync(configPath, 'utf-8');
             return toml.parse(configContent);
         } catch (error) {
             console.error('Failed to load config:', error);
             // 返回默认配置
             return {
-                paths: {
-                    puppeteer_screenshot: 'screenshots/puppeteer'
+                screenshot_store: {
+                    root: 'public/pic'
                 }
             };
         }
     }
 
-    async run(url) {
+    async run(url, browser = null, spiderName = 'puppeteer') {
         if (!url) {
             throw new Error('URL is required');
         }
 
         try {
-            // 获取输出目录
-            const rootPath = path.join(path.dirname(import.meta.url).replace('file:///', ''), '..');
-            const outputDir = path.join(rootPath, this.config.paths?.puppeteer_screenshot || 'screenshots/puppeteer');
+            // 获取输出目录：与Python爬虫共用内容寻址存储
+            const outputDir = path.join(ROOT_PATH, this.config.screenshot_store?.root || 'public/pic');
 
             // 确保输出目录存在
             if (!fs.existsSync(outputDir)) {
@@ -41,7 +44,7 @@ class PuppeteerSpider {
             }
 
             // 直接调用Puppeteer函数
-            return await this.executePuppeteer(url, outputDir);
+            return await this.executePuppeteer(url, outputDir, browser, spiderName);
         } catch (error) {
             console.error(`Error in PuppeteerSpider.run: ${error}`);
             return {
@@ -51,16 +54,123 @@ class PuppeteerSpider {
         }
     }
 
-    async executePuppeteer(url, outputDir) {
+    getLeanLoadRules(spiderName = 'puppeteer') {
+        // 读取 [lean_load.<爬虫名>] 的资源拦截规则，未配置的项继承 [lean_load.default]
+        const leanLoad = this.config.lean_load || {};
+        const options = { ...(leanLoad.default || {}), ...(leanLoad[spiderName] || {}) };
+        return {
+            enabled: Boolean(options.enabled),
+            resourceTypes: new Set(options.resource_types || []),
+            urlPatterns: (options.url_patterns || []).map((p) => new RegExp(p)),
+            allowPatterns: (options.allow_patterns || []).map((p) => new RegExp(p)),
+            estimatedSizes: {
+                image: 40000,
+                media: 500000,
+                font: 40000,
+                script: 60000,
+                stylesheet: 20000,
+                ...(options.estimated_sizes || {})
+            }
+        };
+    }
+
+    storeScreenshot(storeRoot, data, extension) {
+        // 按内容哈希分层存放，规则与 app/services/screenshot_store.py 一致
+        const digest = crypto.createHash('sha256').update(data).digest('hex');
+        const depth = this.config.screenshot_store?.shard_depth ?? 2;
+        const shards = Array.from({ length: depth }, (_, i) => digest.slice(i * 2, i * 2 + 2));
+        const filePath = path.join(storeRoot, ...shards, `${digest}.${extension}`);
+        const deduplicated = fs.existsSync(filePath);
+        if (!deduplicated) {
+            fs.mkdirSync(path.dirname(filePath), { recursive: true });
+            const tmpPath = path.join(path.dirname(filePath), `.${digest}.${process.pid}.tmp`);
+            fs.writeFileSync(tmpPath, data);
+            fs.renameSync(tmpPath, filePath);
+        }
+        return { path: filePath, sha256: digest, size: data.length, deduplicated };
+    }
+
+    getImageOptions() {
+        // 读取 [image] 配置，png不支持quality参数
+        const image = this.config.image || {};
+        const format = String(image.format || 'webp').toLowerCase().replace('jpg', 'jpeg');
+        if (format === 'jpeg' || format === 'webp') {
+            return {
+                extension: format === 'jpeg' ? 'jpg' : 'webp',
+                screenshot: { type: format, quality: image.quality || 80 }
+            };
+        }
+        return { extension: 'png', screenshot: { type: 'png' } };
+    }
+
+    async enableLeanLoad(page, rules) {
+        // 基于请求拦截中止媒体、追踪脚本等资源，并统计节省的请求数和字节数
+        const stats = {
+            enabled: rules.enabled,
+            requests_blocked: 0,
+            blocked_by_type: {},
+            bytes_saved_estimate: 0,
+            requests_loaded: 0,
+            bytes_loaded: 0
+        };
+
+        page.on('response', (response) => {
+            stats.requests_loaded += 1;
+            stats.bytes_loaded += parseInt(response.headers()['content-length'] || '0', 10) || 0;
+        });
+
+        if (!rules.enabled) {
+            return stats;
+        }
+
+        const shouldBlock = (resourceType, requestUrl) => {
+            if (rules.allowPatterns.some((p) => p.test(requestUrl))) {
+                return false;
+            }
+            if (rules.resourceTypes.has(resourceType)) {
+                return true;
+            }
+            return rules.urlPatterns.some((p) => p.test(requestUrl));
+        };
+
+        await page.setRequestInterception(true);
+        page.on('request', (request) => {
+            if (request.isInterceptResolutionHandled()) {
+                return;
+            }
+            const resourceType = request.resourceType();
+            if (!shouldBlock(resourceType, request.url())) {
+                request.continue();
+                return;
+            }
+            stats.requests_blocked += 1;
+            stats.blocked_by_type[resourceType] = (stats.blocked_by_type[resourceType] || 0) + 1;
+            stats.bytes_saved_estimate += rules.estimatedSizes[resourceType] || 0;
+            request.abort();
+        });
+
+        return stats;
+    }
+
+    static async launchBrowser() {
+        return await puppeteer.launch({
+            headless: true,
+            args: ['--no-sandbox', '--disable-setuid-sandbox']
+        });
+    }
+
+    async executePuppeteer(url, outputDir, sharedBrowser = null, spiderName = 'puppeteer') {
+        // 传入常驻浏览器时只新建和关闭页面，否则按次启动浏览器
+        let browser = sharedBrowser;
+        let page = null;
         try {
-            // 启动浏览器
-            const browser = await puppeteer.launch({
-                headless: true,
-                args: ['--no-sandbox', '--disable-setuid-sandbox']
-            });
+            if (!browser) {
+                browser = await PuppeteerSpider.launchBrowser();
+            }
 
             // 创建新页面
-            const page = await browser.newPage();
+            page = await browser.newPage();
+            const leanLoad = await this.enableLeanLoad(page, this.getLeanLoadRules(spiderName));
 
             // 导航到目标URL
             await page.goto(url, { waitUntil: 'networkidle2' });
@@ -69,21 +179,24 @@ class PuppeteerSpider {
             await page.waitForSelector('article', { timeout: 3000 });
 
             // 截取页面截图
-            const timestamp = Date.now();
-            const screenshotPath = path.join(outputDir, `${timestamp}.png`);
-            await page.screenshot({ path: screenshotPath, fullPage: true });
+            // 由Chromium直接编码为配置的格式，Node事件循环不参与压缩
+            const imageOptions = this.getImageOptions();
+            const data = await page.screenshot({ fullPage: true, ...imageOptions.screenshot });
+            const stored = this.storeScreenshot(outputDir, Buffer.from(data), imageOptions.extension);
 
             // 获取页面标题
             const title = await page.title();
 
-            // 关闭浏览器
-            await browser.close();
-
             return {
                 status: 'success',
                 message: 'Puppeteer spider ran successfully',
                 title: title,
-                screenshotPath: screenshotPath
+                screenshotPath: stored.path,
+                sha256: stored.sha256,
+                deduplicated: stored.deduplicated,
+                format: imageOptions.screenshot.type,
+                size: stored.size,
+                leanLoad: leanLoad
             };
         } catch (error) {
             console.error('Error in Puppeteer execution:', error);
@@ -91,6 +204,13 @@ class PuppeteerSpider {
                 status: 'error',
                 message: error.message
             };
+        } finally {
+            if (sharedBrowser) {
+                await page?.close().catch(() => {});
+            } else {
+                // 关闭浏览器
+                await browser?.close();
+            }
         }
     }
 }
@@ -99,11 +219,11 @@ class PuppeteerSpider {
 export async function main(url) {
     const spider = new PuppeteerSpider();
     const result = await spider.run(url);
-    console.log(result);
+    console.log(JSON.stringify(result));
 }
 
 // 如果直接运行此脚本
-if (import.meta.main) {
+if (process.argv[1] && path.resolve(process.argv[1]) === fileURLToPath(import.meta.url)) {
     const args = process.argv.slice(2);
     const url = args[0];
     if (url) {
@@ -114,4 +234,4 @@ if (import.meta.main) {
     }
 }
 
-export { PuppeteerSpider, main };
\ No newline at end of file
+export { PuppeteerSpider };
\ No newline at end of file
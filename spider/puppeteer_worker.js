@@ -0,0 +1,87 @@
+// 常驻Puppeteer工作进程
+// 通过stdin/stdout收发JSON行：请求 {"id": "...", "url": "...", "spider": "爬虫名"}，响应 {"id": "...", "result": {...}}
+// 浏览器在多次请求间保持打开，服务一定数量页面后回收重启
+import readline from 'readline';
+import { PuppeteerSpider } from './puppeteer_spider.js';
+
+const spider = new PuppeteerSpider();
+const maxPagesPerBrowser = spider.config.node_sidecar?.max_pages_per_browser || 100;
+
+// 当前浏览器: { browser, served, active, retired }
+let current = null;
+let launching = null;
+
+async function acquireBrowser() {
+    if (!current || !current.browser.connected || current.served >= maxPagesPerBrowser) {
+        if (!launching) {
+            launching = PuppeteerSpider.launchBrowser().then((browser) => {
+                // 旧浏览器上的页面全部结束后再关闭
+                const previous = current;
+                current = { browser, served: 0, active: 0, retired: false };
+                launching = null;
+                if (previous) {
+                    previous.retired = true;
+                    if (previous.active === 0) {
+                        previous.browser.close().catch(() => {});
+                    }
+                }
+            }, (error) => {
+                launching = null;
+                throw error;
+            });
+        }
+        await launching;
+    }
+    const entry = current;
+    entry.served += 1;
+    entry.active += 1;
+    return entry;
+}
+
+function releaseBrowser(entry) {
+    entry.active -= 1;
+    if (entry.retired && entry.active === 0) {
+        entry.browser.close().catch(() => {});
+    }
+}
+
+function reply(message) {
+    process.stdout.write(JSON.stringify(message) + '\n');
+}
+
+async function handle(request) {
+    let entry = null;
+    try {
+        entry = await acquireBrowser();
+        const result = await spider.run(request.url, entry.browser, request.spider || undefined);
+        reply({ id: request.id, result });
+    } catch (error) {
+        reply({ id: request.id, error: error.message });
+    } finally {
+        if (entry) {
+            releaseBrowser(entry);
+        }
+    }
+}
+
+const rl = readline.createInterface({ input: process.stdin });
+
+rl.on('line', (line) => {
+    if (!line.trim()) {
+        return;
+    }
+    let request;
+    try {
+        request = JSON.parse(line);
+    } catch (error) {
+        console.error(`Invalid request: ${line}`);
+        return;
+    }
+    handle(request);
+});
+
+// stdin关闭即退出
+rl.on('close', async () => {
+    await current?.browser.close().catch(() => {});
+    process.exit(0);
+});
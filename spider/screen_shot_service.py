@@ -1,100 +1,224 @@
 import asyncio
-import json
-import time
+import math
+import re
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
-from playwright.async_api import Playwright, async_playwright, expect
+from playwright.async_api import Page, expect
 
-from app.config.load_config import Config
+from app.services.browser_pool import browser_pool
+from app.services.image_pipeline import image_pipeline
+from app.services.lean_load import LeanLoadRules, ResourceBlocker
+from app.services.run_tracker import report_phase
+from app.services.screenshot_store import screenshot_store
+from app.services.storage_state import storage_state_cache
+from config.load_config import Config
+
+
+# 取评论的状态链接作为唯一标识，没有链接时退化为文本前缀
+_COMMENT_KEY_SCRIPT = """(element) => {
+    const time = element.querySelector('a[href*="/status/"] time');
+    const link = time ? time.closest('a') : null;
+    return link ? link.href : element.innerText.slice(0, 200);
+}"""
 
 
 class ScreenShotSpider:
+    # 使用 config.toml 中 [lean_load.<爬虫名>] 的拦截规则；
+    # 由 spider_registry 创建时替换为数据库中的爬虫名称，直接实例化时使用默认名称
+    name = "screen_shot"
+    # 连续多少次滚动没有出现新评论时停止
+    max_scroll_stalls = 3
+
     def __init__(self):
         self.config = Config()
-
-    def load_cookie(self) -> List[Dict[str, Any]]:
-        cookie_path = (
+        self._lean_load_rules: Optional[LeanLoadRules] = None
+        self._lean_load_rules_name: Optional[str] = None
+
+    @property
+    def lean_load_rules(self) -> LeanLoadRules:
+        """当前爬虫名称的拦截规则，名称变化时重新读取"""
+        if self._lean_load_rules is None or self._lean_load_rules_name != self.name:
+            self._lean_load_rules = LeanLoadRules.for_spider(self.name)
+            self._lean_load_rules_name = self.name
+        return self._lean_load_rules
+
+    @property
+    def cookie_path(self) -> Path:
+        return (
             self.config.BASE_DIR / "public" / "cookie" / "x.com_json_1755533995907.json"
         )
 
-        try:
-            with open(cookie_path, "r", encoding="utf-8") as f:
-                cookies = json.load(f)
-
-            # 规范化sameSite值
-            for cookie in cookies:
-                if "sameSite" in cookie:
-                    cookie["sameSite"] = {
-                        "strict": "Strict",
-                        "lax": "Lax",
-                        "none": "None",
-                    }.get(cookie["sameSite"].lower(), None)
-                    if cookie["sameSite"] is None:
-                        del cookie["sameSite"]
-            return cookies
-        except Exception as e:
-            print(f"Error loading cookies: {e}")
-            return []
-
-    async def run(self, url: Optional[str] = None) -> Dict[str, Any]:
-        """运行爬虫，返回结果"""
+    def load_cookie(self) -> List[Dict[str, Any]]:
+        """读取规范化后的cookie（解析结果按文件mtime缓存）"""
+        _, state = storage_state_cache.get(self.cookie_path)
+        return state["cookies"]
+
+    async def run(
+        self,
+        url: Optional[str] = None,
+        lean_load: Optional[bool] = None,
+        comments: Optional[int] = None,
+        comment_filter: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """运行爬虫，返回结果
+
+        Args:
+            url: 推文地址
+            lean_load: 是否拦截媒体/追踪等资源，默认使用配置
+            comments: 一次页面加载中截取的评论数量，默认1条；
+                设置 comment_filter 时默认截取所有匹配的评论
+            comment_filter: 只截取文本匹配该正则的评论
+        """
         if not url:
             raise ValueError("URL is required")
+        # 未指定数量时只截第一条，有过滤条件时截取所有匹配的评论
+        if comments is None and not comment_filter:
+            comments = 1
 
-        try:
-            async with async_playwright() as playwright:
-                browser = await playwright.chromium.launch(headless=False)
-                context = await browser.new_context()
-
-                cookies = await asyncio.to_thread(self.load_cookie)
-                if cookies:
-                    await context.add_cookies(cookies)
+        rules = self.lean_load_rules
+        if lean_load is not None and lean_load != rules.enabled:
+            rules = LeanLoadRules.for_spider(self.name)
+            rules.enabled = lean_load
+        blocker = ResourceBlocker(rules)
 
+        try:
+            # 从浏览器池获取已加载登录态的上下文，热路径上无需启动浏览器和设置cookie
+            async with browser_pool.acquire_auth_context(self.cookie_path) as context:
+                report_phase("browser_acquired")
                 page = await context.new_page()
+                await blocker.attach(page)
                 await page.goto(url)
+                report_phase("navigated")
 
                 # 等待文章元素可见
                 await expect(page.locator("article").nth(0)).to_be_visible(
                     timeout=200000
                 )
+                report_phase("element_visible")
                 count = await page.locator("article").count()
                 print(f"Found {count} articles")
 
                 # 移除第一个article的祖先元素
-                # 将推主的article删除，截图第一个评论
+                # 将推主的article删除，截图评论
                 article = page.locator("article").first
                 await article.locator("xpath=../../..").first.evaluate(
                     "(element) => element.remove()"
                 )
 
-                # 截取目标article的截图
-                target = page.locator("article").first
-                screenshot_dir = self.config.BASE_DIR / "public" / "pic"
-
-                screenshot_dir.mkdir(parents=True, exist_ok=True)
-                screenshot_path = screenshot_dir / f"{int(time.time())}.png"
-                await target.screenshot(path=str(screenshot_path), type="png")
-                print(f"Screenshot saved to {screenshot_path}")
-
-                # 确保浏览器和上下文被关闭
-                await context.close()
-                await browser.close()
-
-                return {
-                    "status": "success",
-                    "message": "Screenshot captured successfully",
-                    "screenshot_path": str(screenshot_path),
-                }
+                # 截取评论的原始截图，编码在归还页面后进行
+                captures = await self.capture_comments(page, comments, comment_filter)
+                report_phase("captured", count=len(captures))
+
+            if not captures:
+                return {"status": "error", "message": "No matching comment found"}
+
+            saved = await asyncio.gather(
+                *(self.save_screenshot(capture["raw"], url) for capture in captures)
+            )
+            for capture, item in zip(captures, saved):
+                item["comment_url"] = capture["comment_url"]
+            report_phase("encoded")
+
+            # 单条评论保持原有返回格式
+            result = {
+                "status": "success",
+                "message": "Screenshot captured successfully",
+                **saved[0],
+                "lean_load": blocker.stats(),
+            }
+            if comment_filter or comments > 1:
+                result["message"] = f"Captured {len(saved)} comments"
+                result["screenshots"] = saved
+                result["screenshot_paths"] = [item["screenshot_path"] for item in saved]
+            return result
         except Exception as e:
             print(f"Error in run function: {e}")
             return {"status": "error", "message": str(e)}
 
+    async def capture_comments(
+        self, page: Page, limit: Optional[int], comment_filter: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """在同一次页面加载中依次截取前N条（或匹配过滤条件的）评论
+
+        X的时间线是虚拟列表，滚动时会回收已离开视口的article，
+        因此按评论链接去重，并在当前可见评论处理完后向下滚动加载更多。
+        limit 为None时截取所有评论，直到连续多次滚动没有新评论。
+        """
+        if limit is None:
+            limit = math.inf
+        pattern = re.compile(comment_filter) if comment_filter else None
+        seen = set()
+        captures: List[Dict[str, Any]] = []
+        stalls = 0
+
+        while len(captures) < limit and stalls < self.max_scroll_stalls:
+            articles = page.locator("article")
+            progressed = False
+            for i in range(await articles.count()):
+                article = articles.nth(i)
+                key = await article.evaluate(_COMMENT_KEY_SCRIPT)
+                if key in seen:
+                    continue
+                seen.add(key)
+                progressed = True
+
+                if pattern and not pattern.search(await article.inner_text()):
+                    continue
+                captures.append(
+                    {"comment_url": key, "raw": await article.screenshot(type="png")}
+                )
+                if len(captures) >= limit:
+                    break
+
+            if len(captures) >= limit:
+                break
+            stalls = 0 if progressed else stalls + 1
+            await page.mouse.wheel(0, 3000)
+            await page.wait_for_timeout(800)
+
+        return captures
+
+    async def save_screenshot(
+        self, raw: bytes, url: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """在进程池中编码截图并写入内容寻址存储，返回路径和各输出大小"""
+        encoded = await image_pipeline.encode(raw)
+
+        stored = await screenshot_store.put(encoded["data"], encoded["extension"], url)
+        thumbnails = []
+        for thumb in encoded["thumbnails"]:
+            stored_thumb = await screenshot_store.put(
+                thumb["data"], encoded["extension"], url, kind="thumbnail"
+            )
+            thumbnails.append(
+                {
+                    "path": stored_thumb["path"],
+                    "width": thumb["width"],
+                    "size": stored_thumb["size"],
+                }
+            )
+        print(f"Screenshot saved to {stored['path']}")
+
+        return {
+            "screenshot_path": stored["path"],
+            "sha256": stored["sha256"],
+            "deduplicated": stored["deduplicated"],
+            "format": encoded["format"],
+            "raw_size": len(raw),
+            "size": stored["size"],
+            "thumbnails": thumbnails,
+        }
+
 
 # 为了保持向后兼容性，保留main函数
 async def main(url: str) -> None:
     spider = ScreenShotSpider()
-    await spider.run(url)
+    try:
+        await spider.run(url)
+    finally:
+        await browser_pool.close()
+        image_pipeline.close()
 
 
 if __name__ == "__main__":